@@ -10,6 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,11 +46,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "subscriptions.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "subscriptions.routers.PrimaryPinningMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -72,6 +77,10 @@ TEMPLATES = [
 WSGI_APPLICATION = "config.wsgi.application"
 
 
+# True under `manage.py test`.
+TESTING = sys.argv[1:2] == ["test"]
+
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -82,6 +91,77 @@ DATABASES = {
     }
 }
 
+# SQLite performance mode (opt in with SQLITE_PERFORMANCE_MODE=1). WAL lets
+# readers run while a writer commits; IMMEDIATE transactions take the write
+# lock up front, so a writer queues for up to `timeout` seconds (the busy
+# timeout) instead of failing with "database is locked" when it would have
+# upgraded a read lock mid-transaction. The subscriptions.backends.sqlite3
+# engine hands the write lock to threads in the order they asked for it.
+# WAL keeps db.sqlite3-wal and db.sqlite3-shm next to the database.
+if os.environ.get("SQLITE_PERFORMANCE_MODE", "0") == "1":
+    DATABASES["default"]["ENGINE"] = "subscriptions.backends.sqlite3"
+    DATABASES["default"]["OPTIONS"] = {
+        "init_command": (
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA mmap_size=268435456;"
+            "PRAGMA temp_store=MEMORY;"
+        ),
+        "transaction_mode": "IMMEDIATE",
+        "timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 20)),
+    }
+
+# DATABASE_ENGINE=postgresql selects PostgreSQL (pip install -e ".[postgres]"),
+# configured through the usual PG* variables. Connections come from a psycopg
+# pool per process; set POSTGRES_POOL=0 to use persistent connections
+# (CONN_MAX_AGE) instead, e.g. behind PgBouncer.
+if os.environ.get("DATABASE_ENGINE") == "postgresql":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("PGDATABASE", "subscriptions"),
+        "USER": os.environ.get("PGUSER", "subscriptions"),
+        "PASSWORD": os.environ.get("PGPASSWORD", ""),
+        "HOST": os.environ.get("PGHOST", "localhost"),
+        "PORT": os.environ.get("PGPORT", "5432"),
+        "OPTIONS": {},
+    }
+    if os.environ.get("POSTGRES_POOL", "1") == "1":
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("POSTGRES_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("POSTGRES_POOL_MAX_SIZE", 10)),
+            "timeout": int(os.environ.get("POSTGRES_POOL_TIMEOUT", 10)),
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = int(
+            os.environ.get("POSTGRES_CONN_MAX_AGE", 60)
+        )
+        DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Read replica (subscriptions.routers): PGREPLICA_HOST (and PGREPLICA_PORT)
+# for a PostgreSQL standby, or SQLITE_REPLICA_PATH for a second SQLite file
+# kept in step with `sync_sqlite_replica`. Report and list views then read
+# from it; clients that just wrote read from the primary for
+# REPLICA_PIN_SECONDS, which should cover the replication lag. Tests read
+# from the primary, since a mirror cannot see data a TestCase has not
+# committed.
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    if os.environ.get("PGREPLICA_HOST"):
+        DATABASES["replica"] = {
+            **copy.deepcopy(DATABASES["default"]),
+            "HOST": os.environ["PGREPLICA_HOST"],
+            "PORT": os.environ.get("PGREPLICA_PORT", DATABASES["default"]["PORT"]),
+        }
+elif os.environ.get("SQLITE_REPLICA_PATH"):
+    DATABASES["replica"] = {
+        **copy.deepcopy(DATABASES["default"]),
+        "NAME": Path(os.environ["SQLITE_REPLICA_PATH"]),
+    }
+if "replica" in DATABASES:
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+REPLICA_DATABASE = "replica" if "replica" in DATABASES and not TESTING else None
+DATABASE_ROUTERS = ["subscriptions.routers.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,8 +204,24 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# API users must log in and only see their own rows; staff see everyone's
+# (subscriptions.scoping).
 REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": (
+        "subscriptions.pagination.ViewOrderingCursorPagination"
+    ),
+    "PAGE_SIZE": 100,
+    "DEFAULT_FILTER_BACKENDS": ["subscriptions.filters.QueryParamFilterBackend"],
+    "DEFAULT_RENDERER_CLASSES": [
+        "subscriptions.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
@@ -133,3 +229,50 @@ SPECTACULAR_SETTINGS = {
     "DESCRIPTION": "OpenAPI schema for subscriptions and expenses",
     "VERSION": "0.1.0",
 }
+
+# Query budgets enforced by subscriptions.instrumentation, keyed by
+# "METHOD url-name" or "url-name"; "*" covers every other view. Over-budget
+# requests are logged, and raise under tests so N+1 regressions fail CI.
+QUERY_BUDGETS = {
+    "*": 15,
+    "GET category-list": 4,
+    "GET subscription-list": 4,
+    "GET subscription-detail": 4,
+    "GET expense-list": 4,
+    "GET expense-detail": 4,
+    "GET job-list": 3,
+    "GET api_expenses_legacy": 4,
+    "GET api_monthly_spend": 6,
+    "GET api_forecast": 6,
+    "GET api_spend_report": 6,
+    "GET admin:subscriptions_expense_changelist": 8,
+    "GET admin:subscriptions_subscription_changelist": 8,
+    # The renew_now action: the changelist plus a constant number of renewal
+    # queries per batch, and no more for larger selections.
+    "POST admin:subscriptions_subscription_changelist": 24,
+}
+QUERY_BUDGETS_STRICT = TESTING
+
+# Currency that reports convert totals into (see subscriptions.fx).
+REPORTING_CURRENCY = "AUD"
+
+# Background jobs (subscriptions.jobs) are run by `run_worker` processes.
+# JOBS_RUN_IN_THREAD also starts each job in a thread of the process that
+# queued it, at most JOBS_MAX_THREADS at a time, for setups without a worker;
+# retries and periodic jobs still need `run_worker`.
+JOBS_RUN_IN_THREAD = False
+JOBS_MAX_THREADS = 4
+
+# Kinds that `run_worker` queues on a timer: {kind: interval in seconds}.
+JOBS_PERIODIC = {
+    "send_renewal_reminders": 60 * 60,
+}
+
+# Renewal reminders (subscriptions.reminders). Users without a
+# ReminderPreference are reminded this many days ahead.
+RENEWAL_REMINDER_LEAD_DAYS = 3
+RENEWAL_REMINDER_BACKEND = "subscriptions.reminders.ConsoleBackend"
+RENEWAL_REMINDER_FILE_PATH = BASE_DIR / "renewal_reminders.jsonl"
+
+# Uploaded statements wait here until their import job has processed them.
+EXPENSE_IMPORT_DIR = BASE_DIR / "imports"
@@ -1,12 +1,24 @@
 from django import forms
 from django.contrib import admin
 from django.contrib import messages
-from django.db import transaction
 from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
 from django.utils import timezone
 from django.urls import path, reverse
 
-from .models import Category, Expense, Subscription, add_months
+from . import jobs
+from .models import (
+    Category,
+    ExchangeRate,
+    Expense,
+    ExpenseArchive,
+    Job,
+    ReminderPreference,
+    RenewalReminder,
+    Subscription,
+)
+from .renewals import renew_selection
 
 
 @admin.register(Category)
@@ -40,50 +52,78 @@ class SubscriptionAdmin(admin.ModelAdmin):
     search_fields = ("name",)
     actions = ["renew_now"]
 
+    # Larger selections are renewed by a background job instead of in the
+    # request, so the admin never times out.
+    renew_now_sync_limit = 500
+
     @admin.action(description="Renew selected subscriptions now")
     def renew_now(self, request, queryset):
         today = timezone.localdate()
-        created = 0
-        skipped = 0
-
-        for subscription in queryset.filter(status=Subscription.Status.ACTIVE):
-            due_date = subscription.next_renewal_date
-            if not due_date or due_date > today:
-                skipped += 1
-                continue
-
-            with transaction.atomic():
-                exists = Expense.objects.filter(
-                    subscription=subscription,
-                    transaction_date=today,
-                    source=Expense.Source.SUBSCRIPTION,
-                ).exists()
-                if exists:
-                    skipped += 1
-                    continue
-
-                Expense.objects.create(
-                    user=subscription.user,
-                    subscription=subscription,
-                    name=subscription.name,
-                    category=subscription.category,
-                    amount=subscription.amount,
-                    currency=subscription.currency,
-                    transaction_date=today,
-                    source=Expense.Source.SUBSCRIPTION,
-                )
-
-                interval = max(1, subscription.billing_interval_months)
-                subscription.next_renewal_date = add_months(today, interval)
-                subscription.save(update_fields=["next_renewal_date", "updated_at"])
-                created += 1
+        if queryset.count() > self.renew_now_sync_limit:
+            ids = list(queryset.values_list("pk", flat=True))
+            job = jobs.enqueue(
+                "renew_subscriptions",
+                {"ids": ids, "today": today.isoformat()},
+                total=len(ids),
+                user=request.user,
+            )
+            self.message_user(
+                request,
+                f"Renewing {len(ids)} subscriptions in the background.",
+                messages.INFO,
+            )
+            return redirect("admin:subscriptions_subscription_job", job.pk)
 
+        result = renew_selection(queryset, today)
         self.message_user(
             request,
-            f"Renewals complete. Created: {created}, Skipped: {skipped}",
+            f"Renewals complete. Created: {result.created}, Skipped: {result.skipped}",
             messages.SUCCESS,
         )
 
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path(
+                "job/<int:job_id>/",
+                self.admin_site.admin_view(self.job_progress),
+                name="subscriptions_subscription_job",
+            ),
+            path(
+                "job/<int:job_id>/status/",
+                self.admin_site.admin_view(self.job_status),
+                name="subscriptions_subscription_job_status",
+            ),
+        ]
+        return custom + urls
+
+    def job_progress(self, request, job_id: int):
+        job = get_object_or_404(Job, pk=job_id)
+        context = {
+            **self.admin_site.each_context(request),
+            "title": f"Renewal job #{job.pk}",
+            "opts": self.model._meta,
+            "job": job,
+            "status_url": reverse(
+                "admin:subscriptions_subscription_job_status", args=[job.pk]
+            ),
+        }
+        return TemplateResponse(
+            request, "admin/subscriptions/job_progress.html", context
+        )
+
+    def job_status(self, request, job_id: int):
+        job = get_object_or_404(Job, pk=job_id)
+        return JsonResponse(
+            {
+                "status": job.status,
+                "progress_done": job.progress_done,
+                "progress_total": job.progress_total,
+                "result": job.result,
+                "error": job.error,
+            }
+        )
+
 
 class ExpenseAdminForm(forms.ModelForm):
     class Meta:
@@ -144,6 +184,8 @@ class ExpenseAdmin(admin.ModelAdmin):
         "updated_at",
     )
     list_filter = ("source", "category", "user")
+    # Nullable foreign keys are not joined by default; avoid a query per row.
+    list_select_related = ("category", "subscription", "user")
     search_fields = ("notes",)
 
     class Media:
@@ -170,3 +212,71 @@ class ExpenseAdmin(admin.ModelAdmin):
             "transaction_date": subscription.billing_date.isoformat(),
         }
         return JsonResponse(data)
+
+
+@admin.register(ExpenseArchive)
+class ExpenseArchiveAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "name",
+        "transaction_date",
+        "amount",
+        "currency",
+        "category",
+        "source",
+        "subscription",
+        "user",
+        "archived_at",
+    )
+    list_filter = ("source", "user")
+    list_select_related = ("category", "subscription", "user")
+    date_hierarchy = "transaction_date"
+    readonly_fields = [field.name for field in ExpenseArchive._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # MonthlySpend still counts archived rows.
+        return False
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ("date", "base", "quote", "rate", "updated_at")
+    list_filter = ("base", "quote")
+    date_hierarchy = "date"
+
+
+@admin.register(ReminderPreference)
+class ReminderPreferenceAdmin(admin.ModelAdmin):
+    list_display = ("user", "lead_days", "enabled")
+    list_filter = ("enabled",)
+
+
+@admin.register(RenewalReminder)
+class RenewalReminderAdmin(admin.ModelAdmin):
+    list_display = ("subscription", "user", "renewal_date", "sent_at")
+    list_filter = ("renewal_date",)
+    list_select_related = ("subscription", "user")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "kind",
+        "status",
+        "progress_done",
+        "progress_total",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status", "kind")
+    readonly_fields = [field.name for field in Job._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
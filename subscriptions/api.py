@@ -1,19 +1,311 @@
-from rest_framework import viewsets
+import uuid
+from datetime import date
+from pathlib import Path
 
-from .models import Category, Expense, Subscription
-from .serializers import CategorySerializer, ExpenseSerializer, SubscriptionSerializer
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import DateField, Value
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from rest_framework import ISO_8601, serializers, status, viewsets
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from . import jobs, scoping
+from .filters import integer, iso_date, text
+from .importers import detect_format
+from .instrumentation import section
+from .models import Category, Expense, Job, Subscription
+from .routers import ReplicaReadMixin
+from .serializers import (
+    CategorySerializer,
+    ExpenseImportSerializer,
+    ExpenseSerializer,
+    JobSerializer,
+    SubscriptionSerializer,
+)
+from .versioning import conditional
 
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all().order_by("name")
+
+class OptimizedQuerySetMixin:
+    """Load only the columns and joins the serializer will actually read.
+
+    Plain fields and primary-key relations become `only()` columns; fields
+    sourced through a relation (e.g. `category.name`) add a `select_related`
+    so they come back in the same query instead of one query per row.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request is None or self.request.method not in ("GET", "HEAD"):
+            return queryset
+
+        opts = queryset.model._meta
+        columns = {opts.pk.name}
+        related = set()
+        for field in self.get_serializer().fields.values():
+            path = field.source.split(".")
+            try:
+                model_field = opts.get_field(path[0])
+            except FieldDoesNotExist:
+                # "*", properties and methods may read anything.
+                return queryset
+            if not model_field.concrete:
+                continue
+            if len(path) > 1:
+                related.add(path[0])
+                columns.add("__".join(path[:2]))
+            elif model_field.is_relation and not isinstance(
+                field, serializers.PrimaryKeyRelatedField
+            ):
+                related.add(path[0])
+                columns.update(
+                    f"{path[0]}__{f.name}"
+                    for f in model_field.related_model._meta.concrete_fields
+                )
+            columns.add(path[0])
+
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+
+class UserScopedMixin:
+    """List, read and write only the requester's rows; staff see everyone's.
+
+    The queryset is filtered on `user` (see `subscriptions.scoping`), so other
+    users' rows 404 without an object permission check, and new rows belong
+    to the requester unless staff name another user.
+    """
+
+    def get_queryset(self):
+        return scoping.scope(super().get_queryset(), self.request.user)
+
+    def perform_create(self, serializer):
+        if scoping.sees_everything(self.request.user):
+            serializer.save()
+        else:
+            serializer.save(user=self.request.user)
+
+
+class ValuesListMixin:
+    """Serve `list` straight from `.values()` rows instead of model instances.
+
+    Only used when every serializer field maps to a model column; each value
+    then goes through that field's own representation, so the output is the
+    same as the ModelSerializer's. Respects `?fields=` sparse fieldsets.
+    """
+
+    # Fields whose to_representation returns plain column values unchanged.
+    passthrough_fields = (
+        serializers.IntegerField,
+        serializers.CharField,
+        serializers.ChoiceField,
+        serializers.BooleanField,
+        serializers.PrimaryKeyRelatedField,
+    )
+
+    def list(self, request, *args, **kwargs):
+        converters = self._value_converters()
+        if converters is None:
+            return super().list(request, *args, **kwargs)
+
+        columns = [column for _, column, _ in converters]
+        ordering = [name.lstrip("-") for name in self.ordering]
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*dict.fromkeys(columns + ordering))
+
+        page = self.paginate_queryset(rows)
+        rows = list(rows if page is None else page)
+        with section("serialize"):
+            data = [_represent(row, converters) for row in rows]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def _value_converters(self):
+        """Return [(output name, values() column, converter)] or None."""
+        opts = self.queryset.model._meta
+        converters = []
+        for name, field in self.get_serializer().fields.items():
+            if field.write_only:
+                continue
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete:
+                return None
+            if model_field.is_relation:
+                if not isinstance(field, serializers.PrimaryKeyRelatedField):
+                    return None
+                converters.append((name, model_field.attname, None))
+            elif isinstance(field, self.passthrough_fields):
+                converters.append((name, model_field.attname, None))
+            elif _is_iso_date_field(field):
+                converters.append((name, model_field.attname, _isoformat))
+            else:
+                converters.append((name, model_field.attname, field.to_representation))
+        return converters
+
+
+def _represent(row: dict, converters) -> dict:
+    data = {}
+    for name, column, convert in converters:
+        value = row[column]
+        data[name] = value if convert is None or value is None else convert(value)
+    return data
+
+
+def _is_iso_date_field(field: serializers.Field) -> bool:
+    return (
+        type(field) is serializers.DateField
+        and getattr(field, "format", api_settings.DATE_FORMAT) == ISO_8601
+    )
+
+
+def _isoformat(value) -> str:
+    return value.isoformat()
+
+
+class ConditionalGetMixin:
+    """ETag/Last-Modified for reads; unchanged data returns 304 without a query."""
+
+    @method_decorator(conditional)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(conditional)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class CategoryViewSet(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
+    UserScopedMixin,
+    OptimizedQuerySetMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    ordering = ("name", "id")
+    query_filters = {
+        "user": ("user_id", integer),
+        "name": ("name", text),
+    }
 
 
-class SubscriptionViewSet(viewsets.ModelViewSet):
-    queryset = Subscription.objects.all().order_by("next_renewal_date", "name")
+class SubscriptionViewSet(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
+    UserScopedMixin,
+    OptimizedQuerySetMixin,
+    viewsets.ModelViewSet,
+):
+    # Cursors cannot seek past NULL, so subscriptions without a renewal date
+    # sort last under a far-future stand-in.
+    queryset = Subscription.objects.annotate(
+        renews_on=Coalesce(
+            "next_renewal_date", Value(date.max, output_field=DateField())
+        )
+    )
     serializer_class = SubscriptionSerializer
+    ordering = ("renews_on", "name", "id")
+    query_filters = {
+        "user": ("user_id", integer),
+        "status": ("status", text),
+        "category": ("category_id", integer),
+        "billing_cycle": ("billing_cycle", text),
+        "renews_after": ("next_renewal_date__gte", iso_date),
+        "renews_before": ("next_renewal_date__lte", iso_date),
+    }
 
 
-class ExpenseViewSet(viewsets.ModelViewSet):
-    queryset = Expense.objects.all().order_by("-transaction_date", "-id")
+class ExpenseViewSet(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
+    UserScopedMixin,
+    OptimizedQuerySetMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
+    ordering = ("-transaction_date", "-id")
+    query_filters = {
+        "user": ("user_id", integer),
+        "category": ("category_id", integer),
+        "subscription": ("subscription_id", integer),
+        "source": ("source", text),
+        "date_from": ("transaction_date__gte", iso_date),
+        "date_to": ("transaction_date__lte", iso_date),
+    }
+
+
+class JobViewSet(UserScopedMixin, viewsets.ReadOnlyModelViewSet):
+    """Status of queued background jobs."""
+
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    ordering = ("-created_at", "-id")
+    query_filters = {
+        "kind": ("kind", text),
+        "status": ("status", text),
+    }
+
+
+class ExpenseImportView(APIView):
+    """Accept a CSV/OFX statement upload and import it as a background job.
+
+    The file is streamed to EXPENSE_IMPORT_DIR and parsed by the worker, so
+    the request returns 202 with the job to poll instead of holding the
+    connection open for a large statement.
+    """
+
+    parser_classes = [MultiPartParser]
+    serializer_class = ExpenseImportSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        # Staff may import on behalf of another user.
+        user = request.user
+        if "user" in data and scoping.sees_everything(request.user):
+            user = data["user"]
+
+        upload = data["file"]
+        directory = Path(settings.EXPENSE_IMPORT_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{uuid.uuid4().hex}{Path(upload.name).suffix.lower()}"
+        with open(path, "wb") as destination:
+            for chunk in upload.chunks():
+                destination.write(chunk)
+
+        job = jobs.enqueue(
+            "import_expenses",
+            {
+                "path": str(path),
+                "user_id": user.pk,
+                "format": data.get("format") or detect_format(upload.name),
+                "unsigned": data["unsigned"],
+                "currency": data["currency"],
+                "category": data["category"],
+            },
+            user=user,
+        )
+        return Response(
+            {
+                "job": job.pk,
+                "status": request.build_absolute_uri(
+                    reverse("job-detail", args=[job.pk])
+                ),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
@@ -0,0 +1,127 @@
+"""Move cold expenses from Expense to ExpenseArchive.
+
+Expense grows by a row per renewal forever, and every query on it (the
+renewal idempotency check, lists, exports) pays for the whole history.
+`archive_expenses` moves rows dated before a month into ExpenseArchive in
+batches, oldest ids first. Each batch is one transaction: an INSERT ...
+SELECT into the archive and a DELETE of the same rows, neither of which
+fires Expense signals, so MonthlySpend keeps counting archived expenses and
+reports (which read the rollups) are unchanged. `rollups.rebuild()` reads
+both tables.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import DateTimeField, Value
+from django.utils import timezone
+
+from . import versioning
+from .models import Expense, ExpenseArchive
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Columns copied from Expense, in the same order on both sides.
+ARCHIVE_FIELDS = (
+    "id",
+    "user",
+    "subscription",
+    "name",
+    "category",
+    "amount",
+    "currency",
+    "transaction_date",
+    "source",
+    "notes",
+    "created_at",
+    "updated_at",
+)
+
+
+@dataclass
+class ArchiveResult:
+    archived: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.archived / self.elapsed if self.elapsed else 0.0
+
+
+def archive_expenses(
+    before: date, batch_size: int = DEFAULT_BATCH_SIZE, progress=None
+) -> ArchiveResult:
+    """Move every expense dated before `before` into ExpenseArchive.
+
+    `progress(result)`, if given, is called after each batch commits.
+    """
+    result = ArchiveResult()
+    started = time.perf_counter()
+    while moved := _archive_batch(before, batch_size):
+        result.archived += moved
+        result.batches += 1
+        result.elapsed = time.perf_counter() - started
+        if progress:
+            progress(result)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _archive_batch(before: date, batch_size: int) -> int:
+    with transaction.atomic():
+        # Locked (where supported) so no edit lands between copy and delete.
+        rows = list(
+            Expense.objects.select_for_update()
+            .filter(transaction_date__lt=before)
+            .order_by("id")
+            .values_list("id", "user_id")[:batch_size]
+        )
+        if not rows:
+            return 0
+        # The batch is exactly the old rows in this id range, so the copy
+        # selects it without a parameter per row.
+        first, last = rows[0][0], rows[-1][0]
+        copied = _copy(
+            Expense.objects.filter(
+                transaction_date__lt=before, id__gte=first, id__lte=last
+            )
+        )
+        # Unlocked rows in the range can change between the two statements,
+        # so the delete removes only what the copy put in the archive.
+        archived = ExpenseArchive.objects.filter(id__gte=first, id__lte=last)
+        _delete(Expense.objects.filter(id__in=archived.values("id")))
+        versioning.bump(user_id for _, user_id in rows)
+    return copied
+
+
+def _copy(batch) -> int:
+    qn = connection.ops.quote_name
+    select, params = (
+        batch.order_by()
+        .annotate(archived=Value(timezone.now(), output_field=DateTimeField()))
+        .values_list(*ARCHIVE_FIELDS, "archived")
+        .query.sql_with_params()
+    )
+    columns = ", ".join(
+        qn(ExpenseArchive._meta.get_field(name).column)
+        for name in (*ARCHIVE_FIELDS, "archived_at")
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(ExpenseArchive._meta.db_table)} ({columns}) {select}",
+            params,
+        )
+        return cursor.rowcount
+
+
+def _delete(batch) -> None:
+    # A raw DELETE: Expense.delete() and QuerySet.delete() would send
+    # post_delete, which takes the rows out of MonthlySpend.
+    query = batch.query
+    where, params = query.get_compiler(connection=connection).compile(query.where)
+    table = connection.ops.quote_name(Expense._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {where}", params)
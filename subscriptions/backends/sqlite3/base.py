@@ -0,0 +1,98 @@
+"""SQLite backend that queues write transactions fairly within a process.
+
+SQLite admits one writer at a time and makes the others poll with growing
+sleeps, so a writer that commits and immediately begins again (the renewal
+job between chunks) keeps winning while API writes wait, sometimes until
+they time out. Here every transaction first takes a FIFO turn per database
+file, so threads of one process get the write lock in the order they asked
+for it. Pair it with `transaction_mode: IMMEDIATE`, which makes every
+transaction a write transaction from its first statement. Other processes
+still contend through SQLite's busy timeout.
+"""
+
+import threading
+from collections import deque
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+
+class WriteQueue:
+    """FIFO mutex: the releasing holder hands ownership to the oldest waiter."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._held = False
+
+    def acquire(self, timeout: float) -> bool:
+        with self._lock:
+            if not self._held:
+                self._held = True
+                return True
+            turn = threading.Event()
+            self._waiters.append(turn)
+        if turn.wait(timeout):
+            return True
+        with self._lock:
+            if turn.is_set():
+                return True
+            self._waiters.remove(turn)
+            return False
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._held = False
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def write_queue(name) -> WriteQueue:
+    with _queues_lock:
+        return _queues.setdefault(str(name), WriteQueue())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._in_write_queue = False
+
+    def _start_transaction_under_autocommit(self):
+        queue = write_queue(self.settings_dict["NAME"])
+        timeout = self.settings_dict["OPTIONS"].get("timeout", 5)
+        if not queue.acquire(timeout):
+            raise OperationalError("database is locked")
+        self._in_write_queue = True
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self._leave_write_queue()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._leave_write_queue()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._leave_write_queue()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self._leave_write_queue()
+
+    def _leave_write_queue(self):
+        if self._in_write_queue:
+            self._in_write_queue = False
+            write_queue(self.settings_dict["NAME"]).release()
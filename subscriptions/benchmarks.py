@@ -0,0 +1,209 @@
+"""Repeatable timings of renewals, report views, API lists and admin pages.
+
+`run()` times each scenario a few times and returns a JSON-ready report with
+the median, spread and query count of every scenario alongside the row
+counts it ran against, so two reports (e.g. before and after a change, on
+data from `seed_synthetic`) can be compared with `compare()`.
+
+The page scenarios log in as a temporary superuser, who sees every user's
+rows. The tenant scenarios fetch the same lists as one ordinary user (by
+default the first non-staff user with expenses), who sees only their own:
+their timings should hold steady as other tenants' data grows.
+
+Everything runs inside one transaction that is rolled back at the end: the
+renewals a scenario generates and the temporary superuser never reach the
+database.
+"""
+
+import platform
+import statistics
+import uuid
+from collections.abc import Callable
+from datetime import date
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import instrumentation
+from .models import Category, Expense, Subscription
+from .renewals import due_subscriptions, renew_subscriptions
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 1.2
+
+# Scenario name -> URL name of each page fetched over HTTP.
+PAGES = {
+    "expenses_list": "api_expenses_legacy",
+    "monthly_spend": "api_monthly_spend",
+    "api_categories": "category-list",
+    "api_subscriptions": "subscription-list",
+    "api_expenses": "expense-list",
+    "admin_categories": "admin:subscriptions_category_changelist",
+    "admin_subscriptions": "admin:subscriptions_subscription_changelist",
+    "admin_expenses": "admin:subscriptions_expense_changelist",
+}
+# Scenario name -> URL name of each page fetched as a single tenant.
+TENANT_PAGES = {
+    "tenant_expenses_list": "api_expenses_legacy",
+    "tenant_monthly_spend": "api_monthly_spend",
+    "tenant_categories": "category-list",
+    "tenant_subscriptions": "subscription-list",
+    "tenant_expenses": "expense-list",
+}
+SCENARIOS = ("renew_subscriptions", *PAGES, *TENANT_PAGES)
+# Query strings for pages that need one: the legacy list only pages on request.
+PAGE_QUERIES = {"api_expenses_legacy": "limit=100"}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def run(
+    names=SCENARIOS,
+    repeat: int = DEFAULT_REPEAT,
+    today: date | None = None,
+    tenant=None,
+) -> dict:
+    """Time every scenario in `names` `repeat` times, after one warm-up run.
+
+    Tenant scenarios run as `tenant`, or the first non-staff user with
+    expenses.
+    """
+    today = today or timezone.localdate()
+    if tenant is None and any(name in TENANT_PAGES for name in names):
+        tenant = default_tenant()
+        if tenant is None:
+            raise BenchmarkError(
+                "No non-staff user with expenses; run seed_synthetic first."
+            )
+    report = {
+        "created_at": timezone.now().isoformat(),
+        "database": connection.vendor,
+        "debug": settings.DEBUG,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "repeat": repeat,
+        "counts": {
+            "users": get_user_model().objects.count(),
+            "categories": Category.objects.count(),
+            "subscriptions": Subscription.objects.count(),
+            "due_subscriptions": due_subscriptions(today).count(),
+            "expenses": Expense.objects.count(),
+        },
+        "results": {},
+    }
+    if tenant is not None:
+        report["tenant"] = {
+            "username": tenant.get_username(),
+            "subscriptions": Subscription.objects.filter(user=tenant).count(),
+            "expenses": Expense.objects.filter(user=tenant).count(),
+        }
+    with transaction.atomic():
+        client = _client()
+        tenant_client = client_for(tenant) if tenant is not None else None
+        for name in names:
+            if name == "renew_subscriptions":
+                scenario = _renewals(today)
+            elif name in TENANT_PAGES:
+                scenario = _page(tenant_client, name, TENANT_PAGES[name])
+            else:
+                scenario = _page(client, name, PAGES[name])
+            report["results"][name] = _time(scenario, repeat)
+        transaction.set_rollback(True)
+    return report
+
+
+def compare(previous: dict, current: dict, threshold: float = DEFAULT_THRESHOLD):
+    """Yield (name, previous ms, current ms, ratio, regressed) per scenario.
+
+    A scenario regressed when its median grew by more than `threshold` times.
+    """
+    for name, result in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else 1
+        yield name, before["median_ms"], result["median_ms"], ratio, ratio > threshold
+
+
+def _time(scenario: Callable[[], dict], repeat: int) -> dict:
+    scenario()
+    timings = []
+    for _ in range(repeat):
+        with instrumentation.track() as metrics:
+            extra = scenario()
+        timings.append(metrics.total * 1000)
+    return {
+        "median_ms": round(statistics.median(timings), 2),
+        "min_ms": round(min(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "queries": metrics.queries,
+        "db_ms": round(metrics.db_time * 1000, 2),
+        **extra,
+    }
+
+
+def _renewals(today: date) -> Callable[[], dict]:
+    def scenario():
+        # Each run renews the same due set and then undoes it.
+        with transaction.atomic():
+            result = renew_subscriptions(due_subscriptions(today), today)
+            transaction.set_rollback(True)
+        return {"rows": result.created}
+
+    return scenario
+
+
+def page_url(url_name: str) -> str:
+    url = reverse(url_name)
+    query = PAGE_QUERIES.get(url_name)
+    return f"{url}?{query}" if query else url
+
+
+def _page(client: Client, name: str, url_name: str) -> Callable[[], dict]:
+    url = page_url(url_name)
+
+    def scenario():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise BenchmarkError(f"{name}: GET {url} returned {response.status_code}.")
+        return {"bytes": len(response.content)}
+
+    return scenario
+
+
+def _client() -> Client:
+    User = get_user_model()
+    username = f"benchmark-{uuid.uuid4().hex[:12]}"
+    user = User(**{User.USERNAME_FIELD: username}, is_staff=True, is_superuser=True)
+    user.set_unusable_password()
+    user.save()
+    return client_for(user)
+
+
+def default_tenant():
+    """The first non-staff user with expenses, or None."""
+    return (
+        get_user_model()
+        .objects.filter(
+            Exists(Expense.objects.filter(user=OuterRef("pk"))), is_staff=False
+        )
+        .order_by("pk")
+        .first()
+    )
+
+
+def client_for(user) -> Client:
+    """A test client logged in as `user`, on a host ALLOWED_HOSTS accepts."""
+    hosts = [host for host in settings.ALLOWED_HOSTS if host[:1] not in ("*", ".")]
+    client = Client(SERVER_NAME=hosts[0] if hosts else "localhost")
+    client.force_login(user)
+    return client
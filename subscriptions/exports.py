@@ -0,0 +1,246 @@
+"""Streaming exports of expenses and subscriptions as CSV or Parquet.
+
+Rows are read one calendar month at a time with a range query on the
+dataset's date column, in keyset chunks of EXPORT_CHUNK_SIZE rows. Each
+chunk is read in full before it is written out, so memory is bounded by
+the chunk size and no query or cursor stays open between chunks (or while
+a slow client reads).
+"""
+
+import csv
+import io
+import zlib
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import models
+from django.db.models import Max, Min, Q
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: pip install pyarrow (the "parquet" extra).
+    pa = pq = None
+
+from .forecast import month_index, month_start
+from .models import Expense, Subscription
+
+EXPORT_CHUNK_SIZE = 2000
+FORMATS = ("csv", "parquet")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    model: type[models.Model]
+    date_field: str
+    fields: tuple[str, ...]
+
+    @property
+    def columns(self) -> list[models.Field]:
+        opts = self.model._meta
+        return [opts.get_field(name) for name in self.fields]
+
+
+DATASETS = {
+    "expenses": Dataset(
+        Expense,
+        "transaction_date",
+        (
+            "id",
+            "user",
+            "subscription",
+            "category",
+            "name",
+            "amount",
+            "currency",
+            "transaction_date",
+            "source",
+            "notes",
+            "created_at",
+            "updated_at",
+        ),
+    ),
+    "subscriptions": Dataset(
+        Subscription,
+        "billing_date",
+        (
+            "id",
+            "user",
+            "category",
+            "name",
+            "billing_cycle",
+            "billing_interval_months",
+            "amount",
+            "currency",
+            "billing_date",
+            "next_renewal_date",
+            "status",
+            "notes",
+            "created_at",
+            "updated_at",
+        ),
+    ),
+}
+
+
+def parse_month(value: str) -> date:
+    """Parse YYYY-MM into the first day of that month."""
+    return date.fromisoformat(f"{value}-01")
+
+
+def export_months(
+    dataset: Dataset, queryset, since: date | None = None, until: date | None = None
+) -> list[date]:
+    """First days of every month with data, limited to [since, until]."""
+    bounds = queryset.aggregate(
+        first=Min(dataset.date_field), last=Max(dataset.date_field)
+    )
+    if bounds["first"] is None:
+        return []
+    start = max(month_index(bounds["first"]), month_index(since or bounds["first"]))
+    end = min(month_index(bounds["last"]), month_index(until or bounds["last"]))
+    return [month_start(index) for index in range(start, end + 1)]
+
+
+def month_chunks(dataset: Dataset, queryset, month: date) -> Iterator[list[tuple]]:
+    """Yield a month's rows in (date, pk) order, EXPORT_CHUNK_SIZE at a time.
+
+    Each chunk is its own query, seeking past the last row of the one before.
+    """
+    field = dataset.date_field
+    next_month = month_start(month_index(month) + 1)
+    rows = (
+        queryset.filter(**{f"{field}__gte": month, f"{field}__lt": next_month})
+        .order_by(field, "pk")
+        .values_list(*(column.attname for column in dataset.columns))
+    )
+    date_at = dataset.fields.index(field)
+    pk_at = dataset.fields.index(dataset.model._meta.pk.name)
+    size = EXPORT_CHUNK_SIZE
+    chunk = list(rows[:size])
+    while chunk:
+        yield chunk
+        if len(chunk) < size:
+            return
+        last = chunk[-1]
+        chunk = list(
+            rows.filter(
+                Q(**{f"{field}__gt": last[date_at]})
+                | Q(**{field: last[date_at], "pk__gt": last[pk_at]})
+            )[:size]
+        )
+
+
+def csv_chunks(dataset: Dataset, queryset, months: Iterable[date]) -> Iterator[bytes]:
+    """Yield the export as CSV bytes, one chunk of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(dataset.fields)
+    yield _drain(buffer).encode()
+    for month in months:
+        for rows in month_chunks(dataset, queryset, month):
+            writer.writerows(rows)
+            yield _drain(buffer).encode()
+
+
+def parquet_chunks(
+    dataset: Dataset, queryset, months: Iterable[date], compression: str = "snappy"
+) -> Iterator[bytes]:
+    """Yield the export as a Parquet file with one row group per chunk."""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (the parquet extra).")
+    schema = pa.schema(
+        [
+            (name, _arrow_type(field))
+            for name, field in zip(dataset.fields, dataset.columns)
+        ]
+    )
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema, compression=compression) as writer:
+        for month in months:
+            for rows in month_chunks(dataset, queryset, month):
+                columns = dict(zip(dataset.fields, zip(*rows)))
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                yield sink.drain()
+    yield sink.drain()
+
+
+def export_chunks(
+    dataset: Dataset,
+    queryset,
+    months: Iterable[date],
+    fmt: str = "csv",
+    compress: bool = False,
+) -> Iterator[bytes]:
+    """CSV (gzipped as a whole when `compress`) or gzip-compressed Parquet."""
+    if fmt == "parquet":
+        return parquet_chunks(
+            dataset, queryset, months, compression="gzip" if compress else "snappy"
+        )
+    chunks = csv_chunks(dataset, queryset, months)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a byte stream into a gzip stream incrementally."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+
+def file_extension(fmt: str, compress: bool) -> str:
+    # Parquet compresses per column chunk; the file itself stays .parquet.
+    if fmt == "parquet":
+        return "parquet"
+    return "csv.gz" if compress else "csv"
+
+
+def _drain(buffer: io.StringIO) -> str:
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def _arrow_type(field: models.Field):
+    if field.is_relation:
+        field = field.target_field
+    internal = field.get_internal_type()
+    if internal == "DecimalField":
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if internal == "DateField":
+        return pa.date32()
+    if internal == "DateTimeField":
+        return pa.timestamp("us", tz="UTC")
+    if internal == "BooleanField":
+        return pa.bool_()
+    if internal.endswith(("AutoField", "IntegerField")):
+        return pa.int64()
+    return pa.string()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since last drain."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
@@ -0,0 +1,85 @@
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+
+from .models import Subscription
+
+
+def month_index(value: date) -> int:
+    return value.year * 12 + value.month - 1
+
+
+def month_start(index: int) -> date:
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def project_spend(queryset, start: date, months: int) -> dict:
+    """Project renewals of active subscriptions over `months` calendar months.
+
+    Loads every subscription in one query, then expands all renewals at once:
+    row i renews in month `first[i] + k * interval[i]`. Overdue subscriptions
+    are counted in the first month, matching what `renew_subscriptions` will
+    charge on its next run.
+    """
+    rows = list(
+        queryset.filter(
+            status=Subscription.Status.ACTIVE, next_renewal_date__isnull=False
+        ).values_list(
+            "next_renewal_date",
+            "billing_interval_months",
+            "amount",
+            "currency",
+            "category__name",
+        )
+    )
+    start_index = month_index(start)
+    results = [
+        {"month": month_label(start_index + offset), "totals": [], "categories": []}
+        for offset in range(months)
+    ]
+    if not rows:
+        return {"start": month_label(start_index), "months": months, "results": results}
+
+    groups: dict[tuple[str, str], int] = {}
+    group_of_row = np.array(
+        [groups.setdefault((row[4], row[3]), len(groups)) for row in rows]
+    )
+    first = np.array([month_index(row[0]) for row in rows]) - start_index
+    first = np.maximum(first, 0)
+    intervals = np.array([max(1, row[1]) for row in rows])
+    cents = np.array([int(row[2] * 100) for row in rows], dtype=np.int64)
+
+    cycles = np.arange(-(-months // int(intervals.min())))
+    renewal_months = first[:, None] + cycles[None, :] * intervals[:, None]
+    in_horizon = renewal_months < months
+    row_ids = np.nonzero(in_horizon)[0]
+
+    totals = np.zeros((len(groups), months), dtype=np.int64)
+    np.add.at(
+        totals, (group_of_row[row_ids], renewal_months[in_horizon]), cents[row_ids]
+    )
+
+    currency_totals: list[dict[str, int]] = [{} for _ in range(months)]
+    for (category, currency), group in sorted(groups.items()):
+        for offset in np.nonzero(totals[group])[0].tolist():
+            amount = int(totals[group, offset])
+            results[offset]["categories"].append(
+                {"category": category, "currency": currency, "total": _money(amount)}
+            )
+            by_currency = currency_totals[offset]
+            by_currency[currency] = by_currency.get(currency, 0) + amount
+    for result, by_currency in zip(results, currency_totals):
+        result["totals"] = [
+            {"currency": currency, "total": _money(amount)}
+            for currency, amount in sorted(by_currency.items())
+        ]
+    return {"start": month_label(start_index), "months": months, "results": results}
+
+
+def _money(cents: int) -> str:
+    return str(Decimal(cents).scaleb(-2))
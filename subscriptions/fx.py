@@ -0,0 +1,150 @@
+"""Currency conversion for reports, backed by the ExchangeRate table.
+
+Reports group amounts by currency in SQL first, then convert each group
+total once, so a report over a million expenses needs a handful of rate
+lookups rather than one per row. Every rate up to a report's last date is
+loaded in one query and the rate for each date is picked in Python. Loaded
+rates are cached per process in an LRU keyed by that date and the table's
+state, so loading new rates is picked up by every process without explicit
+invalidation.
+"""
+
+import csv
+from bisect import bisect_right
+from collections.abc import Iterable
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from . import versioning
+from .models import ExchangeRate
+
+RATE_CACHE_SIZE = 256
+LOAD_BATCH_SIZE = 1000
+CENT = Decimal("0.01")
+
+
+class MissingRate(LookupError):
+    pass
+
+
+def reporting_currency() -> str:
+    return getattr(settings, "REPORTING_CURRENCY", "AUD")
+
+
+def rates_state() -> tuple:
+    """Cheap fingerprint of the rate table; changes whenever rates do."""
+    state = ExchangeRate.objects.aggregate(
+        updated=Max("updated_at"), count=Count("id")
+    )
+    return state["updated"], state["count"]
+
+
+def rate(
+    base: str,
+    quote: str,
+    on: date,
+    state: tuple | None = None,
+    until: date | None = None,
+) -> Decimal:
+    """Return how many `quote` one `base` buys on `on`.
+
+    Uses the latest rate on or before `on`: the direct pair, its inverse, or
+    a cross rate through a currency both sides are quoted against. Rates are
+    loaded up to `until` (default `on`), so lookups for any date up to the
+    same `until` share one query.
+    """
+    if base == quote:
+        return Decimal(1)
+    until = on if until is None else max(on, until)
+    table = _rate_table(on, rates_state() if state is None else state, until)
+    if (base, quote) in table:
+        return table[base, quote]
+    if (quote, base) in table:
+        return 1 / table[quote, base]
+    for (pivot, other), pivot_quote in table.items():
+        if other == quote and (pivot, base) in table:
+            return pivot_quote / table[pivot, base]
+    raise MissingRate(f"No {base}/{quote} rate on or before {on}.")
+
+
+def convert_totals(
+    totals: Iterable[tuple[str, Decimal]], quote: str, on: date
+) -> tuple[Decimal, list[tuple[str, Decimal]]]:
+    """Sum per-currency totals in `quote`.
+
+    Returns (converted total, [(currency, total)] that had no rate).
+    """
+    state = rates_state()
+    converted = Decimal(0)
+    unconverted = []
+    for currency, total in totals:
+        try:
+            converted += total * rate(currency, quote, on, state)
+        except MissingRate:
+            unconverted.append((currency, total))
+    return converted.quantize(CENT), unconverted
+
+
+def load_csv(stream) -> int:
+    """Upsert rates from a CSV with date, base, quote and rate columns."""
+    reader = csv.DictReader(stream)
+    loaded = 0
+    batch = []
+    for row in reader:
+        batch.append(
+            ExchangeRate(
+                date=date.fromisoformat(row["date"].strip()),
+                base=row["base"].strip().upper(),
+                quote=row["quote"].strip().upper(),
+                rate=Decimal(row["rate"].strip()),
+            )
+        )
+        if len(batch) >= LOAD_BATCH_SIZE:
+            loaded += _upsert(batch)
+            batch = []
+    loaded += _upsert(batch)
+    if loaded:
+        # Converted reports of every user may change.
+        versioning.bump_all()
+    return loaded
+
+
+def _upsert(rates: list[ExchangeRate]) -> int:
+    ExchangeRate.objects.bulk_create(
+        rates,
+        update_conflicts=True,
+        unique_fields=["base", "quote", "date"],
+        update_fields=["rate", "updated_at"],
+    )
+    return len(rates)
+
+
+@lru_cache(maxsize=RATE_CACHE_SIZE)
+def _rate_history(until: date, state: tuple) -> dict:
+    """{(base, quote): (dates, rates)} on or before `until`, in one query."""
+    history = {}
+    rows = (
+        ExchangeRate.objects.filter(date__lte=until)
+        .order_by("base", "quote", "date")
+        .values_list("base", "quote", "date", "rate")
+    )
+    for base, quote, day, value in rows:
+        dates, rates = history.setdefault((base, quote), ([], []))
+        dates.append(day)
+        rates.append(value)
+    return history
+
+
+@lru_cache(maxsize=RATE_CACHE_SIZE)
+def _rate_table(on: date, state: tuple, until: date) -> dict[tuple[str, str], Decimal]:
+    """Latest rate per (base, quote) on or before `on`."""
+    table = {}
+    for pair, (dates, rates) in _rate_history(until, state).items():
+        index = bisect_right(dates, on)
+        if index:
+            table[pair] = rates[index - 1]
+    return table
@@ -0,0 +1,289 @@
+"""Streaming import of bank statements (CSV or OFX) into Expense.
+
+Rows are parsed lazily, validated and inserted one chunk at a time, so memory
+stays bounded by the batch size however long the file is.
+"""
+
+import csv
+import re
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from . import rollups, versioning
+from .models import Category, Expense, ExpenseArchive
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CATEGORY = "Uncategorized"
+MAX_REPORTED_ERRORS = 20
+
+CSV_ALIASES = {
+    "date": ("date", "transaction_date", "posted"),
+    "name": ("name", "description", "payee", "merchant"),
+    "amount": ("amount", "value", "debit"),
+    "currency": ("currency",),
+    "category": ("category",),
+    "notes": ("notes", "memo", "reference"),
+}
+
+_NAME_LENGTH = Expense._meta.get_field("name").max_length
+_CATEGORY_LENGTH = Category._meta.get_field("name").max_length
+_AMOUNT_FIELD = Expense._meta.get_field("amount")
+_AMOUNT_INTEGER_DIGITS = _AMOUNT_FIELD.max_digits - _AMOUNT_FIELD.decimal_places
+_OFX_TAG = re.compile(r"<(/?)([A-Z0-9.]+)>([^<\r\n]*)")
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    errors: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "elapsed": round(self.elapsed, 3),
+            "rows_per_second": round(self.rate),
+        }
+
+
+def detect_format(filename: str) -> str:
+    return "ofx" if filename.lower().endswith((".ofx", ".qfx")) else "csv"
+
+
+def parse_file(path, fmt: str | None = None, signed: bool = True) -> Iterator[dict]:
+    """Stream parsed rows from a CSV or OFX file on disk.
+
+    `signed` applies to CSV amounts; OFX amounts are always signed.
+    """
+    # utf-8-sig drops the BOM some banks prepend; OFX may carry latin-1 bytes.
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as stream:
+        if (fmt or detect_format(str(path))) == "ofx":
+            yield from parse_ofx(stream)
+        else:
+            yield from parse_csv(stream, signed=signed)
+
+
+def parse_csv(stream, signed: bool = True) -> Iterator[dict]:
+    """Yield debit rows from a CSV with a header, mapping common column names.
+
+    With `signed` amounts, as in OFX, negative amounts are debits (reported
+    as positive expenses) and credits are skipped. Otherwise every amount is
+    a debit; a "debit" column is always read that way, and its blank cells
+    are credit lines.
+    """
+    reader = csv.DictReader(stream)
+    headers = {name.strip().lower(): name for name in reader.fieldnames or []}
+    columns = {
+        key: next((headers[a] for a in aliases if a in headers), None)
+        for key, aliases in CSV_ALIASES.items()
+    }
+    debit_column = "debit" in headers and columns["amount"] == headers["debit"]
+    for line, record in enumerate(reader, start=2):
+        row = {key: column and record.get(column) for key, column in columns.items()}
+        row["line"] = line
+        if debit_column:
+            if not (row["amount"] or "").strip():
+                continue
+        elif signed:
+            row["amount"] = _debit(row["amount"] or "")
+            if row["amount"] is None:
+                continue
+        yield row
+
+
+def _debit(value: str) -> str | None:
+    """The debit in a signed amount, or None for a credit.
+
+    Unparseable values are passed through for `_expense` to report.
+    """
+    value = value.strip()
+    if value.startswith("-"):
+        return value[1:]
+    try:
+        credit = Decimal(value.replace(",", ""))
+    except InvalidOperation:
+        return value
+    return None if credit.is_finite() else value
+
+
+def parse_ofx(stream) -> Iterator[dict]:
+    """Yield debit transactions from an OFX/QFX statement (SGML or XML).
+
+    Credits are skipped; debit amounts are reported as positive expenses.
+    """
+    currency = None
+    current = None
+    for line_number, line in enumerate(stream, start=1):
+        for closing, tag, value in _OFX_TAG.findall(line):
+            value = value.strip()
+            if tag == "CURDEF" and not closing:
+                currency = value
+            elif tag == "STMTTRN":
+                if closing and current is not None:
+                    if current.get("amount", "").startswith("-"):
+                        yield {
+                            "date": current.get("date"),
+                            "name": current.get("name") or current.get("notes"),
+                            "amount": current["amount"].lstrip("-"),
+                            "currency": currency,
+                            "category": None,
+                            "notes": current.get("notes"),
+                            "line": current["line"],
+                        }
+                    current = None
+                elif not closing:
+                    current = {"line": line_number}
+            elif current is not None and not closing:
+                key = {
+                    "DTPOSTED": "date",
+                    "TRNAMT": "amount",
+                    "NAME": "name",
+                    "MEMO": "notes",
+                }.get(tag)
+                if key:
+                    current[key] = value
+
+
+def import_expenses(
+    rows: Iterable[dict],
+    user,
+    currency: str = "AUD",
+    category: str = DEFAULT_CATEGORY,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress=None,
+) -> ImportResult:
+    """Validate and bulk insert parsed rows as manual expenses of `user`.
+
+    A row matching an existing expense (or an earlier row of the same chunk)
+    on (user, date, amount, name) is counted as a duplicate, so re-importing
+    an overlapping statement only adds the new lines.
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    categories = dict(Category.objects.filter(user=user).values_list("name", "id"))
+    rows = iter(rows)
+    while chunk := list(islice(rows, batch_size)):
+        result.rows += len(chunk)
+        expenses = []
+        for row in chunk:
+            try:
+                expenses.append(_expense(row, user, currency, category))
+            except ValueError as exc:
+                result.invalid += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append(f"Line {row.get('line')}: {exc}")
+        _resolve_categories(expenses, user, categories)
+        with transaction.atomic():
+            fresh = _drop_duplicates(expenses, user)
+            result.duplicates += len(expenses) - len(fresh)
+            Expense.objects.bulk_create(fresh)
+            rollups.record_expenses(fresh)
+        result.created += len(fresh)
+        if progress is not None:
+            progress(result.rows)
+    if result.created:
+        versioning.bump([user.pk])
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _expense(row: dict, user, currency: str, category: str) -> Expense:
+    name = (row.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required.")
+    try:
+        amount = Decimal((row.get("amount") or "").replace(",", "").strip())
+        amount = amount.quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"invalid amount {row.get('amount')!r}.")
+    if not amount.is_finite() or amount.adjusted() >= _AMOUNT_INTEGER_DIGITS:
+        raise ValueError(f"invalid amount {row.get('amount')!r}.")
+    if amount < 0:
+        raise ValueError(f"negative amount {row.get('amount')!r}.")
+    code = (row.get("currency") or currency).strip().upper()
+    if len(code) != 3 or not code.isalpha():
+        raise ValueError(f"invalid currency {code!r}.")
+    category_name = (row.get("category") or "").strip() or category
+    if len(category_name) > _CATEGORY_LENGTH:
+        raise ValueError(f"category is longer than {_CATEGORY_LENGTH} characters.")
+    expense = Expense(
+        user=user,
+        name=name[:_NAME_LENGTH],
+        amount=amount,
+        currency=code,
+        transaction_date=_parse_date(row.get("date") or ""),
+        source=Expense.Source.MANUAL,
+        notes=(row.get("notes") or "").strip(),
+    )
+    # Resolved to an id in bulk by _resolve_categories.
+    expense._category_name = category_name
+    return expense
+
+
+def _parse_date(value: str) -> date:
+    value = value.strip()
+    if re.match(r"^\d{8}", value):  # OFX: YYYYMMDD[HHMMSS[.XXX]][TZ]
+        return datetime.strptime(value[:8], "%Y%m%d").date()
+    for pattern in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, pattern).date()
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date {value!r}.")
+
+
+def _resolve_categories(expenses: list[Expense], user, cache: dict) -> None:
+    missing = {e._category_name for e in expenses} - cache.keys()
+    if missing:
+        Category.objects.bulk_create(
+            [Category(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        cache.update(
+            Category.objects.filter(user=user, name__in=missing).values_list(
+                "name", "id"
+            )
+        )
+    for expense in expenses:
+        expense.category_id = cache[expense._category_name]
+
+
+def _drop_duplicates(expenses: list[Expense], user) -> list[Expense]:
+    if not expenses:
+        return []
+    dates = [e.transaction_date for e in expenses]
+    seen = set()
+    # Archived rows count too, so re-importing an old statement adds nothing.
+    for model in (Expense, ExpenseArchive):
+        seen.update(
+            model.objects.filter(
+                user=user,
+                transaction_date__gte=min(dates),
+                transaction_date__lte=max(dates),
+                name__in={e.name for e in expenses},
+            ).values_list("transaction_date", "amount", "name")
+        )
+    fresh = []
+    for expense in expenses:
+        key = (expense.transaction_date, expense.amount, expense.name)
+        if key not in seen:
+            seen.add(key)
+            fresh.append(expense)
+    return fresh
@@ -0,0 +1,195 @@
+"""Per-request query counts, DB time, serializer time and latency.
+
+`track()` records every query run on any connection while it is open (via
+`connection.execute_wrapper`), and `section(name)` adds timed sections such
+as serialization to the innermost tracker. `InstrumentationMiddleware`
+tracks each request, reports it in a Server-Timing header, aggregates it
+per view for the metrics endpoint and enforces QUERY_BUDGETS.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("instrumentation_metrics", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Metrics:
+    """Counters for one tracked block; also the execute wrapper feeding them."""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.queries = 0
+        self.db_time = 0.0
+        self.sections = defaultdict(float)
+        self.started = time.perf_counter()
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def server_timing(self) -> str:
+        db_ms = self.db_time * 1000
+        entries = [f'db;dur={db_ms:.1f};desc="{self.queries} queries"']
+        for name, seconds in self.sections.items():
+            entries.append(f"{name};dur={seconds * 1000:.1f}")
+        entries.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def track(name: str = ""):
+    """Record queries and timings of the enclosed block into a Metrics."""
+    metrics = Metrics(name)
+    token = _current.set(metrics)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            yield metrics
+    finally:
+        metrics.total = time.perf_counter() - metrics.started
+        _current.reset(token)
+
+
+@contextmanager
+def section(name: str):
+    """Add the enclosed block's time to `name` on the current tracker."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.sections[name] += time.perf_counter() - started
+
+
+@contextmanager
+def query_budget(limit: int, name: str = "block"):
+    """Raise QueryBudgetExceeded if the block runs more than `limit` queries."""
+    with track(name) as metrics:
+        yield metrics
+    if metrics.queries > limit:
+        raise QueryBudgetExceeded(
+            f"{name} ran {metrics.queries} queries; budget is {limit}."
+        )
+
+
+def budget_for(method: str, view: str) -> int | None:
+    """QUERY_BUDGETS entry for "METHOD view", else "view", else "*"."""
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    for key in (f"{method} {view}", view, "*"):
+        if key in budgets:
+            return budgets[key]
+    return None
+
+
+class _Registry:
+    """Per-view aggregates since process start (or the last `reset`)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, key: str, metrics: Metrics, budget: int | None) -> None:
+        with self._lock:
+            stats = self._views.setdefault(
+                key,
+                {
+                    "requests": 0,
+                    "queries": 0,
+                    "max_queries": 0,
+                    "db_ms": 0.0,
+                    "total_ms": 0.0,
+                    "max_total_ms": 0.0,
+                    "sections_ms": defaultdict(float),
+                    "budget": budget,
+                    "over_budget": 0,
+                },
+            )
+            stats["requests"] += 1
+            stats["queries"] += metrics.queries
+            stats["max_queries"] = max(stats["max_queries"], metrics.queries)
+            stats["db_ms"] += metrics.db_time * 1000
+            stats["total_ms"] += metrics.total * 1000
+            stats["max_total_ms"] = max(stats["max_total_ms"], metrics.total * 1000)
+            for name, seconds in metrics.sections.items():
+                stats["sections_ms"][name] += seconds * 1000
+            if budget is not None and metrics.queries > budget:
+                stats["over_budget"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            views = {}
+            for key, stats in sorted(self._views.items()):
+                count = stats["requests"]
+                views[key] = {
+                    "requests": count,
+                    "avg_queries": round(stats["queries"] / count, 2),
+                    "max_queries": stats["max_queries"],
+                    "avg_db_ms": round(stats["db_ms"] / count, 2),
+                    "avg_total_ms": round(stats["total_ms"] / count, 2),
+                    "max_total_ms": round(stats["max_total_ms"], 2),
+                    "avg_sections_ms": {
+                        name: round(total / count, 2)
+                        for name, total in stats["sections_ms"].items()
+                    },
+                    "budget": stats["budget"],
+                    "over_budget": stats["over_budget"],
+                }
+            return views
+
+    def reset(self) -> None:
+        with self._lock:
+            self._views.clear()
+
+
+registry = _Registry()
+
+
+class InstrumentationMiddleware:
+    """Track every request; list it first so session/auth queries count too.
+
+    Requests over their QUERY_BUDGETS entry (keyed by "METHOD url-name" or
+    "url-name", "*" for the default) are logged, or raise QueryBudgetExceeded
+    when QUERY_BUDGETS_STRICT is set, which fails the test that made them.
+    Queries a streaming response runs while being consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track(request.path) as metrics:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unresolved"
+        budget = budget_for(request.method, view)
+        response["Server-Timing"] = metrics.server_timing()
+        key = f"{request.method} {view}"
+        registry.record(key, metrics, budget)
+        if budget is not None and metrics.queries > budget:
+            message = f"{key} ran {metrics.queries} queries; budget is {budget}."
+            if getattr(settings, "QUERY_BUDGETS_STRICT", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
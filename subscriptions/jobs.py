@@ -0,0 +1,191 @@
+"""Background jobs queued in the Job table.
+
+Handlers register under a kind with `@handler("kind")` and receive the Job
+and its payload; they may call `report_progress` while running and return a
+JSON-serializable result. `run_worker` processes claim pending jobs; with
+`JOBS_RUN_IN_THREAD` enabled, `enqueue` also starts a thread for the job
+(while fewer than JOBS_MAX_THREADS are running) so nothing waits when no
+worker is running. Claims are conditional updates, so a job runs once
+however many workers and threads race for it.
+"""
+
+import logging
+import threading
+import traceback
+from datetime import timedelta
+from functools import cache
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+handlers = {}
+
+ACTIVE_STATUSES = (Job.Status.PENDING, Job.Status.RUNNING)
+RETRY_BACKOFF_SECONDS = 30
+THREAD_WORKER_PREFIX = "thread-"
+
+
+def handler(kind: str):
+    def register(func):
+        handlers[kind] = func
+        return func
+
+    return register
+
+
+def enqueue(
+    kind: str,
+    payload: dict,
+    total: int | None = None,
+    dedup_key: str = "",
+    max_attempts: int = 3,
+    user=None,
+) -> Job:
+    """Queue a job; with a `dedup_key`, reuse an already active job instead.
+
+    `user`, who the job is for, is the one user besides staff who sees it.
+    """
+    if kind not in handlers:
+        raise ValueError(f"Unknown job kind {kind!r}.")
+    active = Job.objects.filter(dedup_key=dedup_key, status__in=ACTIVE_STATUSES)
+    if dedup_key:
+        existing = active.first()
+        if existing is not None:
+            return existing
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                kind=kind,
+                user=user,
+                payload=payload,
+                progress_total=total,
+                dedup_key=dedup_key,
+                max_attempts=max_attempts,
+            )
+    except IntegrityError:
+        if not dedup_key:
+            raise
+        # Lost a race with another enqueue of the same key.
+        return active.get()
+    if getattr(settings, "JOBS_RUN_IN_THREAD", False):
+        transaction.on_commit(lambda: start_thread(job.pk))
+    return job
+
+
+def start_thread(job_id: int) -> threading.Thread | None:
+    """Run `job_id` in a daemon thread, if one of JOBS_MAX_THREADS is free.
+
+    Otherwise the job stays pending until a worker claims it.
+    """
+    slots = _thread_slots(getattr(settings, "JOBS_MAX_THREADS", 4))
+    if not slots.acquire(blocking=False):
+        return None
+
+    def target():
+        close_old_connections()
+        try:
+            job = claim(f"{THREAD_WORKER_PREFIX}{job_id}", job_id=job_id)
+            if job is not None:
+                run(job)
+        finally:
+            connections.close_all()
+            slots.release()
+
+    thread = threading.Thread(target=target, name=f"job-{job_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+@cache
+def _thread_slots(size: int) -> threading.BoundedSemaphore:
+    return threading.BoundedSemaphore(size)
+
+
+def claim(worker: str, kinds=None, job_id: int | None = None) -> Job | None:
+    """Atomically take the oldest runnable job (or `job_id`) for `worker`."""
+    candidates = Job.objects.filter(
+        status=Job.Status.PENDING, run_after__lte=timezone.now()
+    )
+    if job_id is not None:
+        candidates = candidates.filter(pk=job_id)
+    if kinds:
+        candidates = candidates.filter(kind__in=kinds)
+    candidates = candidates.order_by("run_after", "id").values_list("pk", flat=True)
+    for pk in candidates[:10]:
+        claimed = Job.objects.filter(pk=pk, status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING,
+            attempts=F("attempts") + 1,
+            worker=worker,
+            started_at=timezone.now(),
+            finished_at=None,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job: Job) -> None:
+    """Run a claimed job, then record success, a retry or the failure."""
+    try:
+        result = handlers[job.kind](job, job.payload)
+    except Exception:
+        logger.exception(
+            "Job %s (%s) failed on attempt %s", job.pk, job.kind, job.attempts
+        )
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.Status.PENDING,
+                error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.Status.FAILED, error=error, finished_at=timezone.now()
+            )
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.SUCCEEDED, result=result, finished_at=timezone.now()
+        )
+
+
+def requeue_stale(timeout: timedelta) -> int:
+    """Requeue jobs left RUNNING longer than `timeout`, e.g. by a dead worker.
+
+    Jobs running in a thread of a web process are left alone: a worker cannot
+    tell a slow one from a dead one, and requeueing it would run it twice.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING, started_at__lt=now - timeout
+    ).exclude(worker__startswith=THREAD_WORKER_PREFIX)
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.Status.FAILED, error="Worker stopped responding.", finished_at=now
+    )
+    return stale.update(status=Job.Status.PENDING, run_after=now)
+
+
+def enqueue_periodic() -> list[Job]:
+    """Queue each JOBS_PERIODIC kind once per interval; cheap to call often.
+
+    JOBS_PERIODIC maps a kind to its interval in seconds. The dedup key names
+    the current interval, so only the first caller in each interval queues.
+    """
+    queued = []
+    now = timezone.now().timestamp()
+    for kind, seconds in getattr(settings, "JOBS_PERIODIC", {}).items():
+        dedup_key = f"periodic:{kind}:{int(now // seconds)}"
+        if not Job.objects.filter(dedup_key=dedup_key).exists():
+            queued.append(enqueue(kind, {}, dedup_key=dedup_key))
+    return queued
+
+
+def report_progress(job: Job, done: int) -> None:
+    Job.objects.filter(pk=job.pk).update(progress_done=done)
@@ -0,0 +1,232 @@
+"""Read latency while renewals and API writes contend for the database.
+
+`run()` measures API reads in two phases of equal length: with the database
+otherwise idle, then while `renew_subscriptions` runs in a loop in a
+separate process (as the renewal job does; a thread where fork is missing)
+and threads create expenses the way the API does. Each thread has its own
+connection, as separate requests would. Failed operations (notably SQLite's
+"database is locked") are counted per kind, so one report shows whether
+reads stay fast and whether writers queue instead of failing.
+
+Every write runs in a transaction that is rolled back, so the test leaves
+no data behind.
+"""
+
+import multiprocessing
+import statistics
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.utils import timezone
+
+from .benchmarks import client_for, page_url
+from .models import Category, Expense
+from .renewals import due_subscriptions, renew_subscriptions
+
+DEFAULT_DURATION = 5.0
+DEFAULT_READERS = 4
+DEFAULT_WRITERS = 2
+
+READ_URLS = (
+    "expense-list",
+    "subscription-list",
+    "api_expenses_legacy",
+    "api_monthly_spend",
+)
+
+
+@dataclass
+class Samples:
+    """Latencies of one kind of operation, plus its failures."""
+
+    timings: list[float] = field(default_factory=list)
+    errors: dict[str, int] = field(default_factory=dict)
+    rows: int = 0
+
+    def timed(self, operation: Callable[[], int | None]) -> None:
+        started = time.perf_counter()
+        try:
+            rows = operation()
+        except Exception as exc:
+            message = str(exc) or type(exc).__name__
+            self.errors[message] = self.errors.get(message, 0) + 1
+            return
+        self.timings.append((time.perf_counter() - started) * 1000)
+        self.rows += rows or 0
+
+    def merge(self, other: "Samples") -> None:
+        self.timings += other.timings
+        self.rows += other.rows
+        for message, count in other.errors.items():
+            self.errors[message] = self.errors.get(message, 0) + count
+
+    def summary(self, elapsed: float) -> dict:
+        timings = sorted(self.timings)
+        summary = {
+            "ok": len(timings),
+            "failed": sum(self.errors.values()),
+            "per_second": round(len(timings) / elapsed, 1) if elapsed else 0.0,
+            "errors": self.errors,
+        }
+        if self.rows:
+            summary["rows"] = self.rows
+        if len(timings) >= 2:
+            cuts = statistics.quantiles(timings, n=100)
+            summary.update(
+                p50_ms=round(cuts[49], 2),
+                p95_ms=round(cuts[94], 2),
+                p99_ms=round(cuts[98], 2),
+                max_ms=round(timings[-1], 2),
+            )
+        return summary
+
+
+def run(
+    user,
+    duration: float = DEFAULT_DURATION,
+    readers: int = DEFAULT_READERS,
+    writers: int = DEFAULT_WRITERS,
+    today: date | None = None,
+) -> dict:
+    """Measure reads as `user` while idle, then during renewals and writes."""
+    today = today or timezone.localdate()
+    clients = [client_for(user) for _ in range(readers)]
+    urls = [page_url(name) for name in READ_URLS]
+    report = {
+        "created_at": timezone.now().isoformat(),
+        "database": connection.vendor,
+        "options": _options(),
+        "duration_s": duration,
+        "readers": readers,
+        "writers": writers,
+        "due_subscriptions": due_subscriptions(today).count(),
+        "phases": {},
+    }
+    try:
+        report["phases"]["idle"] = _phase(duration, clients, urls)
+        report["phases"]["renewing"] = _phase(
+            duration, clients, urls, user=user, writers=writers, today=today
+        )
+    finally:
+        for client in clients:
+            client.logout()
+    return report
+
+
+def _phase(duration, clients, urls, user=None, writers=0, today=None) -> dict:
+    samples = {"reads": Samples(), "writes": Samples(), "renewals": Samples()}
+    lock = threading.Lock()
+    renewals = None
+    if today is not None and "fork" in multiprocessing.get_all_start_methods():
+        # The renewal job is its own process in production; a thread here
+        # would also compete with the readers for the GIL.
+        context = multiprocessing.get_context("fork")
+        stop = context.Event()
+        results = context.SimpleQueue()
+        connections.close_all()
+        renewals = context.Process(target=_renewal_process, args=(today, stop, results))
+    else:
+        stop = threading.Event()
+
+    def worker(kind: str, operation: Callable[[], int | None]):
+        local = Samples()
+        try:
+            while not stop.is_set():
+                local.timed(operation)
+        finally:
+            connections.close_all()
+            with lock:
+                samples[kind].merge(local)
+
+    operations = [
+        ("reads", _reader(client, urls, index)) for index, client in enumerate(clients)
+    ]
+    if today is not None:
+        if renewals is None:
+            operations.append(("renewals", lambda: _renew(today)))
+        operations += [("writes", lambda: _write(user, today))] * writers
+    threads = [
+        threading.Thread(target=worker, args=(kind, operation))
+        for kind, operation in operations
+    ]
+    started = time.perf_counter()
+    if renewals is not None:
+        renewals.start()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if renewals is not None:
+        samples["renewals"].merge(results.get())
+        renewals.join()
+    elapsed = time.perf_counter() - started
+    return {
+        kind: sample.summary(elapsed)
+        for kind, sample in samples.items()
+        if sample.timings or sample.errors
+    }
+
+
+def _renewal_process(today: date, stop, results) -> None:
+    local = Samples()
+    try:
+        while not stop.is_set():
+            local.timed(lambda: _renew(today))
+    finally:
+        connections.close_all()
+        results.put(local)
+
+
+def _reader(client: Client, urls: list[str], offset: int) -> Callable[[], None]:
+    position = offset
+
+    def read():
+        nonlocal position
+        url = urls[position % len(urls)]
+        position += 1
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+
+    return read
+
+
+def _renew(today: date) -> int:
+    # Holds the write lock for a whole renewal run, then undoes it.
+    with transaction.atomic():
+        result = renew_subscriptions(due_subscriptions(today), today)
+        transaction.set_rollback(True)
+    return result.created
+
+
+def _write(user, today: date) -> None:
+    # The API's create path: Expense.save plus rollup and version updates.
+    with transaction.atomic():
+        category = Category.objects.filter(user=user).first()
+        if category is None:
+            category = Category.objects.create(user=user, name="Load test")
+        Expense.objects.create(
+            user=user,
+            category=category,
+            name="Load test",
+            amount=Decimal("1.00"),
+            transaction_date=today,
+        )
+        transaction.set_rollback(True)
+
+
+def _options() -> dict:
+    options = dict(connection.settings_dict.get("OPTIONS", {}))
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            options["journal_mode"] = cursor.fetchone()[0]
+    return options
@@ -0,0 +1,111 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from subscriptions.benchmarks import (
+    DEFAULT_REPEAT,
+    DEFAULT_THRESHOLD,
+    SCENARIOS,
+    BenchmarkError,
+    compare,
+    run,
+)
+
+
+class Command(BaseCommand):
+    help = "Time renewals, report views, API lists and admin pages; write JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            action="append",
+            choices=SCENARIOS,
+            help="Run only this scenario; repeat to run several.",
+        )
+        parser.add_argument(
+            "--tenant",
+            help="Username of the non-staff user the tenant_* scenarios run as; "
+            "defaults to the first one with expenses.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=DEFAULT_REPEAT,
+            help="Timed runs per scenario, after one warm-up run.",
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write the JSON report to, or '-' for stdout.",
+        )
+        parser.add_argument(
+            "--compare",
+            help="Earlier JSON report to compare medians against.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help="Median ratio over the earlier report that counts as a "
+            "regression (default %(default)s).",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error if any scenario regressed.",
+        )
+
+    def handle(self, *args, **options):
+        previous = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as stream:
+                    previous = json.load(stream)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+
+        tenant = None
+        if options["tenant"]:
+            User = get_user_model()
+            tenant = User.objects.filter(
+                **{User.USERNAME_FIELD: options["tenant"]}
+            ).first()
+            if tenant is None or tenant.is_staff:
+                raise CommandError(f"No non-staff user {options['tenant']!r}.")
+
+        try:
+            report = run(
+                options["only"] or SCENARIOS, max(1, options["repeat"]), tenant=tenant
+            )
+        except BenchmarkError as exc:
+            raise CommandError(str(exc))
+
+        data = json.dumps(report, indent=2) + "\n"
+        if options["output"] == "-":
+            sys.stdout.write(data)
+        else:
+            with open(options["output"], "w") as stream:
+                stream.write(data)
+        # Keep stdout pure JSON; the summary goes to stderr.
+        for name, result in report["results"].items():
+            self.stderr.write(
+                f"{name:<22} {result['median_ms']:>10.2f} ms  "
+                f"{result['queries']:>4} queries"
+            )
+
+        if previous is None:
+            return
+        regressions = []
+        for name, before, after, ratio, regressed in compare(
+            previous, report, options["threshold"]
+        ):
+            line = f"{name:<22} {before:>10.2f} -> {after:>10.2f} ms  x{ratio:.2f}"
+            if regressed:
+                regressions.append(name)
+                self.stderr.write(self.style.ERROR(line + "  REGRESSION"))
+            else:
+                self.stderr.write(line)
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"Regressed: {', '.join(regressions)}.")
@@ -0,0 +1,108 @@
+import sys
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from subscriptions.exports import (
+    DATASETS,
+    FORMATS,
+    export_chunks,
+    export_months,
+    file_extension,
+    parse_month,
+    pq,
+)
+
+
+class Command(BaseCommand):
+    help = "Stream expenses or subscriptions to CSV or Parquet, month by month."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(DATASETS))
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Gzip CSV output; use gzip instead of snappy for Parquet columns.",
+        )
+        parser.add_argument("--since", help="First month to export (YYYY-MM).")
+        parser.add_argument("--until", help="Last month to export (YYYY-MM).")
+        parser.add_argument("--user", help="Only export this user's rows.")
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write, or '-' for stdout (CSV only). With --per-month, "
+            "a directory that receives one file per month.",
+        )
+        parser.add_argument(
+            "--per-month",
+            action="store_true",
+            help="Write each month to its own file, e.g. expenses-2025-01.csv.",
+        )
+
+    def handle(self, *args, **options):
+        dataset = DATASETS[options["dataset"]]
+        fmt = options["format"]
+        compress = options["gzip"]
+        if fmt == "parquet" and pq is None:
+            raise CommandError("Parquet export requires pyarrow (the parquet extra).")
+        try:
+            since = options["since"] and parse_month(options["since"])
+            until = options["until"] and parse_month(options["until"])
+        except ValueError:
+            raise CommandError("--since and --until must be YYYY-MM.")
+
+        queryset = dataset.model.objects.all()
+        if options["user"]:
+            User = get_user_model()
+            try:
+                user = User.objects.get(**{User.USERNAME_FIELD: options["user"]})
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']!r}.")
+            queryset = queryset.filter(user=user)
+
+        months = export_months(dataset, queryset, since, until)
+        output = options["output"]
+        started = time.perf_counter()
+        if options["per_month"]:
+            if output == "-":
+                raise CommandError("--per-month needs --output DIRECTORY.")
+            directory = Path(output)
+            directory.mkdir(parents=True, exist_ok=True)
+            extension = file_extension(fmt, compress)
+            written = 0
+            for month in months:
+                path = directory / f"{options['dataset']}-{month:%Y-%m}.{extension}"
+                written += self._write(
+                    path, export_chunks(dataset, queryset, [month], fmt, compress)
+                )
+        elif output == "-":
+            if fmt == "parquet" or compress:
+                raise CommandError("Binary output needs --output FILE.")
+            written = 0
+            for chunk in export_chunks(dataset, queryset, months):
+                sys.stdout.buffer.write(chunk)
+                written += len(chunk)
+            sys.stdout.flush()
+        else:
+            written = self._write(
+                Path(output), export_chunks(dataset, queryset, months, fmt, compress)
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            self.style.SUCCESS(
+                f"Export complete. Months: {len(months)}, Bytes: {written} "
+                f"in {elapsed:.2f}s"
+            )
+        )
+
+    def _write(self, path: Path, chunks) -> int:
+        written = 0
+        with open(path, "wb") as stream:
+            for chunk in chunks:
+                stream.write(chunk)
+                written += len(chunk)
+        return written
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from subscriptions.importers import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CATEGORY,
+    import_expenses,
+    parse_file,
+)
+from subscriptions.matching import match_expenses
+from subscriptions.models import Expense
+
+
+class Command(BaseCommand):
+    help = "Import bank statement lines (CSV or OFX) as manual expenses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or OFX/QFX file to import.")
+        parser.add_argument("--user", required=True, help="Username to import for.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ofx"],
+            help="File format; detected from the extension by default.",
+        )
+        parser.add_argument(
+            "--unsigned",
+            action="store_true",
+            help=(
+                "CSV amounts are all debits. By default negative amounts are "
+                "debits and positive ones credits, which are skipped."
+            ),
+        )
+        parser.add_argument(
+            "--currency",
+            default="AUD",
+            help="Currency for rows that do not specify one.",
+        )
+        parser.add_argument(
+            "--category",
+            default=DEFAULT_CATEGORY,
+            help="Category for rows that do not specify one; created if missing.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of rows validated and inserted per transaction.",
+        )
+        parser.add_argument(
+            "--match",
+            action="store_true",
+            help="Afterwards, link the user's manual expenses to subscriptions.",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{User.USERNAME_FIELD: options["user"]})
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}.")
+        try:
+            result = import_expenses(
+                parse_file(
+                    options["path"], options["format"], signed=not options["unsigned"]
+                ),
+                user,
+                currency=options["currency"],
+                category=options["category"],
+                batch_size=max(1, options["batch_size"]),
+            )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Import complete. Rows: {result.rows}, Created: {result.created}, "
+                f"Duplicates: {result.duplicates}, Invalid: {result.invalid} "
+                f"in {result.elapsed:.2f}s ({result.rate:.0f} rows/s)"
+            )
+        )
+        if options["match"]:
+            matched = match_expenses(Expense.objects.filter(user=user))
+            self.stdout.write(f"Linked to subscriptions: {matched.matched}")
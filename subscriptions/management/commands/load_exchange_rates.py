@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from subscriptions import fx
+
+
+class Command(BaseCommand):
+    help = "Load exchange rates from a CSV with date, base, quote, rate columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file, e.g. 2025-01-31,USD,AUD,1.6012")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], newline="", encoding="utf-8-sig") as stream:
+                count = fx.load_csv(stream)
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except (KeyError, ValueError, ArithmeticError) as exc:
+            raise CommandError(f"Invalid rates file: {exc!r}")
+        self.stdout.write(self.style.SUCCESS(f"Exchange rates loaded. Rows: {count}"))
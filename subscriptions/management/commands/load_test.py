@@ -0,0 +1,78 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from subscriptions.loadtest import (
+    DEFAULT_DURATION,
+    DEFAULT_READERS,
+    DEFAULT_WRITERS,
+    run,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure API read latency idle and while renewals and expense writes "
+        "run concurrently; write JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Username to read and write as; defaults to the first user.",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=DEFAULT_DURATION,
+            help="Seconds per phase (default %(default)s).",
+        )
+        parser.add_argument(
+            "--readers",
+            type=int,
+            default=DEFAULT_READERS,
+            help="Concurrent reader threads (default %(default)s).",
+        )
+        parser.add_argument(
+            "--writers",
+            type=int,
+            default=DEFAULT_WRITERS,
+            help="Concurrent expense writer threads beside the renewal thread "
+            "(default %(default)s).",
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write the JSON report to, or '-' for stdout.",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.order_by("pk")
+        if options["user"]:
+            users = users.filter(**{User.USERNAME_FIELD: options["user"]})
+        user = users.first()
+        if user is None:
+            raise CommandError("No such user; create one or run seed_synthetic.")
+
+        report = run(
+            user,
+            duration=max(0.1, options["duration"]),
+            readers=max(1, options["readers"]),
+            writers=max(0, options["writers"]),
+        )
+        data = json.dumps(report, indent=2) + "\n"
+        if options["output"] == "-":
+            sys.stdout.write(data)
+        else:
+            with open(options["output"], "w") as stream:
+                stream.write(data)
+        for phase, results in report["phases"].items():
+            for kind, summary in results.items():
+                self.stderr.write(
+                    f"{phase:<9} {kind:<9} {summary['ok']:>6} ok "
+                    f"{summary['failed']:>5} failed  "
+                    f"p95 {summary.get('p95_ms', 0):>8.2f} ms"
+                )
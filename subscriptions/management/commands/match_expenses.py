@@ -0,0 +1,62 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from subscriptions.matching import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WINDOW_DAYS,
+    match_expenses,
+)
+from subscriptions.models import Expense
+
+
+class Command(BaseCommand):
+    help = "Link manual expenses to the active subscriptions that billed them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only match this user's expenses.")
+        parser.add_argument(
+            "--window-days",
+            type=int,
+            default=DEFAULT_WINDOW_DAYS,
+            help="Days an expense may fall either side of a billing date.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of expenses matched and updated per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report how many expenses would be linked without saving.",
+        )
+
+    def handle(self, *args, **options):
+        expenses = Expense.objects.all()
+        if options["user"]:
+            User = get_user_model()
+            try:
+                user = User.objects.get(**{User.USERNAME_FIELD: options["user"]})
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']!r}.")
+            expenses = expenses.filter(user=user)
+
+        started = time.perf_counter()
+        result = match_expenses(
+            expenses,
+            window_days=max(0, options["window_days"]),
+            batch_size=max(1, options["batch_size"]),
+            dry_run=options["dry_run"],
+        )
+        elapsed = time.perf_counter() - started
+        rate = result.scanned / elapsed if elapsed else 0.0
+        verb = "Would link" if options["dry_run"] else "Linked"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Matching complete. Scanned: {result.scanned}, "
+                f"{verb}: {result.matched} in {elapsed:.2f}s ({rate:.0f} rows/s)"
+            )
+        )
@@ -0,0 +1,136 @@
+import sqlite3
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy every table from a SQLite database into PostgreSQL with COPY. "
+        "Both databases must be migrated to the same state first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=str(settings.BASE_DIR / "db.sqlite3"),
+            help="SQLite database file to copy from (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            choices=tuple(connections),
+            help="PostgreSQL database to copy into; its tables are emptied first.",
+        )
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_false",
+            dest="interactive",
+            help="Do not ask for confirmation before emptying the target tables.",
+        )
+
+    def handle(self, *args, **options):
+        target = connections[options["database"]]
+        if target.vendor != "postgresql":
+            raise CommandError(
+                f"{options['database']!r} is {target.vendor}, not PostgreSQL; "
+                "run with DATABASE_ENGINE=postgresql."
+            )
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        if not is_psycopg3:
+            raise CommandError("COPY needs psycopg 3 (the postgres extra).")
+        path = Path(options["source"])
+        if not path.is_file():
+            raise CommandError(f"No SQLite database at {path}.")
+        source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            self.copy(source, target, options)
+        finally:
+            source.close()
+
+    def copy(self, source, target, options):
+        applied = set(
+            source.execute("SELECT app, name FROM django_migrations").fetchall()
+        )
+        if applied != set(MigrationRecorder(target).applied_migrations()):
+            raise CommandError(
+                "The databases are at different migrations; run migrate on both."
+            )
+        tables = {
+            name
+            for (name,) in source.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+        models = [
+            model
+            for model in apps.get_models(include_auto_created=True)
+            if model._meta.managed
+            and not model._meta.proxy
+            and model._meta.db_table in tables
+        ]
+
+        if options["interactive"]:
+            confirm = input(
+                f"This will replace all data in {target.settings_dict['NAME']!r} "
+                f"with the contents of {options['source']}.\n"
+                "Type 'yes' to continue, or 'no' to cancel: "
+            )
+            if confirm != "yes":
+                self.stdout.write("Copy cancelled.")
+                return
+
+        qn = target.ops.quote_name
+        started = time.perf_counter()
+        total = 0
+        # Foreign keys are DEFERRABLE INITIALLY DEFERRED, so tables can load
+        # in any order and are checked once at commit.
+        with transaction.atomic(using=target.alias), target.cursor() as cursor:
+            for sql in target.ops.sql_flush(
+                no_style(), [model._meta.db_table for model in models]
+            ):
+                cursor.execute(sql)
+            for model in models:
+                table = model._meta.db_table
+                columns = [field.column for field in model._meta.local_concrete_fields]
+                rows = source.execute(
+                    "SELECT {} FROM {}".format(
+                        ", ".join(f'"{column}"' for column in columns), f'"{table}"'
+                    )
+                )
+                table_started = time.perf_counter()
+                count = 0
+                copy_sql = "COPY {} ({}) FROM STDIN".format(
+                    qn(table), ", ".join(qn(column) for column in columns)
+                )
+                # SQLite hands back text, numbers and 0/1 booleans, all of
+                # which COPY parses into the column types as they are.
+                with cursor.copy(copy_sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                        count += 1
+                total += count
+                elapsed = time.perf_counter() - table_started
+                if options["verbosity"] >= 1:
+                    self.stdout.write(f"{table}: {count} rows in {elapsed:.2f}s")
+            for sql in target.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        with target.cursor() as cursor:
+            # Fresh planner statistics, or the first queries plan as if empty.
+            cursor.execute("ANALYZE")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Copy complete. Tables: {len(models)}, Rows: {total} "
+                f"in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from subscriptions import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly spend rollups from the Expense table."
+
+    def handle(self, *args, **options):
+        count = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt. Rows: {count}"))
@@ -1,72 +1,116 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
 from django.utils import timezone
 
-from subscriptions.models import Expense, Subscription, add_months
+from subscriptions.renewals import (
+    DEFAULT_BATCH_SIZE,
+    RenewalResult,
+    catch_up_subscriptions,
+    due_subscriptions,
+    renew_subscriptions,
+    shard,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse an `i/N` shard spec with a zero-based index."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise CommandError(f"Invalid shard {value!r}; expected i/N, e.g. 0/4.")
+    if count < 1 or not 0 <= index < count:
+        raise CommandError(f"Invalid shard {value!r}; need 0 <= i < N.")
+    return index, count
+
+
 class Command(BaseCommand):
     help = "Generate renewal expenses for due subscriptions."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of subscriptions renewed per transaction.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker threads, each with its own DB connection.",
+        )
+        parser.add_argument(
+            "--shard",
+            default="0/1",
+            help="Only renew subscriptions with id %% N == i (zero-based i/N), "
+            "so several processes or hosts can split the due set.",
+        )
+        parser.add_argument(
+            "--catch-up",
+            action="store_true",
+            help="Backfill every missed billing date instead of billing once "
+            "today, then move the renewal date past today.",
+        )
+
     def handle(self, *args, **options):
         today = timezone.localdate()
-        due_subscriptions = Subscription.objects.filter(
-            status=Subscription.Status.ACTIVE,
-            next_renewal_date__isnull=False,
-            next_renewal_date__lte=today,
-        ).select_related("user", "category")  # Avoid N+1 queries for FK access.
-
-        created = 0
-        skipped = 0
+        batch_size = max(1, options["batch_size"])
+        workers = max(1, options["workers"])
+        shard_index, shard_count = parse_shard(options["shard"])
+        process = (
+            catch_up_subscriptions if options["catch_up"] else renew_subscriptions
+        )
+        if workers > 1 and connection.vendor == "sqlite":
+            # SQLite has a single writer; parallel chunk transactions would
+            # only queue for the database lock.
+            self.stderr.write("SQLite supports a single writer; using 1 worker.")
+            workers = 1
+        logger.info(
+            "Renewing subscriptions due on or before %s (shard %s/%s, workers %s)",
+            today,
+            shard_index,
+            shard_count,
+            workers,
+        )
 
-        for subscription in due_subscriptions:
-            due_date = subscription.next_renewal_date
-            if not due_date:
-                skipped += 1
-                continue
-            logger.info(
-                "Due subscription_id=%s name=%s due_date=%s",
-                subscription.id,
-                subscription.name,
-                due_date,
+        def run_worker(worker: int) -> tuple[RenewalResult, float]:
+            # Worker w of W inside host shard i/N takes id % (N * W) == i + N * w,
+            # which keeps every worker disjoint across all hosts.
+            queryset = shard(
+                due_subscriptions(today),
+                shard_index + shard_count * worker,
+                shard_count * workers,
             )
+            started = time.perf_counter()
+            try:
+                result = process(queryset, today, batch_size)
+            finally:
+                if workers > 1:
+                    connections.close_all()
+            return result, time.perf_counter() - started
 
-            with transaction.atomic():
-                exists = Expense.objects.filter(
-                    subscription=subscription,
-                    transaction_date=today,
-                    source=Expense.Source.SUBSCRIPTION,
-                ).exists()
-                if exists:
-                    skipped += 1
-                    continue
+        if workers == 1:
+            outcomes = [run_worker(0)]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                outcomes = list(pool.map(run_worker, range(workers)))
 
-                Expense.objects.create(
-                    user=subscription.user,
-                    subscription=subscription,
-                    name=subscription.name,
-                    category=subscription.category,
-                    amount=subscription.amount,
-                    currency=subscription.currency,
-                    transaction_date=today,
-                    source=Expense.Source.SUBSCRIPTION,
-                )
-
-                interval = max(1, subscription.billing_interval_months)
-                subscription.next_renewal_date = add_months(today, interval)
-                subscription.save(update_fields=["next_renewal_date", "updated_at"])
-                created += 1
-
-                transaction.on_commit(
-                    lambda sid=subscription.id: logger.info(
-                        "Renewal committed for subscription_id=%s", sid
-                    )
-                )
+        for worker, (result, elapsed) in enumerate(outcomes, start=1):
+            processed = result.created + result.skipped
+            rate = processed / elapsed if elapsed else 0.0
+            self.stdout.write(
+                f"Worker {worker}/{workers}: Created: {result.created}, "
+                f"Skipped: {result.skipped} in {elapsed:.2f}s ({rate:.0f} rows/s)"
+            )
 
+        created = sum(result.created for result, _ in outcomes)
+        skipped = sum(result.skipped for result, _ in outcomes)
         self.stdout.write(
             self.style.SUCCESS(
                 f"Renewals complete. Created: {created}, Skipped: {skipped}"
@@ -0,0 +1,112 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from subscriptions import jobs
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=1,
+            help="Jobs run concurrently by this process, one DB connection each.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Start N worker processes (each with --threads threads).",
+        )
+        parser.add_argument(
+            "--kind",
+            action="append",
+            dest="kinds",
+            help="Only run jobs of this kind (repeatable).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=3600,
+            help="Requeue jobs left running this many seconds by a dead worker.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] > 1:
+            return self.spawn_processes(options)
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        threads = max(1, options["threads"])
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Worker {name} started with {threads} thread(s).")
+
+        def loop(index: int) -> int:
+            done = 0
+            worker = f"{name}:{index}"
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    if index == 0:
+                        jobs.requeue_stale(timedelta(seconds=options["stale_after"]))
+                        jobs.enqueue_periodic()
+                    job = jobs.claim(worker, options["kinds"])
+                    if job is None:
+                        if options["once"]:
+                            break
+                        stop.wait(options["poll_interval"])
+                        continue
+                    self.stdout.write(f"{worker} running {job}")
+                    jobs.run(job)
+                    done += 1
+            finally:
+                connections.close_all()
+            return done
+
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                done = sum(pool.map(loop, range(threads)))
+        except KeyboardInterrupt:
+            stop.set()
+            raise
+        self.stdout.write(self.style.SUCCESS(f"Worker {name} stopped. Jobs: {done}"))
+
+    def spawn_processes(self, options):
+        argv = [sys.executable, sys.argv[0], "run_worker"]
+        argv += ["--threads", str(options["threads"])]
+        argv += ["--poll-interval", str(options["poll_interval"])]
+        argv += ["--stale-after", str(options["stale_after"])]
+        for kind in options["kinds"] or []:
+            argv += ["--kind", kind]
+        if options["once"]:
+            argv.append("--once")
+        children = [subprocess.Popen(argv) for _ in range(options["processes"])]
+        try:
+            for child in children:
+                child.wait()
+        except KeyboardInterrupt:
+            for child in children:
+                child.terminate()
+            raise
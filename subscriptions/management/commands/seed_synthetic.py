@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from subscriptions.synthetic import DEFAULT_BATCH_SIZE, DEFAULT_PREFIX, seed
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, subscriptions and expenses for benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--expenses",
+            type=int,
+            default=100_000,
+            help="Total number of expenses to create, e.g. 1000 to 10000000.",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            help="Number of users; defaults to one per 1000 expenses.",
+        )
+        parser.add_argument(
+            "--subscriptions-per-user",
+            type=int,
+            default=8,
+            help="Subscriptions per user, across all billing cycles.",
+        )
+        parser.add_argument(
+            "--years",
+            type=int,
+            default=3,
+            help="How many years of history to generate.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument(
+            "--prefix",
+            default=DEFAULT_PREFIX,
+            help="Username prefix; must not be in use yet.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of rows per bulk insert.",
+        )
+
+    def handle(self, *args, **options):
+        expenses = max(0, options["expenses"])
+        users = options["users"] or max(1, expenses // 1000)
+        prefix = options["prefix"]
+        User = get_user_model()
+        lookup = {f"{User.USERNAME_FIELD}__startswith": prefix}
+        if User.objects.filter(**lookup).exists():
+            raise CommandError(
+                f"Users named {prefix}* already exist; pass another --prefix."
+            )
+
+        def progress(result):
+            self.stdout.write(
+                f"Users: {result.users}/{users}, Expenses: {result.expenses} "
+                f"in {result.elapsed:.1f}s"
+            )
+
+        result = seed(
+            users,
+            expenses,
+            subscriptions_per_user=max(0, options["subscriptions_per_user"]),
+            years=max(1, options["years"]),
+            random_seed=options["seed"],
+            prefix=prefix,
+            batch_size=max(1, options["batch_size"]),
+            progress=progress,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seed complete. Users: {result.users}, "
+                f"Categories: {result.categories}, "
+                f"Subscriptions: {result.subscriptions}, "
+                f"Expenses: {result.expenses} "
+                f"in {result.elapsed:.2f}s ({result.rate:.0f} rows/s)"
+            )
+        )
@@ -0,0 +1,71 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from subscriptions import jobs
+from subscriptions.reminders import (
+    DEFAULT_BATCH_SIZE,
+    ConsoleBackend,
+    get_backend,
+    send_reminders,
+)
+
+
+class Command(BaseCommand):
+    help = "Send reminders for subscriptions renewing within each user's window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Send as if today were this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of users' messages handed to the backend at once.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count due reminders without sending or recording them.",
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Queue a send_renewal_reminders job instead of sending here.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options["date"]) if options["date"] else None
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD.")
+        today = today or timezone.localdate()
+
+        if options["enqueue"]:
+            job = jobs.enqueue(
+                "send_renewal_reminders",
+                {"today": today.isoformat()},
+                dedup_key=f"send_renewal_reminders:{today}",
+            )
+            self.stdout.write(self.style.SUCCESS(f"Queued {job}."))
+            return
+
+        backend = get_backend()
+        if isinstance(backend, ConsoleBackend):
+            backend.stream = self.stdout
+        result = send_reminders(
+            today,
+            backend=backend,
+            batch_size=max(1, options["batch_size"]),
+            dry_run=options["dry_run"],
+        )
+        verb = "Would send" if options["dry_run"] else "Sent"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reminders complete. {verb}: {result.reminders} to "
+                f"{result.users} user(s) in {result.batches} batch(es)"
+            )
+        )
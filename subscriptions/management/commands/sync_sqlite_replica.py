@@ -0,0 +1,56 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from subscriptions.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary onto the SQLite replica (SQLITE_REPLICA_PATH) "
+        "with the online backup API, once or every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep copying, this many seconds apart (the replication lag).",
+        )
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No replica configured; set SQLITE_REPLICA_PATH.")
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        replica = connections[alias].settings_dict
+        if connections[alias].vendor != "sqlite":
+            raise CommandError("The replica is not SQLite; replicate it natively.")
+        if str(primary["NAME"]) == str(replica["NAME"]):
+            raise CommandError("The primary and the replica are the same file.")
+
+        interval = options["interval"]
+        while True:
+            started = time.perf_counter()
+            self.sync(primary["NAME"], replica["NAME"])
+            elapsed = time.perf_counter() - started
+            if options["verbosity"] >= 1:
+                self.stdout.write(
+                    f"Copied {primary['NAME']} to {replica['NAME']} in {elapsed:.2f}s"
+                )
+            if not interval:
+                return
+            time.sleep(max(0.0, interval - elapsed))
+
+    def sync(self, source_path, target_path):
+        source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+        target = sqlite3.connect(target_path, timeout=20)
+        try:
+            # One step copies a consistent snapshot even while the primary
+            # takes writes; readers of the replica wait on its busy timeout.
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
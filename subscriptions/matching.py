@@ -0,0 +1,201 @@
+"""Link manual (typically imported) expenses to the subscriptions behind them.
+
+Active subscriptions are indexed in a dict keyed by (user, currency, amount in
+cents), so each expense finds its handful of candidates with one hash lookup.
+A candidate matches when its normalized name appears in the expense's name
+and a billing date of its schedule falls within `window_days` of the
+expense; the date checks for a whole chunk run as one NumPy pass.
+"""
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import rollups, schedule, versioning
+from .models import Expense, Subscription
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_WINDOW_DAYS = 3
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+# (user_id, currency, amount in cents)
+MatchKey = tuple[int, str, int]
+
+_LINK_FIELDS = ("subscription", "source", "updated_at")
+
+
+@dataclass
+class MatchResult:
+    scanned: int = 0
+    matched: int = 0
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase words without punctuation or reference numbers.
+
+    "NETFLIX.COM 8812 SYDNEY" becomes "netflix com sydney", so a subscription
+    named "Netflix" matches it as a whole-word substring.
+    """
+    words = _NON_WORD.sub(" ", name.casefold()).split()
+    return " ".join(word for word in words if not word.isdigit())
+
+
+def cents(amount) -> int:
+    return int(round(amount * 100))
+
+
+def unmatched_expenses(queryset=None):
+    """Manual expenses that are not linked to a subscription yet."""
+    if queryset is None:
+        queryset = Expense.objects.all()
+    return queryset.filter(source=Expense.Source.MANUAL, subscription__isnull=True)
+
+
+def build_index(subscriptions) -> dict[MatchKey, list[tuple]]:
+    """Map (user, currency, cents) to [(id, normalized name, anchor, interval)]."""
+    index = defaultdict(list)
+    rows = subscriptions.values_list(
+        "id",
+        "user_id",
+        "name",
+        "amount",
+        "currency",
+        "billing_date",
+        "billing_interval_months",
+    )
+    for pk, user_id, name, amount, currency, anchor, interval in rows.iterator():
+        index[(user_id, currency, cents(amount))].append(
+            (pk, f" {normalize_name(name)} ", anchor, interval)
+        )
+    return index
+
+
+def match_expenses(
+    queryset=None,
+    subscriptions=None,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    dry_run: bool = False,
+) -> MatchResult:
+    """Link unmatched manual expenses in `queryset` to active subscriptions.
+
+    Matched expenses get `subscription` and `source=SUBSCRIPTION`. The raw
+    UPDATE bypasses Expense signals, so each chunk moves the matched amounts
+    from the manual to the subscription rollups in the same transaction.
+    """
+    expenses = unmatched_expenses(queryset)
+    if subscriptions is None:
+        subscriptions = Subscription.objects.filter(
+            status=Subscription.Status.ACTIVE,
+            user_id__in=expenses.order_by().values("user_id"),
+        )
+    index = build_index(subscriptions)
+    result = MatchResult()
+    if not index:
+        return result
+
+    rows = expenses.order_by("pk").values_list(
+        "id", "user_id", "name", "amount", "currency", "transaction_date", "category_id"
+    )
+    last_pk = 0
+    while chunk := list(rows.filter(pk__gt=last_pk)[:batch_size]):
+        last_pk = chunk[-1][0]
+        result.scanned += len(chunk)
+        links = _match_chunk(chunk, index, window_days)
+        if not links:
+            continue
+        result.matched += len(links)
+        if dry_run:
+            continue
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with transaction.atomic(), connection.cursor() as cursor:
+            # A parameterized executemany: building the equivalent ORM CASE
+            # expressions costs more CPU than the UPDATE itself.
+            cursor.executemany(
+                _link_sql(),
+                [
+                    (subscription_id, Expense.Source.SUBSCRIPTION, now, pk)
+                    for pk, (subscription_id, _) in links.items()
+                ],
+            )
+            rollups.apply_deltas(_source_deltas(chunk, links))
+            versioning.bump({user_id for _, user_id in links.values()})
+    return result
+
+
+def _source_deltas(chunk, links) -> dict[rollups.RollupKey, list]:
+    """Rollup deltas moving each linked expense from MANUAL to SUBSCRIPTION."""
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for pk, user_id, _, amount, currency, transaction_date, category_id in chunk:
+        if pk not in links:
+            continue
+        month = transaction_date.replace(day=1)
+        for source, sign in (
+            (Expense.Source.MANUAL, -1),
+            (Expense.Source.SUBSCRIPTION, 1),
+        ):
+            delta = deltas[(user_id, month, category_id, currency, source)]
+            delta[0] += sign * amount
+            delta[1] += sign
+    return deltas
+
+
+def _link_sql() -> str:
+    qn = connection.ops.quote_name
+    columns = [qn(Expense._meta.get_field(name).column) for name in _LINK_FIELDS]
+    return "UPDATE {} SET {} = %s, {} = %s, {} = %s WHERE {} = %s".format(
+        qn(Expense._meta.db_table), *columns, qn(Expense._meta.pk.column)
+    )
+
+
+def _match_chunk(chunk, index, window_days: int) -> dict[int, tuple[int, int]]:
+    """Return {expense id: (subscription id, user id)} for one chunk."""
+    # Hash lookup plus name check yields the few candidate pairs worth dating.
+    pairs = []
+    for pk, user_id, name, amount, currency, transaction_date, _ in chunk:
+        candidates = index.get((user_id, currency, cents(amount)))
+        if not candidates:
+            continue
+        normalized = f" {normalize_name(name)} "
+        for subscription_id, sub_name, anchor, interval in candidates:
+            if sub_name in normalized:
+                pairs.append(
+                    (pk, user_id, subscription_id, anchor, interval, transaction_date)
+                )
+    if not pairs:
+        return {}
+
+    _, _, _, anchors, intervals, dates = zip(*pairs)
+    anchors = schedule.to_days(anchors)
+    intervals = np.asarray(intervals, dtype=np.int64)
+    dates = schedule.to_days(dates)
+    window = np.timedelta64(window_days, "D")
+
+    # With a window shorter than a month, the first billing date on or after
+    # the window start is the only one that can fall inside it; the anchor
+    # itself counts as cycle 0.
+    window_start = dates - window
+    cycle = schedule.first_cycle_after(anchors, intervals, window_start - 1)
+    billing = schedule.add_months(anchors, cycle * np.maximum(intervals, 1))
+    billing = np.where(anchors >= window_start, anchors, billing)
+    distance = np.abs(billing - dates)
+    hits = distance <= window
+
+    links = {}
+    best = {}
+    for pair, hit, gap in zip(pairs, hits.tolist(), distance.tolist()):
+        if not hit:
+            continue
+        pk, user_id, subscription_id = pair[:3]
+        # Several subscriptions can share a name and price; the closest
+        # billing date wins.
+        if pk not in best or gap < best[pk]:
+            best[pk] = gap
+            links[pk] = (subscription_id, user_id)
+    return links
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_monthly_spend(apps, schema_editor):
+    Expense = apps.get_model("subscriptions", "Expense")
+    MonthlySpend = apps.get_model("subscriptions", "MonthlySpend")
+    rows = (
+        Expense.objects.order_by()
+        .values(
+            "user_id",
+            "category_id",
+            "currency",
+            month=TruncMonth("transaction_date"),
+        )
+        .annotate(total=Sum("amount"), expense_count=Count("id"))
+    )
+    MonthlySpend.objects.bulk_create(
+        [MonthlySpend(**row) for row in rows], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0004_add_expense_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month.')),
+                ('currency', models.CharField(max_length=3)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spend', to='subscriptions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spend', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-month', 'currency'],
+                'indexes': [models.Index(fields=['month'], name='subscriptio_month_57c0f7_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('user', 'month', 'category', 'currency'), name='uniq_monthly_spend'), models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'month', 'currency'), name='uniq_monthly_spend_uncategorized')],
+            },
+        ),
+        migrations.RunPython(populate_monthly_spend, migrations.RunPython.noop),
+    ]
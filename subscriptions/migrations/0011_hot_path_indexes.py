@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _concurrently(schema_editor) -> dict:
+    if schema_editor.connection.vendor == "postgresql":
+        return {"concurrently": True}
+    return {}
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """AddIndex that builds CONCURRENTLY on PostgreSQL, so writes keep flowing.
+
+    Unlike django.contrib.postgres's version it also runs on SQLite.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **_concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **_concurrently(schema_editor))
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('subscriptions', '0010_renewal_reminders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='expense',
+            index=models.Index(fields=['subscription', 'transaction_date', 'source'], name='expense_subscription_billed'),
+        ),
+        AddIndexConcurrently(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['next_renewal_date'], name='subscription_active_renewal'),
+        ),
+        migrations.RemoveIndex(
+            model_name='subscription',
+            name='subscriptio_next_re_60526b_idx',
+        ),
+    ]
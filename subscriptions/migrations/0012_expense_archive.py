@@ -0,0 +1,116 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def regroup_monthly_spend(apps, *fields):
+    Expense = apps.get_model("subscriptions", "Expense")
+    MonthlySpend = apps.get_model("subscriptions", "MonthlySpend")
+    rows = (
+        Expense.objects.order_by()
+        .values(
+            "user_id",
+            "category_id",
+            "currency",
+            *fields,
+            month=TruncMonth("transaction_date"),
+        )
+        .annotate(total=Sum("amount"), expense_count=Count("id"))
+    )
+    MonthlySpend.objects.all().delete()
+    MonthlySpend.objects.bulk_create(
+        [MonthlySpend(**row) for row in rows.iterator()], batch_size=1000
+    )
+
+
+def split_monthly_spend_by_source(apps, schema_editor):
+    regroup_monthly_spend(apps, "source")
+
+
+def merge_monthly_spend_sources(apps, schema_editor):
+    # Regrouping reads Expense only, so archived totals would be dropped.
+    if apps.get_model("subscriptions", "ExpenseArchive").objects.exists():
+        raise RuntimeError(
+            "Expenses are archived; move them back to Expense before unapplying."
+        )
+    regroup_monthly_spend(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0011_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(max_length=3)),
+                ('transaction_date', models.DateField()),
+                ('source', models.CharField(choices=[('subscription', 'Subscription'), ('manual', 'Manual')], max_length=12)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-transaction_date', '-id'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='monthlyspend',
+            name='uniq_monthly_spend',
+        ),
+        migrations.RemoveConstraint(
+            model_name='monthlyspend',
+            name='uniq_monthly_spend_uncategorized',
+        ),
+        migrations.AddField(
+            model_name='monthlyspend',
+            name='source',
+            field=models.CharField(choices=[('subscription', 'Subscription'), ('manual', 'Manual')], default='manual', max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='monthlyspend',
+            index=models.Index(fields=['user', 'month'], name='subscriptio_user_id_9cff51_idx'),
+        ),
+        migrations.RunPython(
+            split_monthly_spend_by_source, merge_monthly_spend_sources
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyspend',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('user', 'month', 'category', 'currency', 'source'), name='uniq_monthly_spend'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyspend',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'month', 'currency', 'source'), name='uniq_monthly_spend_uncategorized'),
+        ),
+        migrations.AddField(
+            model_name='expensearchive',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_expenses', to='subscriptions.category'),
+        ),
+        migrations.AddField(
+            model_name='expensearchive',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_expenses', to='subscriptions.subscription'),
+        ),
+        migrations.AddField(
+            model_name='expensearchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_expenses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='expensearchive',
+            index=models.Index(fields=['user', 'transaction_date'], name='subscriptio_user_id_d93203_idx'),
+        ),
+    ]
@@ -4,6 +4,9 @@ from datetime import date
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
+
+from . import schedule
 
 
 def add_months(value: date, months: int) -> date:
@@ -89,6 +92,12 @@ class Subscription(models.Model):
         ]
         indexes = [
             models.Index(fields=["user", "status"]),
+            # Renewals and reminders only ever scan active subscriptions.
+            models.Index(
+                fields=["next_renewal_date"],
+                condition=models.Q(status="active"),
+                name="subscription_active_renewal",
+            ),
         ]
         ordering = ["next_renewal_date", "name"]
 
@@ -109,7 +118,8 @@ class Subscription(models.Model):
 
         if not self.next_renewal_date and self.billing_date:
             months = self.billing_interval_months
-            self.next_renewal_date = add_months(self.billing_date, months)
+            renewal = schedule.add_months(self.billing_date, months)
+            self.next_renewal_date = renewal.item()
         super().save(*args, **kwargs)
 
     def __str__(self) -> str:
@@ -161,6 +171,11 @@ class Expense(models.Model):
         indexes = [
             models.Index(fields=["transaction_date"]),
             models.Index(fields=["user", "transaction_date"]),
+            # The renewal idempotency check: already billed on this date?
+            models.Index(
+                fields=["subscription", "transaction_date", "source"],
+                name="expense_subscription_billed",
+            ),
         ]
         ordering = ["-transaction_date", "-id"]
 
@@ -204,3 +219,257 @@ class Expense(models.Model):
 
     def __str__(self) -> str:
         return f"{self.amount} {self.currency} on {self.transaction_date}"
+
+
+class ExpenseArchive(models.Model):
+    """Expenses moved out of Expense by the `archive_expenses` command.
+
+    Rows keep their Expense id and timestamps. They stay counted in
+    MonthlySpend, so reports include them without reading this table.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_expenses",
+    )
+    subscription = models.ForeignKey(
+        Subscription,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="archived_expenses",
+    )
+    name = models.CharField(max_length=200)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.PROTECT,
+        related_name="archived_expenses",
+        null=True,
+        blank=True,
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3)
+    transaction_date = models.DateField()
+    source = models.CharField(max_length=12, choices=Expense.Source.choices)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "transaction_date"]),
+        ]
+        ordering = ["-transaction_date", "-id"]
+
+    def __str__(self) -> str:
+        return f"{self.amount} {self.currency} on {self.transaction_date} (archived)"
+
+
+class MonthlySpend(models.Model):
+    """Per-month expense totals, kept in step with Expense writes.
+
+    Maintained incrementally by `subscriptions.rollups`; run the
+    `rebuild_rollups` command to repair it from the Expense and
+    ExpenseArchive tables. Archiving leaves it untouched.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="monthly_spend",
+    )
+    month = models.DateField(help_text="First day of the month.")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="monthly_spend",
+        null=True,
+        blank=True,
+    )
+    currency = models.CharField(max_length=3)
+    source = models.CharField(
+        max_length=12, choices=Expense.Source.choices, default=Expense.Source.MANUAL
+    )
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # NULL categories never collide in a plain unique constraint, so
+            # uncategorized rows get their own partial constraint.
+            models.UniqueConstraint(
+                fields=["user", "month", "category", "currency", "source"],
+                condition=models.Q(category__isnull=False),
+                name="uniq_monthly_spend",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "month", "currency", "source"],
+                condition=models.Q(category__isnull=True),
+                name="uniq_monthly_spend_uncategorized",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["month"]),
+            # Per-user report ranges (subscriptions.reports).
+            models.Index(fields=["user", "month"]),
+        ]
+        ordering = ["-month", "currency"]
+
+    def __str__(self) -> str:
+        return f"{self.month:%Y-%m}: {self.total} {self.currency}"
+
+
+class ExchangeRate(models.Model):
+    """One unit of `base` is worth `rate` units of `quote` on `date`.
+
+    Loaded with the `load_exchange_rates` command; `subscriptions.fx` uses
+    the latest rate on or before a report's date.
+    """
+
+    date = models.DateField()
+    base = models.CharField(max_length=3)
+    quote = models.CharField(max_length=3)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["base", "quote", "date"], name="uniq_exchange_rate"
+            ),
+            models.CheckConstraint(
+                condition=models.Q(rate__gt=0), name="exchange_rate_positive"
+            ),
+        ]
+        ordering = ["-date", "base", "quote"]
+
+    def __str__(self) -> str:
+        return f"{self.date}: 1 {self.base} = {self.rate} {self.quote}"
+
+
+class ReminderPreference(models.Model):
+    """How many days ahead a user is reminded of renewals.
+
+    Users without a row use the RENEWAL_REMINDER_LEAD_DAYS setting.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="reminder_preference",
+    )
+    lead_days = models.PositiveSmallIntegerField(default=3)
+    enabled = models.BooleanField(default=True)
+
+    def __str__(self) -> str:
+        return f"{self.user_id}: {self.lead_days} days"
+
+
+class RenewalReminder(models.Model):
+    """A reminder sent for one renewal, so reruns never send it twice."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="renewal_reminders",
+    )
+    subscription = models.ForeignKey(
+        Subscription,
+        on_delete=models.CASCADE,
+        related_name="reminders",
+    )
+    renewal_date = models.DateField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["subscription", "renewal_date"],
+                name="uniq_renewal_reminder",
+            )
+        ]
+        ordering = ["-sent_at", "-id"]
+
+    def __str__(self) -> str:
+        return f"{self.subscription_id} renews {self.renewal_date}"
+
+
+class DataVersion(models.Model):
+    """Per-user change counter used for conditional GET (ETag) responses.
+
+    Bumped by `subscriptions.versioning` on every write to a user's
+    categories, subscriptions or expenses.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="data_version",
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f"{self.user_id} v{self.version}"
+
+
+class Job(models.Model):
+    """A queued unit of background work, run by `subscriptions.jobs`."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(max_length=50)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+        help_text="Who queued the job; empty for system jobs.",
+    )
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    dedup_key = models.CharField(
+        max_length=200,
+        blank=True,
+        help_text="At most one pending or running job may hold a given key.",
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=100, blank=True)
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                condition=models.Q(status__in=["pending", "running"])
+                & ~models.Q(dedup_key=""),
+                name="uniq_active_job_dedup_key",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["user", "created_at"]),
+        ]
+        ordering = ["-created_at", "-id"]
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.pk} ({self.status})"
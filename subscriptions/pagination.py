@@ -0,0 +1,111 @@
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class ViewOrderingCursorPagination(CursorPagination):
+    """Keyset pagination over the view's own `ordering`.
+
+    A cursor holds every ordering column of the row it stops at, and the next
+    page seeks past that row with a lexicographic comparison. Orderings must
+    end in a unique column and never be NULL (order on a Coalesce annotation
+    instead), so positions are unique, DRF's offset fallback never kicks in,
+    and every page costs the same regardless of depth or duplicate values.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "ordering", None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset, seeking on the whole position
+        # rather than on the first ordering column.
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self._seek(current_position, reverse))
+
+        # One extra row tells whether a page follows this one.
+        results = list(queryset[offset : offset + self.page_size + 1])
+        self.page = results[: self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+
+        has_current = current_position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next = has_current
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = has_current
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            try:
+                values = json.loads(cursor.position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _seek(self, position: str, reverse: bool) -> Q:
+        """Rows strictly after `position` in the (possibly reversed) ordering."""
+        values = json.loads(position)
+        fields = [name.lstrip("-") for name in self.ordering]
+        after = Q()
+        equal = Q()
+        for name, field, value in zip(self.ordering, fields, values):
+            # Ascending columns move forward with __gt, descending with __lt;
+            # a reverse cursor flips both.
+            lookup = "lt" if name.startswith("-") != reverse else "gt"
+            after |= equal & Q(**{f"{field}__{lookup}": value})
+            equal &= Q(**{field: value})
+        # Bounding the leading column as well lets the database range-scan
+        # its index instead of testing the OR against every row.
+        lookup = "lte" if self.ordering[0].startswith("-") != reverse else "gte"
+        return Q(**{f"{fields[0]}__{lookup}": values[0]}) & after
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for name in ordering:
+            name = name.lstrip("-")
+            if isinstance(instance, dict):
+                value = instance[name]
+            else:
+                value = getattr(instance, name)
+            values.append(value if isinstance(value, int) else str(value))
+        return json.dumps(values)
@@ -0,0 +1,207 @@
+"""Reminders ahead of subscription renewals.
+
+Each user is reminded once per renewal, `lead_days` before it (from their
+ReminderPreference, else RENEWAL_REMINDER_LEAD_DAYS). Reminders are grouped
+into one message per user and handed to the backend named by
+RENEWAL_REMINDER_BACKEND in batches. Every sent renewal is recorded in
+RenewalReminder, and candidates already recorded are excluded in SQL, so a
+rerun costs O(new reminders) however often it runs.
+"""
+
+import json
+import sys
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.module_loading import import_string
+
+from .models import ReminderPreference, RenewalReminder, Subscription
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_BACKEND = "subscriptions.reminders.ConsoleBackend"
+
+
+@dataclass
+class Reminder:
+    subscription_id: int
+    name: str
+    amount: str
+    currency: str
+    renewal_date: date
+
+
+@dataclass
+class ReminderMessage:
+    """Everything one user is reminded of in a single run."""
+
+    user_id: int
+    username: str
+    email: str
+    reminders: list[Reminder] = field(default_factory=list)
+
+    def subject(self) -> str:
+        count = len(self.reminders)
+        return f"{count} subscription{'s' if count != 1 else ''} renewing soon"
+
+    def body(self) -> str:
+        lines = [
+            f"{r.name}: {r.amount} {r.currency} on {r.renewal_date:%d %b %Y}"
+            for r in self.reminders
+        ]
+        return "Upcoming renewals:\n\n" + "\n".join(lines) + "\n"
+
+
+@dataclass
+class ReminderResult:
+    users: int = 0
+    reminders: int = 0
+    batches: int = 0
+
+
+class BaseBackend:
+    """Delivers ReminderMessages; subclasses implement `send_messages`."""
+
+    def send_messages(self, messages: list[ReminderMessage]) -> int:
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseBackend):
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send_messages(self, messages):
+        for message in messages:
+            self.stream.write(
+                f"To: {message.username} <{message.email}>\n"
+                f"Subject: {message.subject()}\n\n{message.body()}\n"
+            )
+        self.stream.flush()
+        return len(messages)
+
+
+class FileBackend(BaseBackend):
+    """Appends one JSON line per message to RENEWAL_REMINDER_FILE_PATH."""
+
+    def __init__(self, path=None):
+        self.path = path or settings.RENEWAL_REMINDER_FILE_PATH
+
+    def send_messages(self, messages):
+        with open(self.path, "a") as stream:
+            for message in messages:
+                stream.write(json.dumps(asdict(message), default=str) + "\n")
+        return len(messages)
+
+
+class EmailBackend(BaseBackend):
+    """Sends through Django's email backend over one connection per batch."""
+
+    def send_messages(self, messages):
+        emails = [
+            EmailMessage(message.subject(), message.body(), to=[message.email])
+            for message in messages
+            if message.email
+        ]
+        return get_connection().send_messages(emails) or 0
+
+
+def get_backend(**kwargs) -> BaseBackend:
+    path = getattr(settings, "RENEWAL_REMINDER_BACKEND", DEFAULT_BACKEND)
+    return import_string(path)(**kwargs)
+
+
+def default_lead_days() -> int:
+    return getattr(settings, "RENEWAL_REMINDER_LEAD_DAYS", 3)
+
+
+def due_reminders(today: date):
+    """Active subscriptions renewing within the widest lead window, unsent.
+
+    The range scan uses the next_renewal_date index; per-user windows are
+    applied in `pending_messages`.
+    """
+    leads = ReminderPreference.objects.filter(enabled=True).values_list(
+        "lead_days", flat=True
+    )
+    widest = max([default_lead_days(), *leads])
+    sent = RenewalReminder.objects.filter(
+        subscription=OuterRef("pk"), renewal_date=OuterRef("next_renewal_date")
+    )
+    return (
+        Subscription.objects.filter(
+            status=Subscription.Status.ACTIVE,
+            next_renewal_date__gte=today,
+            next_renewal_date__lte=today + timedelta(days=widest),
+        )
+        .exclude(user__reminder_preference__enabled=False)
+        .filter(~Exists(sent))
+        .order_by("user_id", "next_renewal_date", "id")
+    )
+
+
+def pending_messages(today: date):
+    """Yield one ReminderMessage per user with reminders due `today`."""
+    rows = due_reminders(today).values_list(
+        "id", "user_id", "name", "amount", "currency", "next_renewal_date"
+    )
+    lead_days = dict(ReminderPreference.objects.values_list("user_id", "lead_days"))
+    default = default_lead_days()
+    for user_id, group in groupby(rows.iterator(), key=lambda row: row[1]):
+        horizon = today + timedelta(days=lead_days.get(user_id, default))
+        reminders = [
+            Reminder(pk, name, str(amount), currency, renewal_date)
+            for pk, _, name, amount, currency, renewal_date in group
+            if renewal_date <= horizon
+        ]
+        if reminders:
+            yield ReminderMessage(user_id, "", "", reminders)
+
+
+def send_reminders(
+    today: date,
+    backend: BaseBackend | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    dry_run: bool = False,
+) -> ReminderResult:
+    """Send due reminders, `batch_size` users per backend call.
+
+    Each batch is recorded in the same transaction that sends it, so a
+    failed send leaves nothing recorded and the next run retries it.
+    """
+    backend = backend or get_backend()
+    result = ReminderResult()
+    User = get_user_model()
+    # Read all candidates up front (O(new reminders)) so no cursor stays
+    # open while the backend talks to a mail server.
+    messages = iter(list(pending_messages(today)))
+    while batch := list(islice(messages, batch_size)):
+        users = User.objects.in_bulk([message.user_id for message in batch])
+        for message in batch:
+            user = users[message.user_id]
+            message.username = user.get_username()
+            message.email = getattr(user, user.get_email_field_name(), "") or ""
+        result.users += len(batch)
+        result.reminders += sum(len(message.reminders) for message in batch)
+        result.batches += 1
+        if dry_run:
+            continue
+        with transaction.atomic():
+            RenewalReminder.objects.bulk_create(
+                [
+                    RenewalReminder(
+                        user_id=message.user_id,
+                        subscription_id=reminder.subscription_id,
+                        renewal_date=reminder.renewal_date,
+                    )
+                    for message in batch
+                    for reminder in message.reminders
+                ],
+                ignore_conflicts=True,
+            )
+            backend.send_messages(batch)
+    return result
@@ -0,0 +1,247 @@
+import logging
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Case, DateField, F, Q, Value, When
+from django.utils import timezone
+
+from . import rollups, schedule, versioning
+from .models import Expense, Subscription
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+RENEWAL_FIELDS = (
+    "id",
+    "user_id",
+    "name",
+    "category_id",
+    "amount",
+    "currency",
+    "billing_interval_months",
+    "billing_date",
+    "next_renewal_date",
+)
+
+
+@dataclass
+class RenewalResult:
+    created: int = 0
+    skipped: int = 0
+
+
+def due_subscriptions(today: date):
+    """Active subscriptions whose next renewal is on or before `today`."""
+    return Subscription.objects.filter(
+        status=Subscription.Status.ACTIVE,
+        next_renewal_date__isnull=False,
+        next_renewal_date__lte=today,
+    )
+
+
+def renew_selection(
+    queryset, today: date, batch_size: int = DEFAULT_BATCH_SIZE, progress=None
+) -> RenewalResult:
+    """Renew the due rows of an arbitrary selection, e.g. from the admin.
+
+    Active subscriptions that are not due yet count as skipped; inactive ones
+    are ignored.
+    """
+    active = queryset.filter(status=Subscription.Status.ACTIVE)
+    not_due = active.filter(
+        Q(next_renewal_date__isnull=True) | Q(next_renewal_date__gt=today)
+    ).count()
+    due = active.filter(next_renewal_date__isnull=False, next_renewal_date__lte=today)
+    result = renew_subscriptions(due, today, batch_size, progress)
+    result.skipped += not_due
+    return result
+
+
+def shard(queryset, index: int, count: int):
+    """Restrict `queryset` to the rows whose id falls in shard `index` of `count`."""
+    if count <= 1:
+        return queryset
+    return queryset.alias(shard=F("id") % count).filter(shard=index)
+
+
+def renew_subscriptions(
+    queryset, today: date, batch_size: int = DEFAULT_BATCH_SIZE, progress=None
+) -> RenewalResult:
+    """Generate renewal expenses for `queryset` in chunks.
+
+    Each chunk costs a constant number of queries: one to load the rows, one
+    to find subscriptions already renewed today, one bulk insert and one
+    CASE UPDATE for the new renewal dates. On backends with
+    SKIP LOCKED the chunk rows stay locked until the chunk commits, so
+    concurrent runs over overlapping querysets never renew the same row twice.
+
+    `progress`, if given, is called with the number of rows processed so far
+    after each chunk commits.
+    """
+    return _process_chunks(queryset, today, batch_size, _renew_chunk, progress)
+
+
+def catch_up_subscriptions(
+    queryset, today: date, batch_size: int = DEFAULT_BATCH_SIZE, progress=None
+) -> RenewalResult:
+    """Backfill every missed billing date for `queryset` in chunks.
+
+    Unlike `renew_subscriptions`, expenses are dated on the billing dates
+    themselves and `next_renewal_date` jumps to the first billing date after
+    `today`, so a long outage is repaired in a single run. Counts are per
+    expense rather than per subscription.
+    """
+    return _process_chunks(queryset, today, batch_size, _catch_up_chunk, progress)
+
+
+def missed_billing_dates(
+    rows: list[dict], today: date
+) -> list[tuple[list[date], date]]:
+    """Return the unbilled dates up to `today` and the next future date per row.
+
+    The recorded `next_renewal_date` is always due; after it come the dates
+    on the `billing_date` schedule, which keeps month-end anchors intact.
+    """
+    if not rows:
+        return []
+    anchors = schedule.to_days([row["billing_date"] for row in rows])
+    due_dates = schedule.to_days([row["next_renewal_date"] for row in rows])
+    intervals = np.array([max(1, row["billing_interval_months"]) for row in rows])
+
+    first = schedule.first_cycle_after(anchors, intervals, due_dates)
+    upcoming = schedule.first_cycle_after(anchors, intervals, schedule.to_days(today))
+    counts = np.maximum(upcoming - first, 0)
+    missed = schedule.renewal_dates(anchors, intervals, int(counts.max()), first)
+    next_dates = schedule.add_months(anchors, upcoming * intervals)
+
+    return [
+        (
+            [row["next_renewal_date"]] + schedule.to_dates(missed[i, : counts[i]]),
+            next_date,
+        )
+        for i, (row, next_date) in enumerate(zip(rows, schedule.to_dates(next_dates)))
+    ]
+
+
+def _process_chunks(
+    queryset, today: date, batch_size: int, handler, progress=None
+) -> RenewalResult:
+    result = RenewalResult()
+    last_id = 0
+    processed = 0
+    while True:
+        with transaction.atomic():
+            # Walk by primary key: renewed rows drop out of the due filter,
+            # but skipped ones do not, so offset slicing would repeat work.
+            rows = queryset.filter(pk__gt=last_id).order_by("pk")
+            if connection.features.has_select_for_update_skip_locked:
+                rows = rows.select_for_update(skip_locked=True)
+            chunk = list(rows.values(*RENEWAL_FIELDS)[:batch_size])
+            if not chunk:
+                break
+            last_id = chunk[-1]["id"]
+            handler(chunk, today, result)
+        processed += len(chunk)
+        if progress is not None:
+            progress(processed)
+    return result
+
+
+def _renewal_expense(row: dict, transaction_date: date) -> Expense:
+    return Expense(
+        user_id=row["user_id"],
+        subscription_id=row["id"],
+        name=row["name"],
+        category_id=row["category_id"],
+        amount=row["amount"],
+        currency=row["currency"],
+        transaction_date=transaction_date,
+        source=Expense.Source.SUBSCRIPTION,
+    )
+
+
+def _renew_chunk(chunk: list[dict], today: date, result: RenewalResult) -> None:
+    ids = [row["id"] for row in chunk]
+    renewed = set(
+        Expense.objects.filter(
+            subscription_id__in=ids,
+            transaction_date=today,
+            source=Expense.Source.SUBSCRIPTION,
+        ).values_list("subscription_id", flat=True)
+    )
+    pending = [row for row in chunk if row["id"] not in renewed]
+    result.skipped += len(chunk) - len(pending)
+    if not pending:
+        return
+
+    expenses = Expense.objects.bulk_create(
+        [_renewal_expense(row, today) for row in pending]
+    )
+    rollups.record_expenses(expenses)
+    versioning.bump(row["user_id"] for row in pending)
+
+    # Every row with the same interval gets the same next date, so one
+    # CASE over the distinct intervals covers the whole chunk.
+    intervals = {max(1, row["billing_interval_months"]) for row in pending}
+    intervals = sorted(intervals | {1})
+    renewals = schedule.to_dates(schedule.add_months(today, intervals))
+    next_dates = Case(
+        *(
+            When(billing_interval_months=interval, then=Value(renewal))
+            for interval, renewal in zip(intervals, renewals)
+        ),
+        default=Value(renewals[0]),
+        output_field=DateField(),
+    )
+    Subscription.objects.filter(pk__in=[row["id"] for row in pending]).update(
+        next_renewal_date=next_dates, updated_at=timezone.now()
+    )
+    result.created += len(pending)
+
+    transaction.on_commit(
+        lambda count=len(pending), first=ids[0], last=ids[-1]: logger.info(
+            "Renewals committed for %s subscriptions (ids %s..%s)",
+            count,
+            first,
+            last,
+        )
+    )
+
+
+def _catch_up_chunk(chunk: list[dict], today: date, result: RenewalResult) -> None:
+    schedules = dict(
+        zip((row["id"] for row in chunk), missed_billing_dates(chunk, today))
+    )
+    recorded = set(
+        Expense.objects.filter(
+            subscription_id__in=schedules,
+            transaction_date__gte=min(row["next_renewal_date"] for row in chunk),
+            transaction_date__lte=today,
+            source=Expense.Source.SUBSCRIPTION,
+        ).values_list("subscription_id", "transaction_date")
+    )
+
+    expenses = []
+    for row in chunk:
+        missed, _ = schedules[row["id"]]
+        for billing_date in missed:
+            if (row["id"], billing_date) in recorded:
+                result.skipped += 1
+            else:
+                expenses.append(_renewal_expense(row, billing_date))
+    Expense.objects.bulk_create(expenses)
+    rollups.record_expenses(expenses)
+
+    now = timezone.now()
+    Subscription.objects.bulk_update(
+        [
+            Subscription(id=pk, next_renewal_date=next_date, updated_at=now)
+            for pk, (_, next_date) in schedules.items()
+        ],
+        ["next_renewal_date", "updated_at"],
+    )
+    versioning.bump(row["user_id"] for row in chunk)
+    result.created += len(expenses)
@@ -0,0 +1,136 @@
+"""Spending reports: by month, category, source and year over year.
+
+Everything comes from one grouped query over the MonthlySpend rollups,
+served by their (user, month) index, so reports never scan Expense and
+include expenses moved to ExpenseArchive. The query also covers the twelve
+months before the range, which gives the year-over-year figures without a
+second pass. Group totals are converted to the reporting currency once per
+(month, currency) group, from rates loaded in a single query.
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from . import fx
+from .forecast import month_index, month_label, month_start
+from .models import Expense
+
+MAX_REPORT_MONTHS = 120
+UNCATEGORIZED = "Uncategorized"
+
+
+def spend_report(queryset, start: date, end: date, currency: str, today: date) -> dict:
+    """Report on `queryset` (MonthlySpend rows) from month `start` to `end`.
+
+    `start` and `end` are first-of-month dates; `today` caps the rate date
+    used for the current month.
+    """
+    first = month_index(start)
+    last = month_index(end)
+    rows = (
+        queryset.filter(month__gte=month_start(first - 12), month__lte=end)
+        .order_by()
+        .values("category_id", "category__name", "source", "currency", "month")
+        .annotate(total=Sum("total"), count=Sum("expense_count"))
+    )
+
+    state = fx.rates_state()
+    until = _rate_date(last, today)
+    months = defaultdict(lambda: defaultdict(Decimal))
+    counts = defaultdict(int)
+    categories = {}
+    unconverted = set()
+    for row in rows:
+        index = month_index(row["month"])
+        try:
+            rate = fx.rate(
+                row["currency"], currency, _rate_date(index, today), state, until
+            )
+        except fx.MissingRate:
+            unconverted.add(row["currency"])
+            continue
+        amount = row["total"] * rate
+        months[index][row["source"]] += amount
+        if index < first:
+            continue
+        counts[index] += row["count"]
+        key = row["category_id"]
+        if key not in categories:
+            name = row["category__name"] or UNCATEGORIZED
+            categories[key] = {"category": key, "name": name, "total": Decimal(0)}
+        categories[key]["total"] += amount
+
+    sources = defaultdict(Decimal)
+    years = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    month_results = []
+    for index in range(first, last + 1):
+        by_source = months.get(index, {})
+        total = sum(by_source.values(), Decimal(0))
+        previous = sum(months.get(index - 12, {}).values(), Decimal(0))
+        for source, amount in by_source.items():
+            sources[source] += amount
+        years[index // 12][0] += total
+        years[index // 12][1] += previous
+        month_results.append(
+            {
+                "month": month_label(index),
+                "total": _money(total),
+                "count": counts[index],
+                "sources": {
+                    source: _money(by_source.get(source, 0))
+                    for source in Expense.Source.values
+                },
+                "previous_year": _money(previous),
+                "change": _change(total, previous),
+            }
+        )
+
+    return {
+        "from": month_label(first),
+        "to": month_label(last),
+        "currency": currency,
+        "total": _money(sum(sources.values(), Decimal(0))),
+        "months": month_results,
+        "categories": [
+            {**entry, "total": _money(entry["total"])}
+            for entry in sorted(
+                categories.values(), key=lambda item: (-item["total"], item["name"])
+            )
+        ],
+        "sources": [
+            {"source": source, "total": _money(sources.get(source, 0))}
+            for source in Expense.Source.values
+        ],
+        # Each year covers only its months inside the range, compared with
+        # the same months a year earlier.
+        "years": [
+            {
+                "year": year,
+                "total": _money(total),
+                "previous_year": _money(previous),
+                "change": _change(total, previous),
+            }
+            for year, (total, previous) in sorted(years.items())
+        ],
+        "unconverted": sorted(unconverted),
+    }
+
+
+def _rate_date(index: int, today: date) -> date:
+    """Convert a month at its last day's rate, or today's for this month."""
+    next_month = month_start(index + 1)
+    return min(date.fromordinal(next_month.toordinal() - 1), today)
+
+
+def _money(value) -> str:
+    return str(Decimal(value).quantize(fx.CENT))
+
+
+def _change(total: Decimal, previous: Decimal) -> str | None:
+    """Percentage change from `previous`, or None when there is no baseline."""
+    if not previous:
+        return None
+    return str(((total - previous) / previous * 100).quantize(Decimal("0.1")))
@@ -0,0 +1,173 @@
+from collections import defaultdict
+from collections.abc import Iterable
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Expense, ExpenseArchive, MonthlySpend
+
+# (user_id, month, category_id, currency, source)
+RollupKey = tuple[int, object, int | None, str, str]
+
+# MonthlySpend columns in the order rebuild() selects them.
+REBUILD_FIELDS = (
+    "user",
+    "category",
+    "currency",
+    "source",
+    "month",
+    "total",
+    "expense_count",
+    "updated_at",
+)
+
+
+# MonthlySpend columns in the order apply_deltas() inserts them.
+UPSERT_FIELDS = (
+    "user",
+    "month",
+    "category",
+    "currency",
+    "source",
+    "total",
+    "expense_count",
+    "updated_at",
+)
+# Rollup keys per upsert statement; 8 parameters each.
+UPSERT_BATCH_SIZE = 500
+
+_amount_field = Expense._meta.get_field("amount")
+_date_field = Expense._meta.get_field("transaction_date")
+
+
+def rollup_key(expense: Expense) -> RollupKey:
+    # to_python: instances saved straight from user input may still hold strings.
+    transaction_date = _date_field.to_python(expense.transaction_date)
+    return (
+        expense.user_id,
+        transaction_date.replace(day=1),
+        expense.category_id,
+        expense.currency,
+        expense.source,
+    )
+
+
+def record_expenses(expenses: Iterable[Expense], sign: int = 1) -> None:
+    """Add (or with sign=-1, remove) expenses from the monthly rollups.
+
+    Bulk write paths that bypass `Expense.save` must call this themselves.
+    """
+    deltas: dict[RollupKey, list] = defaultdict(lambda: [Decimal(0), 0])
+    for expense in expenses:
+        delta = deltas[rollup_key(expense)]
+        delta[0] += sign * _amount_field.to_python(expense.amount)
+        delta[1] += sign
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas: dict[RollupKey, list]) -> None:
+    """Apply (total, count) deltas, creating missing rollup rows as needed.
+
+    Each batch of keys is one INSERT ... ON CONFLICT DO UPDATE that adds the
+    deltas to the stored values, so other writers' changes to the same rows
+    are kept and the cost does not grow with a statement per key.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    # Sorted, so concurrent writers lock shared rows in the same order
+    # rather than deadlocking.
+    categorized = sorted(key for key in deltas if key[2] is not None)
+    uncategorized = sorted(key for key in deltas if key[2] is None)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for keys, categorized_keys in ((categorized, True), (uncategorized, False)):
+            for start in range(0, len(keys), UPSERT_BATCH_SIZE):
+                batch = keys[start : start + UPSERT_BATCH_SIZE]
+                params = []
+                for key in batch:
+                    user_id, month, category_id, currency, source = key
+                    total, count = deltas[key]
+                    params += [
+                        user_id,
+                        connection.ops.adapt_datefield_value(month),
+                        category_id,
+                        currency,
+                        source,
+                        connection.ops.adapt_decimalfield_value(total),
+                        count,
+                        now,
+                    ]
+                cursor.execute(_upsert_sql(len(batch), categorized_keys), params)
+
+
+def _upsert_sql(rows: int, categorized: bool) -> str:
+    qn = connection.ops.quote_name
+    table = qn(MonthlySpend._meta.db_table)
+    columns = [qn(MonthlySpend._meta.get_field(name).column) for name in UPSERT_FIELDS]
+    user, month, category, currency, source, total, count, updated_at = columns
+    # The conflict target must name the partial unique constraint that applies.
+    if categorized:
+        target = f"{user}, {month}, {category}, {currency}, {source}"
+        condition = f"{category} IS NOT NULL"
+    else:
+        target = f"{user}, {month}, {currency}, {source}"
+        condition = f"{category} IS NULL"
+    values = ", ".join(["({})".format(", ".join(["%s"] * len(columns)))] * rows)
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values} "
+        f"ON CONFLICT ({target}) WHERE {condition} DO UPDATE SET "
+        f"{total} = {table}.{total} + EXCLUDED.{total}, "
+        f"{count} = {table}.{count} + EXCLUDED.{count}, "
+        f"{updated_at} = EXCLUDED.{updated_at}"
+    )
+
+
+def rebuild() -> int:
+    """Recompute every rollup row from Expense and ExpenseArchive.
+
+    Both tables are grouped by month in the database and combined with one
+    INSERT ... SELECT over their UNION ALL, so the grouped rows never leave
+    the database and a rebuild over millions of expenses costs one query.
+    """
+    parts = [_monthly_totals(model) for model in (Expense, ExpenseArchive)]
+    qn = connection.ops.quote_name
+    keys = ", ".join(
+        qn(name) for name in ("user_id", "category_id", "currency", "source", "month")
+    )
+    columns = ", ".join(
+        qn(MonthlySpend._meta.get_field(name).column) for name in REBUILD_FIELDS
+    )
+    union = " UNION ALL ".join(part for part, _ in parts)
+    sql = (
+        f"INSERT INTO {qn(MonthlySpend._meta.db_table)} ({columns}) "
+        f"SELECT {keys}, ROUND(SUM({qn('total')}), 2), SUM({qn('expense_count')}), "
+        f"%s FROM ({union}) {qn('totals')} GROUP BY {keys}"
+    )
+    params = [connection.ops.adapt_datetimefield_value(timezone.now())]
+    for _, part_params in parts:
+        params += part_params
+    with transaction.atomic():
+        MonthlySpend.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+
+def _monthly_totals(model):
+    """(SQL, params) of `model`'s totals per rollup key and month."""
+    rows = (
+        model.objects.order_by()
+        .values(
+            "user_id",
+            "category_id",
+            "currency",
+            "source",
+            month=TruncMonth("transaction_date"),
+        )
+        .annotate(total=Sum("amount"), expense_count=Count("id"))
+    )
+    return rows.query.sql_with_params()
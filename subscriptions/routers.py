@@ -0,0 +1,120 @@
+"""Send report and list reads to a read replica, when one is configured.
+
+Only views that opt in read from the replica: function views wrapped in
+`read_from_replica` and the list/retrieve actions of viewsets using
+`ReplicaReadMixin`. Everything else, including every write and every read
+outside a request (jobs, commands), stays on the primary.
+
+A client that just wrote would not see its write on a lagging replica, so
+`PrimaryPinningMiddleware` sets a short-lived cookie after every successful
+unsafe request, and reads from a client carrying it go to the primary until
+the cookie expires (REPLICA_PIN_SECONDS).
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = "pin_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+def replica_alias() -> str | None:
+    """The replica's database alias (REPLICA_DATABASE), or None."""
+    return getattr(settings, "REPLICA_DATABASE", None)
+
+
+def can_use_replica(request) -> bool:
+    """Whether `request` may read from the replica (safe and not pinned)."""
+    return (
+        replica_alias() is not None
+        and request.method in SAFE_METHODS
+        and PIN_COOKIE not in request.COOKIES
+    )
+
+
+@contextmanager
+def replica(enabled: bool = True):
+    """Route the enclosed block's reads to the replica if `enabled`."""
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def read_from_replica(view):
+    """Serve a read-only function view from the replica."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica(can_use_replica(request)):
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """Serve a viewset's `replica_actions` from the replica.
+
+    Only the action handler reads from it: authentication and the session
+    are loaded from the primary in `initial()` first, so a client whose
+    session has not reached the replica yet is not turned away.
+    """
+
+    replica_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and can_use_replica(request):
+            method = request.method.lower()
+            setattr(self, method, read_from_replica(getattr(self, method)))
+
+
+class ReplicaRouter:
+    """Reads go to the replica inside `replica()`; everything else to default."""
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and _use_replica.get():
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A replica gets its schema from the primary, not from migrate.
+        return db != replica_alias()
+
+
+class PrimaryPinningMiddleware:
+    """After a successful write, read from the primary for a few seconds."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            replica_alias() is not None
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
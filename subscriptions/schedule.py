@@ -0,0 +1,64 @@
+"""Vectorized billing schedule calculations.
+
+These mirror `subscriptions.models.add_months` (same end-of-month clamping)
+but work on whole arrays of anchors and intervals at once, so projecting or
+backfilling schedules costs a handful of NumPy operations instead of one
+`calendar.monthrange` call per subscription per cycle.
+"""
+
+from datetime import date
+
+import numpy as np
+
+
+def to_days(dates) -> np.ndarray:
+    """Convert dates (or an array of them) to `datetime64[D]`."""
+    return np.asarray(dates, dtype="datetime64[D]")
+
+
+def to_dates(values: np.ndarray) -> list[date]:
+    """Convert a `datetime64[D]` array back to Python dates."""
+    return values.astype("datetime64[D]").tolist()
+
+
+def add_months(dates, months) -> np.ndarray:
+    """Advance each date by N months, clamped to month end when needed.
+
+    `dates` and `months` broadcast against each other, so a column of anchors
+    and a row of offsets yields a full schedule matrix.
+    """
+    days = to_days(dates)
+    month_start = days.astype("datetime64[M]")
+    day_offset = days - month_start.astype("datetime64[D]")
+
+    target = month_start + np.asarray(months, dtype=np.int64)
+    target_start = target.astype("datetime64[D]")
+    month_length = (target + 1).astype("datetime64[D]") - target_start
+    return target_start + np.minimum(day_offset, month_length - 1)
+
+
+def renewal_dates(anchors, intervals, count: int, first_cycle=1) -> np.ndarray:
+    """Return an (N, count) matrix of the next `count` billing dates per anchor.
+
+    Row i holds `anchors[i]` advanced by `(first_cycle[i] + k) * intervals[i]`
+    months for k in 0..count-1.
+    """
+    anchors = to_days(anchors)
+    intervals = np.maximum(np.asarray(intervals, dtype=np.int64), 1)
+    first_cycle = np.asarray(first_cycle, dtype=np.int64)
+    cycles = np.broadcast_to(first_cycle, anchors.shape)[:, None] + np.arange(count)
+    return add_months(anchors[:, None], cycles * intervals[:, None])
+
+
+def first_cycle_after(anchors, intervals, dates) -> np.ndarray:
+    """Return the smallest cycle k >= 1 whose billing date is after `dates`."""
+    anchors = to_days(anchors)
+    intervals = np.maximum(np.asarray(intervals, dtype=np.int64), 1)
+    dates = to_days(dates)
+
+    elapsed = dates.astype("datetime64[M]") - anchors.astype("datetime64[M]")
+    cycle = np.maximum(elapsed.astype(np.int64) // intervals, 1)
+    # Cycle k lands in or before the month of `dates`, and k + 1 lands after
+    # it, so at most one step forward is needed.
+    landed = add_months(anchors, cycle * intervals)
+    return cycle + (landed <= dates)
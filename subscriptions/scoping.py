@@ -0,0 +1,58 @@
+"""Per-user scoping: users see and write only their own rows; staff see all.
+
+`scope()` adds an equality filter on `user` to a queryset before any other
+lookup a view applies, so lists run through the indexes that lead with
+`user` (Category's (user, name), Subscription's (user, status), Expense's
+(user, transaction_date), MonthlySpend's (user, month), Job's
+(user, created_at)) and cost the same however many other tenants there
+are. Another user's rows are simply not found (a 404 on detail routes), so
+there is no object-level permission check and no query for one.
+"""
+
+from functools import wraps
+
+from django.http import JsonResponse
+
+
+def sees_everything(user) -> bool:
+    """Staff see every user's rows; everyone else only their own."""
+    return user.is_staff
+
+
+def scope(queryset, user, field: str = "user"):
+    """Restrict `queryset` to the rows whose `field` is `user`."""
+    if sees_everything(user):
+        return queryset
+    if not user.is_authenticated:
+        return queryset.none()
+    return queryset.filter(**{field: user})
+
+
+def owner(user) -> str:
+    """Cache key part naming whose rows `scope()` leaves for `user`."""
+    return "all" if sees_everything(user) else str(user.pk)
+
+
+def login_required(view):
+    """Answer anonymous requests to a JSON view with a 401."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def staff_required(view):
+    """Answer JSON view requests from anyone but staff with a 401 or 403."""
+
+    @wraps(view)
+    @login_required
+    def wrapper(request, *args, **kwargs):
+        if not sees_everything(request.user):
+            return JsonResponse({"error": "Staff only."}, status=403)
+        return view(request, *args, **kwargs)
+
+    return wrapper
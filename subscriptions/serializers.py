@@ -1,21 +1,110 @@
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
-from .models import Category, Expense, Subscription
+from . import scoping
+from .importers import DEFAULT_CATEGORY
+from .instrumentation import section
+from .models import Category, Expense, Job, Subscription
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class InstrumentedSerializerMixin:
+    """Count top-level to_representation time as the "serialize" section."""
+
+    def to_representation(self, instance):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return super().to_representation(instance)
+        with section("serialize"):
+            return super().to_representation(instance)
+
+
+class SparseFieldsetMixin:
+    """Drop fields not listed in `?fields=id,amount,...` on read requests."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or request.method not in ("GET", "HEAD"):
+            return
+        requested = request.query_params.get("fields")
+        if not requested:
+            return
+        wanted = {name.strip() for name in requested.split(",")}
+        for name in list(self.fields):
+            if name not in wanted:
+                self.fields.pop(name)
+
+
+class UserScopedSerializerMixin:
+    """Outside staff, `user` is the requester and related rows must be theirs.
+
+    Related-field choices go through `scoping.scope`, so a non-staff user can
+    neither see nor attach another user's category or subscription; `user`
+    becomes read-only, defaulting to the requester for unique checks.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or scoping.sees_everything(request.user):
+            return
+        for name, field in list(self.fields.items()):
+            if name == "user":
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True, default=serializers.CurrentUserDefault()
+                )
+            elif isinstance(field, serializers.RelatedField) and not field.read_only:
+                field.queryset = scoping.scope(field.queryset, request.user)
+
+
+class CategorySerializer(
+    InstrumentedSerializerMixin,
+    SparseFieldsetMixin,
+    UserScopedSerializerMixin,
+    serializers.ModelSerializer,
+):
     class Meta:
         model = Category
         fields = "__all__"
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(
+    InstrumentedSerializerMixin,
+    SparseFieldsetMixin,
+    UserScopedSerializerMixin,
+    serializers.ModelSerializer,
+):
     class Meta:
         model = Subscription
         fields = "__all__"
 
 
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(
+    InstrumentedSerializerMixin,
+    SparseFieldsetMixin,
+    UserScopedSerializerMixin,
+    serializers.ModelSerializer,
+):
     class Meta:
         model = Expense
         fields = "__all__"
+
+
+class JobSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = "__all__"
+        read_only_fields = [field.name for field in Job._meta.fields]
+
+
+class ExpenseImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    user = serializers.PrimaryKeyRelatedField(
+        queryset=get_user_model().objects.all(), required=False
+    )
+    format = serializers.ChoiceField(choices=["csv", "ofx"], required=False)
+    unsigned = serializers.BooleanField(default=False)
+    currency = serializers.RegexField(r"^[A-Za-z]{3}$", default="AUD")
+    category = serializers.CharField(max_length=100, default=DEFAULT_CATEGORY)
@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import rollups, versioning
+from .models import Category, ExchangeRate, Expense, Subscription
+
+
+@receiver(pre_save, sender=Expense)
+def remember_previous_expense(sender, instance, raw=False, **kwargs):
+    """Keep the stored row so post_save can move its amount between rollups."""
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_previous = (
+        Expense.objects.filter(pk=instance.pk)
+        .only(
+            "user_id", "transaction_date", "category_id", "currency", "source", "amount"
+        )
+        .first()
+    )
+
+
+@receiver(post_save, sender=Expense)
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous is not None:
+        rollups.record_expenses([previous], sign=-1)
+    rollups.record_expenses([instance])
+
+
+@receiver(post_delete, sender=Expense)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.record_expenses([instance], sign=-1)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Subscription)
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_delete, sender=Expense)
+def bump_data_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    users = {instance.user_id}
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous is not None:
+        users.add(previous.user_id)
+    versioning.bump(users)
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def bump_all_data_versions(sender, instance, raw=False, **kwargs):
+    # Any user's converted reports may depend on the rate.
+    if not raw:
+        versioning.bump_all()
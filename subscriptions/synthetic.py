@@ -0,0 +1,328 @@
+"""Synthetic data for benchmarks: users, categories, subscriptions, expenses.
+
+Data is generated with NumPy from a seed, so a given scale always produces
+the same rows. Users are created in chunks, and each chunk's expenses are
+generated lazily and inserted in batches with a raw `executemany` (skipping
+model instances, which dominate `bulk_create` at this volume), so memory
+stays bounded whether the target is a thousand expenses or ten million.
+
+Subscriptions cover every billing cycle and status. Each one gets its past
+renewal expenses up to its next renewal date, a few of which fall on or
+before today so `renew_subscriptions` has work to do. Manual expenses make up
+the rest of the target.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from itertools import chain, islice
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import rollups, schedule, versioning
+from .models import Category, Expense, Subscription
+
+DEFAULT_PREFIX = "synthetic-"
+DEFAULT_BATCH_SIZE = 5000
+USERS_PER_CHUNK = 200
+
+CATEGORIES = (
+    "Streaming",
+    "Music",
+    "Software",
+    "Cloud storage",
+    "News",
+    "Fitness",
+    "Gaming",
+    "Utilities",
+    "Groceries",
+    "Transport",
+    "Dining",
+    "Travel",
+)
+# Categories subscriptions are drawn from; manual expenses use any.
+SUBSCRIPTION_CATEGORIES = 8
+SERVICES = (
+    "Netflix",
+    "Spotify",
+    "Disney+",
+    "YouTube Premium",
+    "iCloud",
+    "Dropbox",
+    "GitHub",
+    "Adobe Creative Cloud",
+    "Microsoft 365",
+    "The Guardian",
+    "Strava",
+    "Gym membership",
+    "Xbox Game Pass",
+    "Electricity",
+    "Internet",
+    "Mobile plan",
+)
+MERCHANTS = (
+    "Woolworths",
+    "Coles",
+    "Aldi",
+    "Uber",
+    "Opal",
+    "Shell",
+    "Bunnings",
+    "Kmart",
+    "JB Hi-Fi",
+    "Chemist Warehouse",
+    "Cafe",
+    "Restaurant",
+    "Qantas",
+    "Airbnb",
+)
+CURRENCIES = ("AUD", "USD", "EUR")
+CURRENCY_WEIGHTS = (0.8, 0.15, 0.05)
+# (billing cycle, interval months, weight); custom cycles bill every N months.
+CYCLES = (
+    (Subscription.BillingCycle.MONTHLY, 1, 0.7),
+    (Subscription.BillingCycle.YEARLY, 12, 0.2),
+    (Subscription.BillingCycle.CUSTOM, 3, 0.05),
+    (Subscription.BillingCycle.CUSTOM, 6, 0.05),
+)
+# Expense columns in the order the generators yield them.
+EXPENSE_FIELDS = (
+    "user",
+    "subscription",
+    "category",
+    "name",
+    "amount",
+    "currency",
+    "transaction_date",
+    "source",
+    "notes",
+    "created_at",
+    "updated_at",
+)
+STATUSES = (
+    (Subscription.Status.ACTIVE, 0.85),
+    (Subscription.Status.PAUSED, 0.1),
+    (Subscription.Status.CANCELLED, 0.05),
+)
+
+
+@dataclass
+class SeedResult:
+    users: int = 0
+    categories: int = 0
+    subscriptions: int = 0
+    expenses: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.expenses / self.elapsed if self.elapsed else 0.0
+
+
+def seed(
+    users: int,
+    expenses: int,
+    subscriptions_per_user: int = 8,
+    years: int = 3,
+    today: date | None = None,
+    random_seed: int = 0,
+    prefix: str = DEFAULT_PREFIX,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress=None,
+) -> SeedResult:
+    """Create `users` users with about `expenses` expenses between them.
+
+    Expenses span the `years` before `today`. Usernames are `prefix` plus a
+    number, and `progress(result)` is called after every chunk of users.
+    """
+    today = today or date.today()
+    rng = np.random.default_rng(random_seed)
+    result = SeedResult()
+    started = time.perf_counter()
+    per_user = expenses / users
+    for first in range(0, users, USERS_PER_CHUNK):
+        count = min(USERS_PER_CHUNK, users - first)
+        # Spread the remainder so the chunks add up to the target exactly.
+        target = round(per_user * (first + count)) - round(per_user * first)
+        with transaction.atomic():
+            _seed_chunk(
+                rng,
+                range(first, first + count),
+                target,
+                subscriptions_per_user,
+                years,
+                today,
+                prefix,
+                batch_size,
+                result,
+            )
+        result.elapsed = time.perf_counter() - started
+        if progress:
+            progress(result)
+    rollups.rebuild()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _seed_chunk(
+    rng, numbers, expenses, per_user, years, today, prefix, batch_size, result
+):
+    User = get_user_model()
+    password = make_password(None)
+    users = User.objects.bulk_create(
+        [User(username=f"{prefix}{number:07d}", password=password) for number in numbers]
+    )
+    user_ids = np.array([user.pk for user in users])
+
+    categories = Category.objects.bulk_create(
+        [
+            Category(user_id=user_id, name=name)
+            for user_id in user_ids.tolist()
+            for name in CATEGORIES
+        ],
+        batch_size=batch_size,
+    )
+    category_ids = np.array([category.pk for category in categories]).reshape(
+        len(user_ids), len(CATEGORIES)
+    )
+
+    subscriptions, billed = _subscriptions(
+        rng, user_ids, category_ids, per_user, years, today
+    )
+    subscriptions = Subscription.objects.bulk_create(
+        subscriptions, batch_size=batch_size
+    )
+    manual = max(0, expenses - int(billed.sum()))
+    rows = chain(
+        _renewal_expenses(subscriptions, billed),
+        _manual_expenses(rng, user_ids, category_ids, manual, years, today),
+    )
+    sql = _insert_sql(Expense, EXPENSE_FIELDS)
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+            result.expenses += len(batch)
+
+    versioning.bump(user_ids.tolist())
+    result.users += len(user_ids)
+    result.categories += len(categories)
+    result.subscriptions += len(subscriptions)
+
+
+def _subscriptions(rng, user_ids, category_ids, per_user, years, today):
+    """Subscriptions for every user, with how many cycles each has billed."""
+    count = len(user_ids) * per_user
+    owners = np.repeat(np.arange(len(user_ids)), per_user)
+    cycles = rng.choice(len(CYCLES), count, p=[cycle[2] for cycle in CYCLES])
+    intervals = np.array([CYCLES[index][1] for index in cycles])
+    statuses = rng.choice(len(STATUSES), count, p=[status[1] for status in STATUSES])
+    anchors = np.datetime64(today) - rng.integers(30, years * 365, count)
+    # Renew after a date up to a week back, so about one monthly
+    # subscription in eight is already due.
+    horizon = np.datetime64(today) - rng.integers(0, 8, count)
+    next_cycles = schedule.first_cycle_after(anchors, intervals, horizon)
+    next_dates = schedule.add_months(anchors, next_cycles * intervals)
+    amounts = np.round(rng.lognormal(2.6, 0.7, count), 2) * np.where(
+        intervals == 12, 10, intervals
+    )
+    currencies = rng.choice(len(CURRENCIES), count, p=CURRENCY_WEIGHTS)
+    services = rng.integers(0, len(SERVICES), count)
+    categories = rng.integers(0, SUBSCRIPTION_CATEGORIES, count)
+
+    subscriptions = []
+    anchor_dates = schedule.to_dates(anchors)
+    renewal_dates = schedule.to_dates(next_dates)
+    for i in range(count):
+        cycle, interval, _ = CYCLES[cycles[i]]
+        subscriptions.append(
+            Subscription(
+                user_id=int(user_ids[owners[i]]),
+                name=SERVICES[services[i]],
+                category_id=int(category_ids[owners[i], categories[i]]),
+                billing_cycle=cycle,
+                billing_interval_months=interval,
+                amount=f"{amounts[i]:.2f}",
+                currency=CURRENCIES[currencies[i]],
+                billing_date=anchor_dates[i],
+                next_renewal_date=renewal_dates[i],
+                status=STATUSES[statuses[i]][0],
+            )
+        )
+    return subscriptions, next_cycles
+
+
+def _renewal_expenses(subscriptions, billed):
+    """One expense per cycle from each anchor up to its next renewal."""
+    if not subscriptions:
+        return
+    dates = schedule.renewal_dates(
+        [subscription.billing_date for subscription in subscriptions],
+        [subscription.billing_interval_months for subscription in subscriptions],
+        count=int(billed.max()),
+        first_cycle=0,
+    )
+    adapt_date = connection.ops.adapt_datefield_value
+    now = _now()
+    for subscription, cycles, row in zip(subscriptions, billed.tolist(), dates):
+        amount = _decimal(subscription.amount)
+        for transaction_date in schedule.to_dates(row[:cycles]):
+            yield (
+                subscription.user_id,
+                subscription.pk,
+                subscription.category_id,
+                subscription.name,
+                amount,
+                subscription.currency,
+                adapt_date(transaction_date),
+                Expense.Source.SUBSCRIPTION,
+                "",
+                now,
+                now,
+            )
+
+
+def _manual_expenses(rng, user_ids, category_ids, count, years, today):
+    owners = rng.integers(0, len(user_ids), count)
+    categories = rng.integers(0, len(CATEGORIES), count)
+    merchants = rng.integers(0, len(MERCHANTS), count)
+    amounts = np.round(rng.lognormal(3.3, 1.0, count), 2)
+    currencies = rng.choice(len(CURRENCIES), count, p=CURRENCY_WEIGHTS)
+    # Sorted like a statement import; expenses are mostly inserted in date order.
+    dates = np.sort(np.datetime64(today) - rng.integers(0, years * 365, count))
+    adapt_date = connection.ops.adapt_datefield_value
+    now = _now()
+    for i, transaction_date in enumerate(schedule.to_dates(dates)):
+        yield (
+            int(user_ids[owners[i]]),
+            None,
+            int(category_ids[owners[i], categories[i]]),
+            MERCHANTS[merchants[i]],
+            _decimal(f"{amounts[i]:.2f}"),
+            CURRENCIES[currencies[i]],
+            adapt_date(transaction_date),
+            Expense.Source.MANUAL,
+            "",
+            now,
+            now,
+        )
+
+
+def _insert_sql(model, fields) -> str:
+    qn = connection.ops.quote_name
+    columns = [qn(model._meta.get_field(name).column) for name in fields]
+    return "INSERT INTO {} ({}) VALUES ({})".format(
+        qn(model._meta.db_table), ", ".join(columns), ", ".join(["%s"] * len(columns))
+    )
+
+
+def _decimal(value):
+    return connection.ops.adapt_decimalfield_value(Decimal(value), 10, 2)
+
+
+def _now():
+    return connection.ops.adapt_datetimefield_value(timezone.now())
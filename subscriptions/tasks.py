@@ -0,0 +1,65 @@
+"""Job handlers; imported at startup so every kind is registered."""
+
+from dataclasses import asdict
+from datetime import date
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from . import importers, jobs, matching, reminders, rollups
+from .models import Expense, Subscription
+from .renewals import DEFAULT_BATCH_SIZE, RenewalResult, renew_selection
+
+
+@jobs.handler("renew_subscriptions")
+def renew_subscriptions_job(job, payload):
+    """Renew the subscriptions in payload["ids"] as of payload["today"]."""
+    today = date.fromisoformat(payload["today"])
+    ids = payload["ids"]
+    total = RenewalResult()
+    # Slice the ids so no single query carries more than a batch of params.
+    for start in range(0, len(ids), DEFAULT_BATCH_SIZE):
+        batch = Subscription.objects.filter(
+            pk__in=ids[start : start + DEFAULT_BATCH_SIZE]
+        )
+        result = renew_selection(batch, today)
+        total.created += result.created
+        total.skipped += result.skipped
+        jobs.report_progress(job, min(start + DEFAULT_BATCH_SIZE, len(ids)))
+    return {"created": total.created, "skipped": total.skipped}
+
+
+@jobs.handler("rebuild_rollups")
+def rebuild_rollups_job(job, payload):
+    return {"rows": rollups.rebuild()}
+
+
+@jobs.handler("import_expenses")
+def import_expenses_job(job, payload):
+    """Import an uploaded statement saved at payload["path"], then delete it.
+
+    Imported lines are then matched against the user's subscriptions.
+    """
+    user = get_user_model().objects.get(pk=payload["user_id"])
+    path = Path(payload["path"])
+    result = importers.import_expenses(
+        importers.parse_file(
+            path, payload.get("format"), signed=not payload.get("unsigned", False)
+        ),
+        user,
+        currency=payload.get("currency", "AUD"),
+        category=payload.get("category", importers.DEFAULT_CATEGORY),
+        progress=lambda done: jobs.report_progress(job, done),
+    )
+    path.unlink(missing_ok=True)
+    matched = matching.match_expenses(Expense.objects.filter(user=user))
+    return {**result.as_dict(), "matched": matched.matched}
+
+
+@jobs.handler("send_renewal_reminders")
+def send_renewal_reminders_job(job, payload):
+    """Send reminders due on payload["today"] (default: today)."""
+    today = date.fromisoformat(payload["today"]) if "today" in payload else None
+    result = reminders.send_reminders(today or timezone.localdate())
+    return asdict(result)
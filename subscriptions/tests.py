@@ -1,3 +1,1691 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Sum
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import (
+    archive,
+    benchmarks,
+    exports,
+    fx,
+    importers,
+    jobs,
+    matching,
+    reminders,
+    rollups,
+    routers,
+    schedule,
+    synthetic,
+    views,
+)
+from .admin import SubscriptionAdmin
+from .backends.sqlite3.base import WriteQueue
+from .forecast import project_spend
+from .instrumentation import QueryBudgetExceeded, query_budget, registry
+from .models import (
+    Category,
+    DataVersion,
+    ExchangeRate,
+    Expense,
+    ExpenseArchive,
+    Job,
+    MonthlySpend,
+    ReminderPreference,
+    RenewalReminder,
+    Subscription,
+    add_months,
+)
+from .renewals import (
+    catch_up_subscriptions,
+    due_subscriptions,
+    renew_subscriptions,
+    shard,
+)
+from .serializers import CategorySerializer, ExpenseSerializer, SubscriptionSerializer
+
+
+def every_day(start: date, end: date) -> list[date]:
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
+class ScheduleEquivalenceTests(SimpleTestCase):
+    """The vectorized schedule must agree with `add_months` exactly."""
+
+    # Covers leap years, a century non-leap year and every month end.
+    anchors = every_day(date(2023, 1, 1), date(2025, 12, 31)) + every_day(
+        date(2099, 12, 1), date(2100, 3, 31)
+    )
+
+    def test_add_months_matches_scalar(self):
+        offsets = np.arange(0, 49)
+        result = schedule.add_months(
+            schedule.to_days(self.anchors)[:, None], offsets[None, :]
+        )
+        for i, anchor in enumerate(self.anchors):
+            expected = [add_months(anchor, int(months)) for months in offsets]
+            self.assertEqual(schedule.to_dates(result[i]), expected, anchor)
+
+    def test_add_months_accepts_scalars(self):
+        self.assertEqual(
+            schedule.add_months(date(2024, 1, 31), 1).item(), date(2024, 2, 29)
+        )
+
+    def test_renewal_dates_match_repeated_add_months(self):
+        intervals = [1, 2, 3, 6, 12, 18]
+        for interval in intervals:
+            result = schedule.renewal_dates(
+                self.anchors, [interval] * len(self.anchors), count=8
+            )
+            for i, anchor in enumerate(self.anchors):
+                expected = [add_months(anchor, k * interval) for k in range(1, 9)]
+                self.assertEqual(schedule.to_dates(result[i]), expected, anchor)
+
+    def test_renewal_dates_per_row_first_cycle(self):
+        anchors = [date(2024, 1, 31), date(2024, 8, 31)]
+        result = schedule.renewal_dates(anchors, [1, 3], count=2, first_cycle=[2, 5])
+        self.assertEqual(
+            schedule.to_dates(result[0]), [date(2024, 3, 31), date(2024, 4, 30)]
+        )
+        self.assertEqual(
+            schedule.to_dates(result[1]), [date(2025, 11, 30), date(2026, 2, 28)]
+        )
+
+    def test_first_cycle_after_matches_linear_scan(self):
+        anchors = [date(2024, 1, 31), date(2024, 2, 29), date(2024, 5, 15)]
+        targets = every_day(date(2023, 12, 1), date(2026, 3, 1))
+        for interval in (1, 3, 12):
+            for anchor in anchors:
+                result = schedule.first_cycle_after(
+                    [anchor] * len(targets), [interval] * len(targets), targets
+                )
+                for target, cycle in zip(targets, result.tolist()):
+                    expected = 1
+                    while add_months(anchor, expected * interval) <= target:
+                        expected += 1
+                    self.assertEqual(cycle, expected, (anchor, interval, target))
+
+
+class RenewalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("owner")
+        cls.category = Category.objects.create(user=cls.user, name="Streaming")
+
+    def subscribe(self, name, billing_date, interval=1, next_renewal_date=None):
+        return Subscription.objects.create(
+            user=self.user,
+            name=name,
+            category=self.category,
+            amount=Decimal("9.99"),
+            billing_cycle=Subscription.BillingCycle.CUSTOM,
+            billing_interval_months=interval,
+            billing_date=billing_date,
+            next_renewal_date=next_renewal_date,
+        )
+
+    def test_mixed_intervals_and_same_day_rerun(self):
+        today = date(2024, 1, 31)
+        intervals = {"Monthly": 1, "Quarterly": 3, "Yearly": 12, "Biannual": 6}
+        for name, interval in intervals.items():
+            self.subscribe(name, date(2023, 1, 31), interval, next_renewal_date=today)
+
+        result = renew_subscriptions(due_subscriptions(today), today)
+        self.assertEqual((result.created, result.skipped), (4, 0))
+        # One CASE over the chunk's intervals sets every next date.
+        for subscription in Subscription.objects.all():
+            interval = intervals[subscription.name]
+            self.assertEqual(
+                subscription.next_renewal_date, add_months(today, interval)
+            )
+        self.assertEqual(
+            Expense.objects.filter(transaction_date=today).count(), len(intervals)
+        )
+
+        # A rerun that still finds them due bills nothing twice.
+        Subscription.objects.update(next_renewal_date=today)
+        result = renew_subscriptions(due_subscriptions(today), today)
+        self.assertEqual((result.created, result.skipped), (0, 4))
+        self.assertEqual(Expense.objects.count(), len(intervals))
+
+    def test_batch_size_one_walks_primary_keys(self):
+        today = timezone.localdate()
+        for n in range(3):
+            self.subscribe(f"Service {n}", today, next_renewal_date=today)
+        # Already billed today: skipped but still due, so an offset-based
+        # walk would see it again.
+        billed = self.subscribe("Billed", today, next_renewal_date=today)
+        Expense.objects.create(user=self.user, subscription=billed)
+
+        out = io.StringIO()
+        call_command("renew_subscriptions", batch_size=1, stdout=out)
+        self.assertIn("Renewals complete. Created: 3, Skipped: 1", out.getvalue())
+        self.assertEqual(list(due_subscriptions(today)), [billed])
+        progress = []
+        renew_subscriptions(
+            Subscription.objects.order_by("-pk"), today, 1, progress.append
+        )
+        self.assertEqual(progress, [1, 2, 3, 4])
+
+    def test_catch_up_keeps_month_end_anchor(self):
+        subscription = self.subscribe(
+            "Gym", date(2024, 1, 31), next_renewal_date=date(2024, 2, 29)
+        )
+        today = date(2024, 5, 15)
+        result = catch_up_subscriptions(due_subscriptions(today), today)
+        self.assertEqual((result.created, result.skipped), (3, 0))
+        self.assertEqual(
+            sorted(Expense.objects.values_list("transaction_date", flat=True)),
+            [date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)],
+        )
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.next_renewal_date, date(2024, 5, 31))
+
+        self.assertEqual(due_subscriptions(today).count(), 0)
+        Subscription.objects.update(next_renewal_date=date(2024, 2, 29))
+        result = catch_up_subscriptions(due_subscriptions(today), today)
+        self.assertEqual((result.created, result.skipped), (0, 3))
+        self.assertEqual(Expense.objects.count(), 3)
+
+    def test_shards_split_the_due_set(self):
+        today = timezone.localdate()
+        for n in range(6):
+            self.subscribe(f"Service {n}", today, next_renewal_date=today)
+        due = due_subscriptions(today)
+        shards = [set(shard(due, i, 3).values_list("pk", flat=True)) for i in range(3)]
+        self.assertEqual(
+            sorted(pk for ids in shards for pk in ids),
+            sorted(due.values_list("pk", flat=True)),
+        )
+        self.assertTrue(all(len(ids) == 2 for ids in shards))
+
+        out = io.StringIO()
+        call_command("renew_subscriptions", shard="1/2", stdout=out)
+        self.assertIn("Created: 3, Skipped: 0", out.getvalue())
+        billed = Expense.objects.values_list("subscription_id", flat=True)
+        self.assertEqual({pk % 2 for pk in billed}, {1})
+        for spec in ("2/2", "0/0", "x"):
+            with self.assertRaises(CommandError):
+                call_command("renew_subscriptions", shard=spec)
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite only")
+    def test_sqlite_renews_with_a_single_worker(self):
+        today = timezone.localdate()
+        for n in range(5):
+            self.subscribe(f"Service {n}", today, next_renewal_date=today)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("renew_subscriptions", workers=4, stdout=out, stderr=err)
+        self.assertIn("using 1 worker", err.getvalue())
+        self.assertIn("Worker 1/1: Created: 5, Skipped: 0", out.getvalue())
+        self.assertEqual(due_subscriptions(today).count(), 0)
+
+
+@skipUnless(connection.vendor == "postgresql", "needs a multi-writer database")
+class ParallelRenewalTests(TransactionTestCase):
+    def test_workers_renew_every_due_subscription_once(self):
+        user = get_user_model().objects.create_user("owner")
+        category = Category.objects.create(user=user, name="Streaming")
+        today = timezone.localdate()
+        for n in range(40):
+            Subscription.objects.create(
+                user=user,
+                name=f"Service {n}",
+                category=category,
+                amount=Decimal("9.99"),
+                billing_date=today,
+                next_renewal_date=today,
+            )
+        out = io.StringIO()
+        call_command("renew_subscriptions", workers=4, batch_size=3, stdout=out)
+        self.assertEqual(out.getvalue().count("Worker "), 4)
+        self.assertIn("Renewals complete. Created: 40, Skipped: 0", out.getvalue())
+        billed = Expense.objects.values_list("subscription_id", flat=True)
+        self.assertEqual(len(billed), len(set(billed)))
+        self.assertEqual(due_subscriptions(today).count(), 0)
+
+        out = io.StringIO()
+        call_command("renew_subscriptions", workers=4, stdout=out)
+        self.assertIn("Renewals complete. Created: 0, Skipped: 0", out.getvalue())
+
+
+class PaginationTests(TestCase):
+    def test_cursors_walk_nulls_and_duplicate_positions(self):
+        user = get_user_model().objects.create_user("owner")
+        category = Category.objects.create(user=user, name="Streaming")
+        for n in range(7):
+            Subscription.objects.create(
+                user=user,
+                name=f"Service {n}",
+                category=category,
+                amount=Decimal("9.99"),
+                billing_date=date(2024, 1, 1 + n % 2),
+            )
+        Subscription.objects.filter(name__in=["Service 1", "Service 4"]).update(
+            status=Subscription.Status.CANCELLED, next_renewal_date=None
+        )
+        Subscription.objects.filter(name="Service 6").update(next_renewal_date=None)
+        expected = [f"Service {n}" for n in (0, 2, 3, 5, 1, 4, 6)]
+        self.client.force_login(user)
+
+        def walk(url, link):
+            pages = []
+            while url:
+                page = self.client.get(url).json()
+                pages.append([row["name"] for row in page["results"]])
+                url = page[link]
+            return pages, page
+
+        forward, last = walk("/api/subscriptions/?page_size=2", "next")
+        self.assertEqual(sum(forward, []), expected)
+        # Back from the last page through the same positions.
+        backward, first = walk(last["previous"], "previous")
+        self.assertIsNone(first["previous"])
+        self.assertEqual(sum(reversed(backward), []) + forward[-1], expected)
+
+    def test_query_filters_reject_bad_values_with_400(self):
+        user = get_user_model().objects.create_user("owner", is_staff=True)
+        self.client.force_login(user)
+        for query in [
+            "user=99999999999999999999999",
+            "category=-99999999999999999999999",
+            "subscription=abc",
+            "date_from=2024-13-01",
+        ]:
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/expenses/?{query}")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(query.split("=")[0], response.json())
+        response = self.client.get(f"/api/expenses/?user={2**63 - 1}")
+        self.assertEqual(response.json()["results"], [])
+
+
+class ForecastTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("owner")
+        cls.music, cls.video = (
+            Category.objects.create(user=cls.user, name=name)
+            for name in ("Music", "Video")
+        )
+
+    def subscribe(self, name, category, amount, next_renewal_date, **fields):
+        return Subscription.objects.create(
+            user=self.user,
+            name=name,
+            category=category,
+            amount=Decimal(amount),
+            billing_date=next_renewal_date,
+            next_renewal_date=next_renewal_date,
+            **fields,
+        )
+
+    def test_projection_by_month_category_and_currency(self):
+        self.subscribe("Spotify", self.music, "10.00", date(2024, 1, 15))
+        self.subscribe(
+            "Stan",
+            self.video,
+            "30.00",
+            date(2024, 2, 1),
+            billing_cycle=Subscription.BillingCycle.CUSTOM,
+            billing_interval_months=3,
+        )
+        # Overdue renewals are charged in the first month.
+        self.subscribe(
+            "Criterion",
+            self.video,
+            "100.00",
+            date(2023, 11, 1),
+            currency="USD",
+            billing_cycle=Subscription.BillingCycle.YEARLY,
+        )
+        cancelled = self.subscribe("Old", self.music, "5.00", date(2024, 1, 20))
+        cancelled.status = Subscription.Status.CANCELLED
+        cancelled.save()
+
+        data = project_spend(Subscription.objects.all(), date(2024, 1, 10), 6)
+        self.assertEqual((data["start"], data["months"]), ("2024-01", 6))
+        self.assertEqual(
+            [
+                (month["month"], [(t["currency"], t["total"]) for t in month["totals"]])
+                for month in data["results"]
+            ],
+            [
+                ("2024-01", [("AUD", "10.00"), ("USD", "100.00")]),
+                ("2024-02", [("AUD", "40.00")]),
+                ("2024-03", [("AUD", "10.00")]),
+                ("2024-04", [("AUD", "10.00")]),
+                ("2024-05", [("AUD", "40.00")]),
+                ("2024-06", [("AUD", "10.00")]),
+            ],
+        )
+        self.assertEqual(
+            data["results"][0]["categories"],
+            [
+                {"category": "Music", "currency": "AUD", "total": "10.00"},
+                {"category": "Video", "currency": "USD", "total": "100.00"},
+            ],
+        )
+        empty = project_spend(Subscription.objects.none(), date(2024, 1, 10), 2)
+        self.assertEqual([month["totals"] for month in empty["results"]], [[], []])
+
+    def test_cached_forecast_follows_every_edit(self):
+        self.client.force_login(self.user)
+        today = timezone.localdate()
+        subscription = self.subscribe("Spotify", self.music, "10.00", today)
+
+        def forecast():
+            response = self.client.get("/api/forecast/?months=1")
+            categories = response.json()["results"][0]["categories"]
+            return [(row["category"], row["total"]) for row in categories]
+
+        with mock.patch.object(views, "project_spend", wraps=project_spend) as spy:
+            self.assertEqual(forecast(), [("Music", "10.00")])
+            self.assertEqual(forecast(), [("Music", "10.00")])
+            self.assertEqual(spy.call_count, 1)
+
+            subscription.amount = Decimal("12.00")
+            subscription.save()
+            self.assertEqual(forecast(), [("Music", "12.00")])
+            self.music.name = "Audio"
+            self.music.save()
+            self.assertEqual(forecast(), [("Audio", "12.00")])
+            self.subscribe("Netflix", self.video, "20.00", today)
+            self.assertEqual(forecast(), [("Audio", "12.00"), ("Video", "20.00")])
+            subscription.delete()
+            self.assertEqual(forecast(), [("Video", "20.00")])
+            self.assertEqual(spy.call_count, 5)
+
+
+class QueryBudgetTests(TestCase):
+    """Read endpoints must stay within QUERY_BUDGETS whatever the row count."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("owner", "", "pw")
+        categories = [
+            Category.objects.create(user=cls.user, name=f"Category {n}")
+            for n in range(3)
+        ]
+        for n in range(30):
+            subscription = Subscription.objects.create(
+                user=cls.user,
+                name=f"Service {n}",
+                category=categories[n % 3],
+                amount=Decimal("9.99"),
+                billing_date=date(2024, 1, 1) + timedelta(days=n),
+            )
+            Expense.objects.create(
+                user=cls.user,
+                subscription=subscription,
+                category=categories[n % 3],
+                name=subscription.name,
+                amount=subscription.amount,
+                transaction_date=subscription.billing_date,
+                source=Expense.Source.SUBSCRIPTION,
+            )
+        # A second currency makes the default report convert every month.
+        ExchangeRate.objects.create(
+            date=date(2020, 1, 1), base="AUD", quote="USD", rate=Decimal("0.65")
+        )
+        today = timezone.localdate()
+        for months in range(0, 24, 2):
+            Expense.objects.create(
+                user=cls.user,
+                category=categories[0],
+                name="Records",
+                amount=Decimal("20.00"),
+                currency="USD",
+                transaction_date=add_months(today.replace(day=1), -months),
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        registry.reset()
+        cache.clear()
+
+    def test_read_endpoints_within_budget(self):
+        # QUERY_BUDGETS_STRICT is on under tests, so an overrun raises here.
+        expense = Expense.objects.first()
+        for url in [
+            "/api/categories/",
+            "/api/subscriptions/",
+            "/api/expenses/",
+            f"/api/expenses/{expense.pk}/",
+            "/api/jobs/",
+            "/api/expenses-legacy/",
+            "/api/monthly-spend/",
+            "/api/forecast/",
+            "/api/reports/spend/",
+            "/admin/subscriptions/expense/",
+            "/admin/subscriptions/subscription/",
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get("/api/expenses/")
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn("serialize;dur=", response["Server-Timing"])
+        views = self.client.get("/api/metrics/").json()["views"]
+        self.assertEqual(views["GET expense-list"]["requests"], 1)
+        self.assertEqual(views["GET expense-list"]["budget"], 4)
+
+    @override_settings(QUERY_BUDGETS={"GET expense-list": 1})
+    def test_over_budget_raises_when_strict(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get("/api/expenses/")
+
+    @override_settings(QUERY_BUDGETS={"*": 1}, QUERY_BUDGETS_STRICT=False)
+    def test_over_budget_logs_when_not_strict(self):
+        with self.assertLogs("subscriptions.instrumentation", "WARNING"):
+            self.client.get("/api/expenses/")
+        views = registry.snapshot()
+        self.assertEqual(views["GET expense-list"]["over_budget"], 1)
+
+    def test_query_budget_context_manager(self):
+        with query_budget(1) as metrics:
+            list(Category.objects.all())
+        self.assertEqual(metrics.queries, 1)
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1):
+                for subscription in Subscription.objects.all()[:2]:
+                    subscription.category.name
+
+
+class SpendReportTests(TestCase):
+    def test_months_categories_sources_and_years(self):
+        user = get_user_model().objects.create_user("owner")
+        music, video = (
+            Category.objects.create(user=user, name=name) for name in ("Music", "Video")
+        )
+        subscription = Subscription.objects.create(
+            user=user,
+            name="Netflix",
+            category=video,
+            amount=Decimal("20.00"),
+            billing_date=date(2024, 3, 20),
+        )
+        ExchangeRate.objects.create(
+            date=date(2024, 1, 1), base="AUD", quote="USD", rate=Decimal("0.65")
+        )
+        for day, category, amount, currency in [
+            (date(2023, 2, 5), music, "10.00", "AUD"),
+            (date(2023, 3, 5), video, "40.00", "AUD"),
+            (date(2023, 12, 5), music, "30.00", "AUD"),
+            (date(2024, 2, 5), music, "15.00", "AUD"),
+            (date(2024, 3, 5), music, "6.50", "USD"),
+            (date(2024, 3, 6), music, "5.00", "GBP"),
+        ]:
+            Expense.objects.create(
+                user=user,
+                category=category,
+                name="Records",
+                amount=Decimal(amount),
+                currency=currency,
+                transaction_date=day,
+            )
+        Expense.objects.create(
+            user=user, subscription=subscription, transaction_date=date(2024, 3, 20)
+        )
+
+        self.client.force_login(user)
+        report = self.client.get("/api/reports/spend/?from=2023-12&to=2024-03")
+        report = report.json()
+        self.assertEqual((report["from"], report["to"]), ("2023-12", "2024-03"))
+        self.assertEqual(report["total"], "75.00")
+        self.assertEqual(report["unconverted"], ["GBP"])
+        self.assertEqual(
+            [
+                (m["month"], m["total"], m["count"], m["previous_year"], m["change"])
+                for m in report["months"]
+            ],
+            [
+                ("2023-12", "30.00", 1, "0.00", None),
+                ("2024-01", "0.00", 0, "0.00", None),
+                ("2024-02", "15.00", 1, "10.00", "50.0"),
+                ("2024-03", "30.00", 2, "40.00", "-25.0"),
+            ],
+        )
+        self.assertEqual(
+            report["months"][3]["sources"], {"subscription": "20.00", "manual": "10.00"}
+        )
+        self.assertEqual(
+            report["categories"],
+            [
+                {"category": music.pk, "name": "Music", "total": "55.00"},
+                {"category": video.pk, "name": "Video", "total": "20.00"},
+            ],
+        )
+        self.assertEqual(
+            report["sources"],
+            [
+                {"source": "subscription", "total": "20.00"},
+                {"source": "manual", "total": "55.00"},
+            ],
+        )
+        # Each year only compares its months inside the range.
+        self.assertEqual(
+            report["years"],
+            [
+                {
+                    "year": 2023,
+                    "total": "30.00",
+                    "previous_year": "0.00",
+                    "change": None,
+                },
+                {
+                    "year": 2024,
+                    "total": "45.00",
+                    "previous_year": "50.00",
+                    "change": "-10.0",
+                },
+            ],
+        )
+
+
+class BenchmarkTests(TestCase):
+    def test_seed_and_benchmark(self):
+        today = date(2025, 6, 15)
+        result = synthetic.seed(3, 500, subscriptions_per_user=4, today=today)
+        self.assertEqual(result.expenses, 500)
+        self.assertEqual(Expense.objects.count(), 500)
+        self.assertEqual(
+            Subscription.objects.filter(user__username="synthetic-0000002").count(), 4
+        )
+        self.assertEqual(
+            MonthlySpend.objects.aggregate(total=Sum("expense_count"))["total"], 500
+        )
+
+        users = get_user_model().objects.count()
+        report = benchmarks.run(repeat=1, today=today)
+        self.assertEqual(set(report["results"]), set(benchmarks.SCENARIOS))
+        self.assertEqual(report["counts"]["expenses"], 500)
+        # Renewals and the benchmark's own user are rolled back.
+        self.assertEqual(Expense.objects.count(), 500)
+        self.assertEqual(get_user_model().objects.count(), users)
+
+
+class WriteQueueTests(SimpleTestCase):
+    def test_waiters_get_the_lock_in_arrival_order(self):
+        queue = WriteQueue()
+        self.assertTrue(queue.acquire(timeout=1))
+        order = []
+
+        def writer(name):
+            queue.acquire(timeout=5)
+            order.append(name)
+            queue.release()
+
+        threads = []
+        for name in range(4):
+            threads.append(threading.Thread(target=writer, args=(name,)))
+            threads[-1].start()
+            time.sleep(0.02)  # Let each writer join the queue in turn.
+        queue.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [0, 1, 2, 3])
+
+    def test_acquire_times_out(self):
+        queue = WriteQueue()
+        queue.acquire(timeout=1)
+        self.assertFalse(queue.acquire(timeout=0.01))
+        queue.release()
+        self.assertTrue(queue.acquire(timeout=0.01))
+
+
+class ValuesListTests(TestCase):
+    """values() lists must render exactly what the ModelSerializers would."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("owner", is_staff=True)
+        music = Category.objects.create(user=cls.user, name="Musique \u2028 ♫")
+        subscription = Subscription.objects.create(
+            user=cls.user,
+            name="Spotify",
+            category=music,
+            amount=Decimal("11.99"),
+            billing_date=date(2024, 1, 31),
+        )
+        Expense.objects.create(
+            user=cls.user, subscription=subscription, transaction_date=date(2024, 2, 29)
+        )
+        Expense.objects.create(
+            user=cls.user,
+            category=music,
+            name="Café ☕",
+            amount=Decimal("4.50"),
+            currency="EUR",
+            transaction_date=date(2024, 2, 29),
+            notes="Line\nbreak",
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_lists_match_the_serializer_byte_for_byte(self):
+        for url, serializer, queryset in [
+            ("/api/categories/", CategorySerializer, Category.objects.order_by("name")),
+            (
+                "/api/subscriptions/",
+                SubscriptionSerializer,
+                Subscription.objects.order_by("next_renewal_date", "name"),
+            ),
+            (
+                "/api/expenses/",
+                ExpenseSerializer,
+                Expense.objects.order_by("-transaction_date", "-id"),
+            ),
+        ]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                expected = {
+                    "next": None,
+                    "previous": None,
+                    "results": serializer(queryset, many=True).data,
+                }
+                self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_sparse_fieldsets(self):
+        full = self.client.get("/api/expenses/").json()["results"]
+        sparse = self.client.get("/api/expenses/?fields=id,amount,unknown")
+        self.assertEqual(
+            sparse.json()["results"],
+            [{"id": row["id"], "amount": row["amount"]} for row in full],
+        )
+        detail = self.client.get(f"/api/expenses/{full[0]['id']}/?fields=name")
+        self.assertEqual(detail.json(), {"name": full[0]["name"]})
+        # Writes always see every field.
+        response = self.client.post(
+            "/api/categories/?fields=id", {"user": self.user.pk, "name": "Video"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["name"], "Video")
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.alice, cls.bob = (User.objects.create_user(n) for n in ("alice", "bob"))
+        cls.category = Category.objects.create(user=cls.alice, name="Music")
+
+    def setUp(self):
+        self.client.force_login(self.alice)
+
+    def version(self, user):
+        return DataVersion.objects.get(user=user).version
+
+    def add_expense(self, user, category):
+        Expense.objects.create(
+            user=user,
+            category=category,
+            name="Records",
+            amount=Decimal("20.00"),
+            transaction_date=date(2024, 1, 5),
+        )
+
+    def test_unchanged_data_returns_304_without_reading_it(self):
+        for url in ["/api/expenses/", "/api/monthly-spend/", "/api/reports/spend/"]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("Last-Modified", response)
+                with CaptureQueriesContext(connection) as queries:
+                    again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(again.status_code, 304)
+                tables = " ".join(query["sql"] for query in queries)
+                self.assertNotIn("subscriptions_expense", tables)
+                self.assertNotIn("subscriptions_monthlyspend", tables)
+
+    def test_writes_bump_only_their_owners_version(self):
+        self.add_expense(self.alice, self.category)
+        etag = self.client.get("/api/expenses/")["ETag"]
+        before = self.version(self.alice)
+
+        # Another tenant's write leaves alice's ETag alone.
+        self.add_expense(self.bob, Category.objects.create(user=self.bob, name="X"))
+        response = self.client.get("/api/expenses/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.version(self.alice), before)
+
+        for write in [
+            lambda: self.add_expense(self.alice, self.category),
+            self.category.save,
+            lambda: importers.import_expenses(
+                [{"date": "2024-02-01", "name": "Gig", "amount": "30.00"}], self.alice
+            ),
+            lambda: ExchangeRate.objects.create(
+                date=date(2024, 1, 1), base="AUD", quote="USD", rate=Decimal("0.65")
+            ),
+        ]:
+            write()
+            self.assertGreater(self.version(self.alice), before)
+            before = self.version(self.alice)
+            response = self.client.get("/api/expenses/", HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+
+class AdminRenewTests(TestCase):
+    url = "/admin/subscriptions/subscription/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser("admin", "", "pw")
+        category = Category.objects.create(user=cls.admin, name="Streaming")
+        today = timezone.localdate()
+        cls.subscriptions = [
+            Subscription.objects.create(
+                user=cls.admin,
+                name=f"Service {n}",
+                category=category,
+                amount=Decimal("9.99"),
+                billing_date=today,
+                next_renewal_date=today,
+            )
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def renew(self, subscriptions):
+        return self.client.post(
+            self.url,
+            {
+                "action": "renew_now",
+                "_selected_action": [subscription.pk for subscription in subscriptions],
+            },
+            follow=True,
+        )
+
+    def test_small_selections_renew_in_the_request(self):
+        self.assertEqual(SubscriptionAdmin.renew_now_sync_limit, 500)
+        response = self.renew(self.subscriptions[:2])
+        self.assertContains(response, "Renewals complete. Created: 2, Skipped: 0")
+        self.assertEqual(Expense.objects.count(), 2)
+        self.assertFalse(Job.objects.exists())
+
+    @mock.patch.object(SubscriptionAdmin, "renew_now_sync_limit", 2)
+    def test_large_selections_hand_off_to_a_job(self):
+        response = self.renew(self.subscriptions)
+        job = Job.objects.get()
+        self.assertEqual(response.redirect_chain[-1][0], f"{self.url}job/{job.pk}/")
+        self.assertContains(response, "Renewing 3 subscriptions in the background.")
+        self.assertEqual((job.kind, job.progress_total), ("renew_subscriptions", 3))
+        self.assertEqual(sorted(job.payload["ids"]), [s.pk for s in self.subscriptions])
+        self.assertFalse(Expense.objects.exists())
+
+        jobs.run(jobs.claim("worker", job_id=job.pk))
+        status = self.client.get(f"{self.url}job/{job.pk}/status/").json()
+        self.assertEqual(status["status"], "succeeded")
+        self.assertEqual(status["progress_done"], 3)
+        self.assertEqual(status["result"], {"created": 3, "skipped": 0})
+        self.assertEqual(Expense.objects.count(), 3)
+
+
+class RecordingBackend(reminders.BaseBackend):
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    def send_messages(self, messages):
+        if self.fail:
+            raise ConnectionError("Mail server unavailable.")
+        self.sent.extend(messages)
+        return len(messages)
+
+
+class ReminderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = date(2025, 3, 10)
+        User = get_user_model()
+        cls.alice, cls.bob, cls.carol = (
+            User.objects.create_user(name, f"{name}@example.com")
+            for name in ("alice", "bob", "carol")
+        )
+        ReminderPreference.objects.create(user=cls.bob, lead_days=7)
+        ReminderPreference.objects.create(user=cls.carol, enabled=False)
+        for user, name, days in [
+            (cls.alice, "Netflix", 1),
+            (cls.alice, "Spotify", 3),
+            (cls.alice, "Gym", 5),
+            (cls.alice, "Cancelled", 2),
+            (cls.bob, "Stan", 6),
+            (cls.carol, "Disney", 1),
+        ]:
+            renews = cls.today + timedelta(days=days)
+            Subscription.objects.create(
+                user=user,
+                name=name,
+                category=Category.objects.get_or_create(user=user, name="Misc")[0],
+                amount=Decimal("9.99"),
+                billing_date=renews,
+                next_renewal_date=renews,
+            )
+        Subscription.objects.filter(name="Cancelled").update(
+            status=Subscription.Status.CANCELLED
+        )
+
+    def test_each_renewal_is_reminded_once(self):
+        backend = RecordingBackend()
+        result = reminders.send_reminders(self.today, backend, batch_size=1)
+        self.assertEqual((result.users, result.reminders, result.batches), (2, 3, 2))
+        self.assertEqual(
+            [
+                (message.email, [r.name for r in message.reminders])
+                for message in backend.sent
+            ],
+            [
+                ("alice@example.com", ["Netflix", "Spotify"]),
+                ("bob@example.com", ["Stan"]),
+            ],
+        )
+        self.assertIn("Netflix: 9.99 AUD on 11 Mar 2025", backend.sent[0].body())
+
+        # Reruns the same day or the next send nothing new.
+        for day in (self.today, self.today + timedelta(days=1)):
+            result = reminders.send_reminders(day, backend)
+            self.assertEqual(result.reminders, 0)
+        self.assertEqual(len(backend.sent), 2)
+        self.assertEqual(RenewalReminder.objects.count(), 3)
+
+        # The next billing date of a renewed subscription is a new reminder.
+        netflix = Subscription.objects.get(name="Netflix")
+        netflix.next_renewal_date = self.today + timedelta(days=2)
+        netflix.save()
+        result = reminders.send_reminders(self.today, backend)
+        self.assertEqual(result.reminders, 1)
+
+    def test_failed_or_dry_runs_record_nothing(self):
+        with self.assertRaises(ConnectionError):
+            reminders.send_reminders(self.today, RecordingBackend(fail=True))
+        result = reminders.send_reminders(self.today, RecordingBackend(), dry_run=True)
+        self.assertEqual(result.reminders, 3)
+        self.assertFalse(RenewalReminder.objects.exists())
+
+        backend = RecordingBackend()
+        self.assertEqual(reminders.send_reminders(self.today, backend).reminders, 3)
+        self.assertEqual(len(backend.sent), 2)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.dict(
+            jobs.handlers, {"echo": self.echo, "flaky": self.flaky}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def echo(self, job, payload):
+        self.calls.append(job.pk)
+        return payload
+
+    def flaky(self, job, payload):
+        raise RuntimeError("Upstream unavailable.")
+
+    def test_claims_oldest_runnable_job_once(self):
+        first = jobs.enqueue("echo", {"n": 1})
+        later = jobs.enqueue("echo", {"n": 2})
+        Job.objects.filter(pk=later.pk).update(
+            run_after=timezone.now() + timedelta(minutes=5)
+        )
+        second = jobs.enqueue("echo", {"n": 3})
+
+        job = jobs.claim("worker-a")
+        self.assertEqual((job.pk, job.status, job.attempts), (first.pk, "running", 1))
+        self.assertEqual(jobs.claim("worker-b", job_id=first.pk), None)
+        self.assertEqual(jobs.claim("worker-b", kinds=["flaky"]), None)
+        self.assertEqual(jobs.claim("worker-b").pk, second.pk)
+        self.assertIsNone(jobs.claim("worker-c"))
+
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), ("succeeded", {"n": 1}))
+        self.assertEqual(self.calls, [first.pk])
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        job = jobs.enqueue("flaky", {}, max_attempts=3)
+        for attempt, delay in [(1, 30), (2, 60)]:
+            started = timezone.now()
+            with self.assertLogs("subscriptions.jobs", "ERROR"):
+                jobs.run(jobs.claim("worker", job_id=job.pk))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ("pending", attempt))
+            self.assertIn("Upstream unavailable.", job.error)
+            wait = (job.run_after - started).total_seconds()
+            self.assertAlmostEqual(wait, delay, delta=5)
+            # Not runnable again until the backoff has passed.
+            self.assertIsNone(jobs.claim("worker"))
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        with self.assertLogs("subscriptions.jobs", "ERROR"):
+            jobs.run(jobs.claim("worker"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 3))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_dedup_key_reuses_the_active_job(self):
+        job = jobs.enqueue("echo", {}, dedup_key="nightly")
+        self.assertEqual(jobs.enqueue("echo", {}, dedup_key="nightly"), job)
+        jobs.run(jobs.claim("worker"))
+        # Once finished, the key is free for the next run.
+        again = jobs.enqueue("echo", {}, dedup_key="nightly")
+        self.assertNotEqual(again, job)
+        self.assertNotEqual(jobs.enqueue("echo", {}), again)
+        with self.assertRaises(ValueError):
+            jobs.enqueue("unknown", {})
+
+    def test_requeue_stale_skips_jobs_running_in_threads(self):
+        started = timezone.now() - timedelta(hours=2)
+        worker_job, thread_job, spent_job = (
+            jobs.enqueue("echo", {}, max_attempts=attempts) for attempts in (3, 3, 1)
+        )
+        for job, worker in [
+            (worker_job, "host:1:0"),
+            (thread_job, f"{jobs.THREAD_WORKER_PREFIX}{thread_job.pk}"),
+            (spent_job, "host:1:0"),
+        ]:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.Status.RUNNING, worker=worker, attempts=1, started_at=started
+            )
+
+        self.assertEqual(jobs.requeue_stale(timedelta(hours=1)), 1)
+        statuses = dict(Job.objects.values_list("pk", "status"))
+        self.assertEqual(
+            [statuses[job.pk] for job in (worker_job, thread_job, spent_job)],
+            ["pending", "running", "failed"],
+        )
+
+    @override_settings(JOBS_MAX_THREADS=1)
+    def test_in_process_threads_are_bounded(self):
+        slots = jobs._thread_slots(1)
+        self.assertTrue(slots.acquire(blocking=False))
+        try:
+            self.assertIsNone(jobs.start_thread(0))
+        finally:
+            slots.release()
+
+
+class ImportTests(TestCase):
+    def test_signed_csv_skips_credits_and_rejects_bad_amounts(self):
+        user = get_user_model().objects.create_user("owner")
+        statement = io.StringIO(
+            "date,description,amount\n"
+            "2025-01-02,Coffee,-4.50\n"
+            "2025-01-03,Salary,5000.00\n"
+            "2025-01-04,Glitch,NaN\n"
+            "2025-01-05,Typo,-1e12\n"
+            "2025-01-06,Lunch,-12.00\n"
+        )
+        result = importers.import_expenses(importers.parse_csv(statement), user)
+        self.assertEqual((result.rows, result.created, result.invalid), (4, 2, 2))
+        self.assertEqual(
+            sorted(Expense.objects.values_list("name", "amount")),
+            [("Coffee", Decimal("4.50")), ("Lunch", Decimal("12.00"))],
+        )
+
+        debits = io.StringIO("date,name,amount\n2025-01-07,Rent,2000.00\n")
+        rows = list(importers.parse_csv(debits, signed=False))
+        self.assertEqual([row["amount"] for row in rows], ["2000.00"])
+
+    def test_bad_currency_or_category_only_rejects_that_row(self):
+        user = get_user_model().objects.create_user("owner")
+        long_name = "x" * 101
+        statement = io.StringIO(
+            "date,description,amount,currency,category\n"
+            "2025-01-02,Coffee,-4.50,usd,Food\n"
+            f"2025-01-03,Books,-30.00,AUD,{long_name}\n"
+            "2025-01-04,Hotel,-200.00,AUDX,Travel\n"
+            "2025-01-05,Taxi,-25.00,$1,Travel\n"
+            "2025-01-06,Lunch,-12.00,,\n"
+        )
+        result = importers.import_expenses(importers.parse_csv(statement), user)
+        self.assertEqual((result.rows, result.created, result.invalid), (5, 2, 3))
+        self.assertEqual(
+            result.errors,
+            [
+                "Line 3: category is longer than 100 characters.",
+                "Line 4: invalid currency 'AUDX'.",
+                "Line 5: invalid currency '$1'.",
+            ],
+        )
+        self.assertEqual(
+            sorted(Expense.objects.values_list("name", "currency", "category__name")),
+            [("Coffee", "USD", "Food"), ("Lunch", "AUD", "Uncategorized")],
+        )
+
+
+class MatchWindowTests(SimpleTestCase):
+    """The vectorized window check must agree with a scan of the schedule."""
+
+    def test_window_matches_scalar_schedule(self):
+        anchors = [date(2024, 1, 31), date(2024, 2, 29), date(2023, 12, 15)]
+        dates = every_day(date(2023, 12, 1), date(2025, 3, 31))
+        for interval in (1, 2, 3, 12):
+            index = {
+                (1, "AUD", 999): [
+                    (n, " gym ", anchor, interval) for n, anchor in enumerate(anchors)
+                ]
+            }
+            chunk = [
+                (pk, 1, "GYM", Decimal("9.99"), "AUD", day, None)
+                for pk, day in enumerate(dates)
+            ]
+            links = matching._match_chunk(chunk, index, window_days=3)
+            for pk, day in enumerate(dates):
+                expected = None
+                closest = None
+                for n, anchor in enumerate(anchors):
+                    gap = min(
+                        abs((add_months(anchor, k * interval) - day).days)
+                        for k in range(40)
+                    )
+                    if gap <= 3 and (closest is None or gap < closest):
+                        expected, closest = (n, 1), gap
+                self.assertEqual(links.get(pk), expected, (interval, day))
+
+    def test_closest_billing_date_wins(self):
+        index = {
+            (1, "AUD", 1549): [
+                (10, " netflix ", date(2024, 1, 5), 1),
+                (11, " netflix ", date(2024, 1, 8), 1),
+            ]
+        }
+        chunk = [
+            (1, 1, "NETFLIX.COM", Decimal("15.49"), "AUD", date(2024, 2, 7), None),
+            (2, 1, "NETFLIX.COM", Decimal("15.49"), "AUD", date(2024, 3, 5), None),
+            (3, 1, "NETFLIX.COM", Decimal("15.49"), "AUD", date(2024, 3, 20), None),
+        ]
+        self.assertEqual(
+            matching._match_chunk(chunk, index, window_days=3),
+            {1: (11, 1), 2: (10, 1)},
+        )
+
+
+class MatchingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("owner")
+        cls.category = Category.objects.create(user=cls.user, name="Video")
+        cls.subscription = Subscription.objects.create(
+            user=cls.user,
+            name="Netflix",
+            category=cls.category,
+            amount=Decimal("15.49"),
+            billing_date=date(2024, 1, 31),
+        )
+
+    def manual(self, name, transaction_date, amount="15.49"):
+        return Expense.objects.create(
+            user=self.user,
+            category=self.category,
+            name=name,
+            amount=Decimal(amount),
+            transaction_date=transaction_date,
+        )
+
+    def test_matched_expenses_move_to_subscription_rollups(self):
+        matched = self.manual("NETFLIX.COM 8812", date(2024, 3, 1))
+        self.manual("Netflix gift card", date(2024, 3, 1), amount="50.00")
+
+        result = matching.match_expenses()
+        self.assertEqual((result.scanned, result.matched), (2, 1))
+        matched.refresh_from_db()
+        self.assertEqual(matched.subscription, self.subscription)
+
+        self.client.force_login(self.user)
+        report = self.client.get("/api/reports/spend/?from=2024-03&to=2024-03")
+        sources = {row["source"]: row["total"] for row in report.json()["sources"]}
+        self.assertEqual(sources["subscription"], "15.49")
+        self.assertEqual(sources["manual"], "50.00")
+
+        # Later edits move the amount out of the rollup it now sits in.
+        matched.delete()
+        rows = MonthlySpend.objects.values_list("source", "total", "expense_count")
+        self.assertEqual(
+            sorted(rows),
+            [("manual", Decimal("50.00"), 1), ("subscription", Decimal("0.00"), 0)],
+        )
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("owner")
+        category = Category.objects.create(user=cls.user, name="Music")
+        # Five rows on two dates in January, two in March.
+        for day in [5, 5, 5, 9, 9]:
+            Expense.objects.create(
+                user=cls.user,
+                category=category,
+                name=f"Records {day}",
+                amount=Decimal("20.00"),
+                transaction_date=date(2024, 1, day),
+            )
+        for day in [1, 2]:
+            Expense.objects.create(
+                user=cls.user,
+                category=category,
+                name=f"Records {day}",
+                amount=Decimal("20.00"),
+                transaction_date=date(2024, 3, day),
+            )
+        cls.expected = list(
+            Expense.objects.order_by("transaction_date", "pk").values_list(
+                "pk", "transaction_date"
+            )
+        )
+
+    def export(self, fmt="csv", compress=False):
+        dataset = exports.DATASETS["expenses"]
+        queryset = Expense.objects.all()
+        months = exports.export_months(dataset, queryset)
+        self.assertEqual(
+            months, [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)]
+        )
+        return list(exports.export_chunks(dataset, queryset, months, fmt, compress))
+
+    @mock.patch.object(exports, "EXPORT_CHUNK_SIZE", 2)
+    def test_csv_is_written_one_chunk_at_a_time(self):
+        chunks = self.export()
+        sizes = [len(chunk.decode().splitlines()) for chunk in chunks]
+        self.assertEqual(sizes, [1, 2, 2, 1, 2])
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+        self.assertEqual(
+            [(int(row["id"]), row["transaction_date"]) for row in rows],
+            [(pk, day.isoformat()) for pk, day in self.expected],
+        )
+        self.assertEqual(rows[0]["amount"], "20.00")
+        self.assertEqual(rows[0]["user"], str(self.user.pk))
+
+        compressed = b"".join(self.export(compress=True))
+        self.assertEqual(gzip.decompress(compressed), b"".join(chunks))
+
+    @skipUnless(exports.pa, "pyarrow is not installed")
+    @mock.patch.object(exports, "EXPORT_CHUNK_SIZE", 2)
+    def test_parquet_writes_a_row_group_per_chunk(self):
+        parquet = exports.pq.ParquetFile(io.BytesIO(b"".join(self.export("parquet"))))
+        self.assertEqual(parquet.num_row_groups, 4)
+        table = parquet.read()
+        self.assertEqual(
+            list(zip(table["id"].to_pylist(), table["transaction_date"].to_pylist())),
+            self.expected,
+        )
+
+    def test_export_endpoint_scopes_rows_to_the_user(self):
+        other = get_user_model().objects.create_user("other")
+        self.client.force_login(other)
+        response = self.client.get("/api/export/expenses/?format=csv")
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="expenses.csv"'
+        )
+        self.assertEqual(b"".join(response.streaming_content).count(b"\n"), 1)
+        self.client.force_login(self.user)
+        response = self.client.get("/api/export/expenses/?since=2024-03&gzip=1")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        body = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertEqual(len(body.splitlines()), 3)
+
+
+class FxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for day, base, quote, value in [
+            (date(2024, 1, 1), "AUD", "USD", "0.65"),
+            (date(2024, 2, 1), "AUD", "USD", "0.66"),
+            (date(2024, 1, 1), "AUD", "EUR", "0.60"),
+        ]:
+            ExchangeRate.objects.create(
+                date=day, base=base, quote=quote, rate=Decimal(value)
+            )
+
+    def test_rate_uses_latest_direct_inverse_or_cross_rate(self):
+        self.assertEqual(fx.rate("AUD", "AUD", date(2020, 1, 1)), 1)
+        self.assertEqual(fx.rate("AUD", "USD", date(2024, 1, 31)), Decimal("0.65"))
+        self.assertEqual(fx.rate("AUD", "USD", date(2024, 3, 1)), Decimal("0.66"))
+        self.assertEqual(fx.rate("USD", "AUD", date(2024, 2, 1)), 1 / Decimal("0.66"))
+        self.assertEqual(
+            fx.rate("EUR", "USD", date(2024, 1, 15)),
+            Decimal("0.65") / Decimal("0.60"),
+        )
+        for base, quote, on in [
+            ("AUD", "GBP", date(2024, 3, 1)),
+            ("AUD", "USD", date(2023, 12, 31)),
+        ]:
+            with self.assertRaises(fx.MissingRate):
+                fx.rate(base, quote, on)
+
+    def test_rates_up_to_a_date_load_in_one_query(self):
+        state = fx.rates_state()
+        until = date(2024, 12, 31)
+        with self.assertNumQueries(1):
+            rates = [
+                fx.rate("USD", "AUD", date(2024, month, 28), state, until)
+                for month in range(1, 13)
+            ]
+        self.assertEqual(rates, [1 / Decimal("0.65")] + [1 / Decimal("0.66")] * 11)
+
+    def test_convert_totals_lists_currencies_without_a_rate(self):
+        total, unconverted = fx.convert_totals(
+            [("AUD", Decimal("10")), ("USD", Decimal("6.6")), ("GBP", Decimal("5"))],
+            "AUD",
+            date(2024, 2, 15),
+        )
+        self.assertEqual(total, Decimal("20.00"))
+        self.assertEqual(unconverted, [("GBP", Decimal("5"))])
+
+    def test_monthly_spend_rounds_each_currency_to_cents(self):
+        user = get_user_model().objects.create_user("owner")
+        for amount in ("20.10", "18.20"):
+            Expense.objects.create(
+                user=user,
+                name="Records",
+                amount=Decimal(amount),
+                currency="USD",
+                transaction_date=timezone.localdate(),
+            )
+        self.client.force_login(user)
+        data = self.client.get("/api/monthly-spend/?currency=USD").json()
+        self.assertEqual(data["by_currency"], [{"currency": "USD", "total": "38.30"}])
+        self.assertEqual(data["total"], "38.30")
+
+
+class RollupTests(TestCase):
+    def test_incremental_rollups_match_rebuild(self):
+        user = get_user_model().objects.create_user("owner")
+        music, video = (
+            Category.objects.create(user=user, name=name) for name in ("Music", "Video")
+        )
+        subscription = Subscription.objects.create(
+            user=user,
+            name="Netflix",
+            category=video,
+            amount=Decimal("15.49"),
+            billing_date=date(2024, 1, 10),
+        )
+        expenses = [
+            Expense.objects.create(
+                user=user,
+                category=music,
+                name=f"Records {n}",
+                amount=Decimal("10.25") * n,
+                transaction_date=date(2024, n, 5),
+            )
+            for n in range(1, 5)
+        ]
+        # Edits moving an expense across month, category, currency and source.
+        expenses[0].transaction_date = date(2024, 3, 1)
+        expenses[0].save()
+        expenses[1].category = video
+        expenses[1].currency = "USD"
+        expenses[1].save()
+        expenses[2].subscription = subscription
+        expenses[2].save()
+        expenses[3].delete()
+        # Bulk paths that bypass Expense signals.
+        renew_subscriptions(due_subscriptions(date(2024, 2, 10)), date(2024, 2, 10))
+        importers.import_expenses(
+            [{"date": "2024-02-11", "name": "Netflix AU", "amount": "15.49"}], user
+        )
+        matching.match_expenses()
+        archive.archive_expenses(date(2024, 2, 1))
+
+        def rollup():
+            return sorted(
+                MonthlySpend.objects.exclude(expense_count=0).values_list(
+                    "user",
+                    "month",
+                    "category",
+                    "currency",
+                    "source",
+                    "total",
+                    "expense_count",
+                )
+            )
+
+        incremental = rollup()
+        self.assertEqual(MonthlySpend.objects.filter(total__lt=0).count(), 0)
+        rollups.rebuild()
+        self.assertEqual(incremental, rollup())
+
+
+class ArchiveTests(TestCase):
+    def test_archived_expenses_stay_in_rollups(self):
+        user = get_user_model().objects.create_user("owner")
+        category = Category.objects.create(user=user, name="Music")
+        subscription = Subscription.objects.create(
+            user=user,
+            name="Spotify",
+            category=category,
+            amount=Decimal("11.99"),
+            billing_date=date(2023, 1, 5),
+        )
+        for month in range(1, 13):
+            Expense.objects.create(
+                user=user,
+                subscription=subscription,
+                transaction_date=date(2023, month, 5),
+            )
+            Expense.objects.create(
+                user=user,
+                category=category,
+                name="Records",
+                amount=Decimal("20.00"),
+                transaction_date=date(2023 + month % 2, month, 20),
+            )
+
+        def rollup():
+            return list(
+                MonthlySpend.objects.order_by("month", "source").values_list(
+                    "month", "source", "total", "expense_count"
+                )
+            )
+
+        before = rollup()
+
+        result = archive.archive_expenses(date(2024, 1, 1), batch_size=5)
+        self.assertEqual((result.archived, result.batches), (18, 4))
+        self.assertEqual(ExpenseArchive.objects.count(), 18)
+        self.assertFalse(Expense.objects.filter(transaction_date__year=2023).exists())
+        self.assertEqual(Expense.objects.count(), 6)
+
+        self.assertEqual(rollup(), before)
+        rollups.rebuild()
+        self.assertEqual(rollup(), before)
+        self.client.force_login(user)
+        report = self.client.get("/api/reports/spend/?from=2023-01&to=2023-12").json()
+        self.assertEqual(report["total"], "263.88")
+
+    def test_rows_changed_mid_batch_are_not_lost(self):
+        user = get_user_model().objects.create_user("owner")
+        expenses = [
+            Expense.objects.create(
+                user=user,
+                name="Records",
+                amount=Decimal("20.00"),
+                transaction_date=transaction_date,
+            )
+            for transaction_date in (
+                date(2023, 1, 5),
+                date(2024, 6, 5),
+                date(2023, 2, 5),
+            )
+        ]
+        copy = archive._copy
+
+        def copy_then_backdate(batch):
+            copied = copy(batch)
+            # A concurrent edit to an unlocked row in the batch's id range,
+            # committed between the copy and the delete.
+            Expense.objects.filter(pk=expenses[1].pk).update(
+                transaction_date=date(2023, 3, 5)
+            )
+            return copied
+
+        with mock.patch.object(archive, "_copy", copy_then_backdate):
+            result = archive.archive_expenses(date(2024, 1, 1))
+        self.assertEqual(result.archived, 3)
+        self.assertEqual(ExpenseArchive.objects.count(), 3)
+        self.assertFalse(Expense.objects.exists())
+
+
+class SqliteToPostgresTests(TestCase):
+    def sqlite_source(self, applied) -> str:
+        """A SQLite file with every app table and the given migrations."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f"{directory.name}/source.sqlite3"
+        source = sqlite3.connect(path)
+        self.addCleanup(source.close)
+        source.execute("CREATE TABLE django_migrations (id, app, name, applied)")
+        source.executemany(
+            "INSERT INTO django_migrations (app, name) VALUES (?, ?)", applied
+        )
+        for model in apps.get_models(include_auto_created=True):
+            if model._meta.managed and not model._meta.proxy:
+                columns = [f.column for f in model._meta.local_concrete_fields]
+                source.execute(
+                    f'CREATE TABLE "{model._meta.db_table}" ({", ".join(columns)})'
+                )
+        self.source = source
+        return path
+
+    def insert(self, model, **values):
+        columns = [model._meta.get_field(name).column for name in values]
+        self.source.execute(
+            'INSERT INTO "{}" ({}) VALUES ({})'.format(
+                model._meta.db_table,
+                ", ".join(columns),
+                ", ".join("?" * len(values)),
+            ),
+            list(values.values()),
+        )
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite target")
+    def test_refuses_a_non_postgresql_target(self):
+        with self.assertRaisesMessage(CommandError, "not PostgreSQL"):
+            call_command("migrate_sqlite_to_pg", interactive=False)
+
+    @skipUnless(connection.vendor == "postgresql", "COPY needs PostgreSQL")
+    def test_copies_rows_and_resets_sequences(self):
+        applied = list(MigrationRecorder(connection).applied_migrations())
+        path = self.sqlite_source(applied)
+        now = "2024-01-01 09:30:00"
+        User = get_user_model()
+        self.insert(
+            User,
+            id=7,
+            password="!",
+            is_superuser=0,
+            username="alice",
+            first_name="",
+            last_name="",
+            email="alice@example.com",
+            is_staff=1,
+            is_active=1,
+            date_joined=now,
+        )
+        self.insert(
+            Category, id=3, user=7, name="Music", created_at=now, updated_at=now
+        )
+        for pk, amount in [(11, "20.00"), (12, "4.50")]:
+            self.insert(
+                Expense,
+                id=pk,
+                user=7,
+                category=3,
+                name="Café ☕",
+                amount=amount,
+                currency="AUD",
+                transaction_date="2024-02-29",
+                source="manual",
+                notes="Tab\tand\nnewline",
+                created_at=now,
+                updated_at=now,
+            )
+        self.source.commit()
+
+        out = io.StringIO()
+        call_command("migrate_sqlite_to_pg", source=path, interactive=False, stdout=out)
+        self.assertIn("subscriptions_expense: 2 rows", out.getvalue())
+        user = User.objects.get()
+        self.assertEqual((user.pk, user.is_staff, user.is_superuser), (7, True, False))
+        self.assertEqual(
+            list(Expense.objects.order_by("pk").values_list("pk", "amount", "notes")),
+            [
+                (11, Decimal("20.00"), "Tab\tand\nnewline"),
+                (12, Decimal("4.50"), "Tab\tand\nnewline"),
+            ],
+        )
+        self.assertEqual(Expense.objects.get(pk=11).transaction_date, date(2024, 2, 29))
+        # Sequences continue after the copied ids.
+        self.assertEqual(Category.objects.create(user=user, name="Video").pk, 4)
+
+        self.source.execute("DELETE FROM django_migrations WHERE app = 'sessions'")
+        self.source.commit()
+        with self.assertRaisesMessage(CommandError, "different migrations"):
+            call_command("migrate_sqlite_to_pg", source=path, interactive=False)
+
+
+class ScopingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user("staff", is_staff=True)
+        cls.users = [User.objects.create_user(name) for name in ("alice", "bob")]
+        cls.categories = []
+        for user in cls.users:
+            category = Category.objects.create(user=user, name="Music")
+            cls.categories.append(category)
+            Expense.objects.create(
+                user=user,
+                category=category,
+                name=f"{user.username}'s records",
+                amount=Decimal("20.00"),
+                transaction_date=date.today(),
+            )
+
+    def test_users_only_see_their_own_rows(self):
+        alice, bob = self.users
+        self.client.force_login(alice)
+        # QUERY_BUDGETS are strict under tests: scoping costs no extra query.
+        for url in [
+            "/api/categories/",
+            "/api/expenses/",
+            "/api/subscriptions/",
+            "/api/jobs/",
+            "/api/expenses-legacy/?limit=100",
+        ]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                users = {row["user"] for row in response.json()["results"]}
+                self.assertLessEqual(users, {alice.pk, alice.username})
+        # Without limit/cursor the legacy list is still the original array.
+        legacy = self.client.get("/api/expenses-legacy/")
+        rows = json.loads(b"".join(legacy.streaming_content))
+        self.assertEqual([row["user"] for row in rows], [alice.username])
+        spend = self.client.get("/api/monthly-spend/").json()
+        self.assertEqual(spend["total"], "20.00")
+        other = Expense.objects.get(user=bob)
+        self.assertEqual(self.client.get(f"/api/expenses/{other.pk}/").status_code, 404)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(len(self.client.get("/api/expenses/").json()["results"]), 2)
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/expenses/").status_code, 403)
+        self.assertEqual(self.client.get("/api/monthly-spend/").status_code, 401)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+
+    def test_writes_belong_to_the_requester(self):
+        alice, bob = self.users
+        self.client.force_login(alice)
+        response = self.client.post(
+            "/api/categories/", {"user": bob.pk, "name": "Streaming"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["user"], alice.pk)
+        self.assertEqual(
+            self.client.post("/api/categories/", {"name": "Music"}).status_code, 400
+        )
+        response = self.client.post(
+            "/api/expenses/",
+            {
+                "name": "Concert",
+                "amount": "50.00",
+                "transaction_date": "2025-01-01",
+                "category": self.categories[1].pk,
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("category", response.json())
+
+
+@override_settings(REPLICA_DATABASE="replica")
+class ReplicaRoutingTests(TestCase):
+    def test_only_opted_in_reads_use_the_replica(self):
+        router = routers.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Expense), "default")
+        with routers.replica():
+            self.assertEqual(router.db_for_read(Expense), "replica")
+            self.assertEqual(router.db_for_write(Expense), "default")
+        self.assertFalse(router.allow_migrate("replica", "subscriptions"))
+
+        request = RequestFactory().get("/api/monthly-spend/")
+        self.assertTrue(routers.can_use_replica(request))
+        request.COOKIES[routers.PIN_COOKIE] = "1"
+        self.assertFalse(routers.can_use_replica(request))
+        self.assertFalse(routers.can_use_replica(RequestFactory().post("/")))
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        user = get_user_model().objects.create_superuser("owner", "", "pw")
+        self.client.force_login(user)
+        response = self.client.post(
+            "/api/categories/", {"user": user.pk, "name": "Music"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        # There is no "replica" database under tests, so this read only
+        # succeeds because the cookie sends it to the primary.
+        response = self.client.get("/api/categories/")
+        names = [row["name"] for row in response.json()["results"]]
+        self.assertEqual(names, ["Music"])
+
+    def test_auth_and_streams_use_the_routed_database(self):
+        user = get_user_model().objects.create_user("owner")
+        Expense.objects.create(
+            user=user,
+            name="Records",
+            amount=Decimal("20.00"),
+            transaction_date=date(2024, 1, 5),
+        )
+        self.client.force_login(user)
+        reads = []
+        db_for_read = routers.ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            reads.append((model._meta.model_name, db_for_read(router, model)))
+            return "default"  # There is no "replica" database under tests.
+
+        with mock.patch.object(routers.ReplicaRouter, "db_for_read", record):
+            response = self.client.get("/api/expenses/")
+            self.assertEqual(len(response.json()["results"]), 1)
+            response = self.client.get("/api/expenses-legacy/")
+            self.assertEqual(len(json.loads(b"".join(response.streaming_content))), 1)
+        aliases = {}
+        for model, alias in reads:
+            aliases.setdefault(model, set()).add(alias)
+        self.assertEqual(aliases["expense"], {"replica"})
+        self.assertEqual(aliases["session"] | aliases["user"], {"default"})
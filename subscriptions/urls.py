@@ -2,15 +2,31 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from . import views
-from .api import CategoryViewSet, ExpenseViewSet, SubscriptionViewSet
+from .api import (
+    CategoryViewSet,
+    ExpenseImportView,
+    ExpenseViewSet,
+    JobViewSet,
+    SubscriptionViewSet,
+)
 
 router = DefaultRouter()
 router.register("api/categories", CategoryViewSet)
 router.register("api/subscriptions", SubscriptionViewSet)
 router.register("api/expenses", ExpenseViewSet)
+router.register("api/jobs", JobViewSet)
 
 urlpatterns = [
+    path(
+        "api/expenses/import/",
+        ExpenseImportView.as_view(),
+        name="api_expense_import",
+    ),
     path("api/expenses-legacy/", views.expenses_list, name="api_expenses_legacy"),
     path("api/monthly-spend/", views.monthly_spend, name="api_monthly_spend"),
+    path("api/forecast/", views.forecast, name="api_forecast"),
+    path("api/reports/spend/", views.spend_report, name="api_spend_report"),
+    path("api/export/<str:dataset>/", views.export_data, name="api_export"),
+    path("api/metrics/", views.metrics, name="api_metrics"),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,88 @@
+import hashlib
+from collections.abc import Iterable
+from datetime import datetime, time
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from . import scoping
+from .models import DataVersion
+
+
+def bump(user_ids: Iterable[int]) -> None:
+    """Mark the data of `user_ids` as changed."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    now = timezone.now()
+    DataVersion.objects.bulk_create(
+        [DataVersion(user_id=user_id, updated_at=now) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    DataVersion.objects.filter(user_id__in=user_ids).update(
+        version=F("version") + 1, updated_at=now
+    )
+
+
+def bump_all() -> None:
+    """Mark every user's data as changed, e.g. after shared data such as rates."""
+    now = timezone.now()
+    missing = get_user_model().objects.filter(data_version__isnull=True)
+    DataVersion.objects.bulk_create(
+        [
+            DataVersion(user_id=user_id, updated_at=now)
+            for user_id in missing.values_list("pk", flat=True).iterator()
+        ],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+    DataVersion.objects.update(version=F("version") + 1, updated_at=now)
+
+
+def current(request) -> tuple[str, datetime]:
+    """Return (version tag, last modified) for the data behind `request`.
+
+    Computed once per request with a single query on the version table,
+    scoped like the data: a user's tag covers only their own row, so other
+    tenants' writes leave it alone; staff get one over every user. Last
+    modified never predates today's midnight, since report views such as
+    monthly_spend change with the date even when no data does.
+    """
+    cached = getattr(request, "_data_version", None)
+    if cached is not None:
+        return cached
+    versions = scoping.scope(DataVersion.objects.all(), request.user)
+    state = versions.aggregate(
+        version=Sum("version"), updated=Max("updated_at"), users=Count("id")
+    )
+    midnight = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    last_modified = max(filter(None, [state["updated"], midnight]))
+    tag = "{}.{}.{}".format(
+        state["version"] or 0, state["users"], last_modified.timestamp()
+    )
+    request._data_version = (tag, last_modified)
+    return request._data_version
+
+
+def etag(request, *args, **kwargs) -> str:
+    tag, _ = current(request)
+    key = "\n".join(
+        [
+            tag,
+            request.get_full_path(),
+            request.META.get("HTTP_ACCEPT", ""),
+            str(request.user.pk if request.user.is_authenticated else ""),
+        ]
+    )
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def last_modified(request, *args, **kwargs) -> datetime:
+    _, modified = current(request)
+    return modified
+
+
+# Answers unchanged GETs with 304 before the view runs any query.
+conditional = condition(etag_func=etag, last_modified_func=last_modified)
@@ -1,43 +1,311 @@
-from django.db.models import Sum
-from django.http import JsonResponse
+import base64
+import binascii
+import json
+from datetime import date
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.db.models import Count, Max, Q, Sum
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 
-from .models import Expense
+from . import fx, instrumentation, reports, scoping, versioning
+from .exports import (
+    DATASETS,
+    FORMATS,
+    export_chunks,
+    export_months,
+    file_extension,
+    parse_month,
+    pq,
+)
+from .forecast import month_index, month_start, project_spend
+from .models import Expense, MonthlySpend, Subscription
+from .reports import MAX_REPORT_MONTHS
+from .routers import read_from_replica
+from .scoping import login_required, staff_required
+from .versioning import conditional
+
+FORECAST_MAX_MONTHS = 60
+FORECAST_CACHE_TIMEOUT = 60 * 60
+REPORT_CACHE_TIMEOUT = 60 * 60
+
+
+LEGACY_EXPENSE_FIELDS = (
+    "id",
+    "name",
+    "amount",
+    "currency",
+    "transaction_date",
+    "source",
+    "category__name",
+    "subscription__name",
+    "user__username",
+)
+EXPENSES_PAGE_SIZE = 100
+EXPENSES_MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+
+
+def legacy_expense(row: tuple) -> dict:
+    """Shape a LEGACY_EXPENSE_FIELDS tuple like the original endpoint did."""
+    pk, name, amount, currency, transaction_date, source, category, sub, user = row
+    return {
+        "id": pk,
+        "name": name,
+        "amount": str(amount),
+        "currency": currency,
+        "transaction_date": transaction_date.isoformat(),
+        "source": source,
+        "category": category,
+        "subscription": sub,
+        "user": user,
+    }
+
+
+def encode_cursor(transaction_date, pk: int) -> str:
+    raw = f"{transaction_date.isoformat()}:{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
 
 
+def decode_cursor(cursor: str):
+    transaction_date, pk = base64.urlsafe_b64decode(cursor).decode().split(":")
+    return date.fromisoformat(transaction_date), int(pk)
+
+
+@login_required
+@read_from_replica
+@conditional
 def expenses_list(request):
-    expenses = Expense.objects.select_related("category", "subscription", "user").order_by(
-        "-transaction_date", "-id"
+    """Every expense newest first, as the original JSON array.
+
+    The array is streamed in constant memory (as is NDJSON with
+    `?export=ndjson`). Passing `?limit=` or `?cursor=` returns one keyset
+    page, {"next", "results"}, instead; pages seek on (-transaction_date, -id)
+    so every page costs the same no matter how deep it is.
+    """
+    expenses = (
+        scoping.scope(Expense.objects.all(), request.user)
+        .order_by("-transaction_date", "-id")
+        .values_list(*LEGACY_EXPENSE_FIELDS)
     )
-    data = [
-        {
-            "id": expense.id,
-            "name": expense.name,
-            "amount": str(expense.amount),
-            "currency": expense.currency,
-            "transaction_date": expense.transaction_date.isoformat(),
-            "source": expense.source,
-            "category": expense.category.name if expense.category_id else None,
-            "subscription": expense.subscription.name if expense.subscription_id else None,
-            "user": expense.user.username,
-        }
-        for expense in expenses
-    ]
-    return JsonResponse(data, safe=False)
 
+    export = request.GET.get("export")
+    if export is None and not {"limit", "cursor"} & request.GET.keys():
+        export = "json"
+    if export in ("json", "ndjson"):
+        # The stream is read after the view (and read_from_replica) returns,
+        # so bind it to the database this request was routed to now.
+        expenses = expenses.using(router.db_for_read(Expense))
+        rows = (
+            legacy_expense(row)
+            for row in expenses.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        if export == "ndjson":
+            stream = (json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows)
+            content_type = "application/x-ndjson"
+        else:
+            stream = stream_json_array(rows)
+            content_type = "application/json"
+        return StreamingHttpResponse(stream, content_type=content_type)
+    if export is not None:
+        return JsonResponse({"error": "export must be json or ndjson."}, status=400)
+
+    try:
+        limit = int(request.GET.get("limit", EXPENSES_PAGE_SIZE))
+        cursor = request.GET.get("cursor")
+        if cursor:
+            transaction_date, pk = decode_cursor(cursor)
+            expenses = expenses.filter(
+                Q(transaction_date__lt=transaction_date)
+                | Q(transaction_date=transaction_date, id__lt=pk)
+            )
+    except (ValueError, binascii.Error):
+        return JsonResponse({"error": "Invalid limit or cursor."}, status=400)
+    limit = max(1, min(limit, EXPENSES_MAX_PAGE_SIZE))
+
+    # One extra row tells us whether a next page exists.
+    rows = list(expenses[: limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        query = request.GET.copy()
+        query["cursor"] = encode_cursor(rows[-1][4], rows[-1][0])
+        next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+    return JsonResponse(
+        {"next": next_url, "results": [legacy_expense(row) for row in rows]}
+    )
+
+
+def stream_json_array(rows):
+    """Yield a JSON array piece by piece, formatted like JsonResponse."""
+    yield "["
+    for index, row in enumerate(rows):
+        yield (", " if index else "") + json.dumps(row, cls=DjangoJSONEncoder)
+    yield "]"
 
+
+def report_currency(request) -> str | None:
+    """The `?currency=` to report in (default REPORTING_CURRENCY), or None."""
+    currency = request.GET.get("currency", fx.reporting_currency()).upper()
+    if len(currency) != 3 or not currency.isalpha():
+        return None
+    return currency
+
+
+@login_required
+@read_from_replica
+@conditional
 def monthly_spend(request):
+    """This month's spend, converted to `?currency=` (REPORTING_CURRENCY).
+
+    Totals are grouped per currency in SQL and each group is converted once;
+    currencies without a rate are listed under "unconverted" and left out of
+    the total rather than being added as if they were the same currency.
+    """
+    currency = report_currency(request)
+    if currency is None:
+        return JsonResponse({"error": "currency must be a 3-letter code."}, status=400)
     today = timezone.localdate()
-    total = (
-        Expense.objects.filter(
-            transaction_date__year=today.year,
-            transaction_date__month=today.month,
-        ).aggregate(total=Sum("amount"))["total"]
-        or 0
+    spend = scoping.scope(MonthlySpend.objects.all(), request.user).filter(
+        month=today.replace(day=1)
     )
+    rows = [
+        (row["currency"], row["total"])
+        for row in spend.values("currency")
+        .annotate(total=Sum("total"))
+        .order_by("currency")
+    ]
+    total, unconverted = fx.convert_totals(rows, currency, today)
     data = {
         "month": today.strftime("%Y-%m"),
         "total": str(total),
-        "currency": "AUD",
+        "currency": currency,
+        "by_currency": [
+            {"currency": code, "total": str(amount.quantize(fx.CENT))}
+            for code, amount in rows
+        ],
+        "unconverted": [code for code, _ in unconverted],
     }
     return JsonResponse(data)
+
+
+@login_required
+@read_from_replica
+@conditional
+def spend_report(request):
+    """Spend by month, category and source, with year-over-year changes.
+
+    `?from=YYYY-MM&to=YYYY-MM` (default: the twelve months to this one) and
+    `?currency=`. Results are cached per user under the data version, which
+    every write to that user's data (or to exchange rates) moves on.
+    """
+    currency = report_currency(request)
+    if currency is None:
+        return JsonResponse({"error": "currency must be a 3-letter code."}, status=400)
+    today = timezone.localdate()
+    try:
+        end = parse_month(request.GET["to"]) if "to" in request.GET else None
+        start = parse_month(request.GET["from"]) if "from" in request.GET else None
+    except ValueError:
+        return JsonResponse({"error": "from and to must be YYYY-MM."}, status=400)
+    end = end or today.replace(day=1)
+    start = start or month_start(month_index(end) - 11)
+    if not 1 <= month_index(end) - month_index(start) + 1 <= MAX_REPORT_MONTHS:
+        return JsonResponse(
+            {"error": f"from..to must span 1 to {MAX_REPORT_MONTHS} months."},
+            status=400,
+        )
+
+    rollups = scoping.scope(MonthlySpend.objects.all(), request.user)
+    owner = scoping.owner(request.user)
+    tag, _ = versioning.current(request)
+    key = f"spend-report:{owner}:{tag}:{start:%Y-%m}:{end:%Y-%m}:{currency}"
+    data = cache.get(key)
+    if data is None:
+        data = reports.spend_report(rollups, start, end, currency, today)
+        cache.set(key, data, REPORT_CACHE_TIMEOUT)
+    return JsonResponse(data)
+
+
+@login_required
+@read_from_replica
+@conditional
+def forecast(request):
+    try:
+        months = int(request.GET.get("months", 12))
+    except ValueError:
+        return JsonResponse({"error": "months must be an integer."}, status=400)
+    if not 1 <= months <= FORECAST_MAX_MONTHS:
+        return JsonResponse(
+            {"error": f"months must be between 1 and {FORECAST_MAX_MONTHS}."},
+            status=400,
+        )
+
+    subscriptions = scoping.scope(Subscription.objects.all(), request.user)
+    owner = scoping.owner(request.user)
+
+    # Any subscription edit, insert or delete (or category rename) changes
+    # this key, so stale projections are never served.
+    state = subscriptions.aggregate(
+        updated=Max("updated_at"),
+        category_updated=Max("category__updated_at"),
+        count=Count("id"),
+    )
+    today = timezone.localdate()
+    key = "forecast:{}:{}:{}:{}:{}:{}".format(
+        owner,
+        today.strftime("%Y-%m"),
+        months,
+        state["updated"] and state["updated"].timestamp(),
+        state["category_updated"] and state["category_updated"].timestamp(),
+        state["count"],
+    )
+    data = cache.get(key)
+    if data is None:
+        data = project_spend(subscriptions, today, months)
+        cache.set(key, data, FORECAST_CACHE_TIMEOUT)
+    return JsonResponse(data)
+
+
+@login_required
+def export_data(request, dataset):
+    """Stream a dataset as CSV or Parquet, in bounded chunks.
+
+    `?format=csv|parquet`, `?gzip=1`, `?since=YYYY-MM` and `?until=YYYY-MM`
+    mirror the `export_data` command. Users get their own rows, staff everyone's.
+    """
+    spec = DATASETS.get(dataset)
+    if spec is None:
+        return JsonResponse({"error": f"Unknown dataset {dataset!r}."}, status=404)
+    fmt = request.GET.get("format", "csv")
+    if fmt not in FORMATS:
+        return JsonResponse({"error": "format must be csv or parquet."}, status=400)
+    if fmt == "parquet" and pq is None:
+        return JsonResponse({"error": "Parquet export is not available."}, status=400)
+    try:
+        since = parse_month(request.GET["since"]) if "since" in request.GET else None
+        until = parse_month(request.GET["until"]) if "until" in request.GET else None
+    except ValueError:
+        return JsonResponse({"error": "since and until must be YYYY-MM."}, status=400)
+    compress = request.GET.get("gzip") in ("1", "true")
+
+    queryset = scoping.scope(spec.model.objects.all(), request.user)
+    months = export_months(spec, queryset, since, until)
+
+    content_type = "application/vnd.apache.parquet" if fmt == "parquet" else "text/csv"
+    if fmt == "csv" and compress:
+        content_type = "application/gzip"
+    response = StreamingHttpResponse(
+        export_chunks(spec, queryset, months, fmt, compress), content_type=content_type
+    )
+    filename = f"{dataset}.{file_extension(fmt, compress)}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@staff_required
+def metrics(request):
+    """Per-view query counts and timings recorded by InstrumentationMiddleware."""
+    return JsonResponse({"views": instrumentation.registry.snapshot()})